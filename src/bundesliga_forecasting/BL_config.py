@@ -1,5 +1,5 @@
 import logging
-from dataclasses import dataclass, fields
+from dataclasses import dataclass, fields, replace
 from pathlib import Path
 from typing import cast
 
@@ -15,18 +15,40 @@ MERGED_FOLDER = "03_Merged"
 PREPARED_FOLDER = "04_Prepared"
 FEATURE_FOLDER = "05_Features"
 ELNET_FOLDER = "06_Elastic-Net_Selection"
+BACKTEST_FOLDER = "07_Backtest"
+MODEL_FOLDER = "08_Models"
+PROFILE_FOLDER = "09_Profiles"
+LEAGUES_FOLDER = "Leagues"
 
 MERGED_FILE = "merged.csv"
+MERGE_CONFLICTS_FILE = "merge_conflicts.csv"
 PREPARED_FILE = "prepared.csv"
 FEATURE_FILE = "features.csv"
 DAILY_TABLES_FILE = "daily_tables.csv"
+STANDINGS_FILE = "standings.npz"
+ELO_STATE_FILE = "elo_state.json"
 COMBINED_FEATURE_FILE = "combined_features.csv"
+SWEEP_FILE = "feature_sweep.csv"
 TRAIN_FILE = "train.csv"
 TEST_FILE = "test.csv"
 VALID_FILE = "valid.csv"
+SELECTED_FEATURES_FILE = "selected_features.json"
+FIXTURES_FILE = "fixtures.csv"
+SIMULATION_FILE = "season_simulation.csv"
+BACKTEST_METRICS_FILE = "backtest_metrics.csv"
+BACKTEST_PREDICTIONS_FILE = "backtest_predictions.csv"
+BACKTEST_SCORES_FILE = "backtest_scores.csv"
+BACKTEST_CALIBRATION_FILE = "backtest_calibration.csv"
+MODEL_NAME = "poisson_regressor"
+RUN_LOG_FILE = "run_log.jsonl"
+ALIAS_FILE = "team_aliases.csv"
 
 
 CSV_ENCODING = "latin1"
+# worker processes of the per-league runs
+LEAGUE_JOBS = 4
+# reader threads of the merge stage
+MERGE_THREADS = 8
 
 
 # ================
@@ -42,15 +64,54 @@ class Paths:
     prepared: Path = DATA_ROOT / PREPARED_FOLDER
     features: Path = DATA_ROOT / FEATURE_FOLDER
     elnet: Path = DATA_ROOT / ELNET_FOLDER
+    backtest: Path = DATA_ROOT / BACKTEST_FOLDER
+    models: Path = DATA_ROOT / MODEL_FOLDER
     test: Path = TEST_FOLDER
+    # spellings of the team names, shared by all leagues
+    aliases: Path = DATA_ROOT / ALIAS_FILE
     merged_file: str = MERGED_FILE
+    merge_conflicts_file: str = MERGE_CONFLICTS_FILE
     prepared_file: str = PREPARED_FILE
     feature_file: str = FEATURE_FILE
     daily_tables_file: str = DAILY_TABLES_FILE
+    standings_file: str = STANDINGS_FILE
+    elo_state_file: str = ELO_STATE_FILE
     combined_file: str = COMBINED_FEATURE_FILE
+    sweep_file: str = SWEEP_FILE
     train_file: str = TRAIN_FILE
     test_file: str = TEST_FILE
     valid_file: str = VALID_FILE
+    selected_features_file: str = SELECTED_FEATURES_FILE
+    fixtures_file: str = FIXTURES_FILE
+    simulation_file: str = SIMULATION_FILE
+    backtest_metrics_file: str = BACKTEST_METRICS_FILE
+    backtest_predictions_file: str = BACKTEST_PREDICTIONS_FILE
+    backtest_scores_file: str = BACKTEST_SCORES_FILE
+    backtest_calibration_file: str = BACKTEST_CALIBRATION_FILE
+    model_name: str = MODEL_NAME
+
+    def for_league(self, league: str) -> "Paths":
+        """
+        Data tree of one league, e.g. 'data/Leagues/D/02_Cleaned'. Within the
+        tree the raw and cleaned files stay partitioned by division and season.
+        """
+        root = self.raw.parent / LEAGUES_FOLDER / league
+        return replace(
+            self,
+            **{
+                name: root / getattr(self, name).name
+                for name in [
+                    "raw",
+                    "cleaned",
+                    "merged",
+                    "prepared",
+                    "features",
+                    "elnet",
+                    "backtest",
+                    "models",
+                ]
+            },
+        )
 
 
 PATHS = Paths()
@@ -65,6 +126,7 @@ class Columns:
     date: str = "Date"
     team: str = "Team"
     opp: str = "Opponent"
+    matchday: str = "Matchday"
 
     # team-match level
     goalsf: str = "GoalsFor"
@@ -135,6 +197,27 @@ class Columns:
     prev_hist_tgoaldiff: str = "PrevHistoricalTotalGoalDiff"
     prev_hist_tpoint_performance: str = "PrevHistoricalTotalPointPerformance"
 
+    # head-to-head
+    prev_h2h_matches: str = "PrevHeadToHeadMatches"
+    prev_h2h_point_ratio: str = "PrevHeadToHeadPointRatio"
+    prev_h2h_goaldiff_ratio: str = "PrevHeadToHeadGoalDiffRatio"
+    prev_h2h_result_ewm: str = "PrevHeadToHeadResultEwm"
+
+    # ratings
+    prev_elo: str = "PrevElo"
+    prev_goal_elo: str = "PrevGoalElo"
+    prev_opp_elo: str = "PrevOpponentElo"
+    prev_opp_goal_elo: str = "PrevOpponentGoalElo"
+
+    # strength of schedule
+    prev_adj_tgoaldiff: str = "PrevAdjustedTotalGoalDiff"
+    prev_adj_tpoints: str = "PrevAdjustedTotalPoints"
+
+    # rest and congestion
+    prev_rest_days: str = "PrevRestDays"
+    prev_opp_rest_days: str = "PrevOpponentRestDays"
+    prev_rest_diff: str = "PrevRestDiff"
+
     # relegation effect
     rel_effect_prev_season_trank: str = "RelEffectPrevSeasonTotalRank"
     rel_effect_prev_season_twins: str = "RelEffectPrevSeasonTotalWins"
@@ -155,6 +238,53 @@ class Columns:
         "PromEffectPrevSeasonTotalPointPerformance"
     )
 
+    ## season simulation ##
+    # fixtures
+    home_team: str = "HomeTeam"
+    away_team: str = "AwayTeam"
+    home_rate: str = "HomeRate"
+    away_rate: str = "AwayRate"
+
+    # outcome probabilities
+    exp_points: str = "ExpectedPoints"
+    exp_position: str = "ExpectedPosition"
+    title_prob: str = "TitleProbability"
+    europe_prob: str = "EuropeProbability"
+    rel_playoff_prob: str = "RelegationPlayoffProbability"
+    relegation_prob: str = "RelegationProbability"
+
+    ## backtest ##
+    pred_goalsf: str = "PredGoalsFor"
+    n_train: str = "NTrain"
+    n_test: str = "NTest"
+    deviance: str = "PoissonDeviance"
+    mse: str = "MeanSquaredError"
+    n_iter: str = "NIter"
+    seconds: str = "Seconds"
+
+    ## analysis ##
+    final_rank: str = "FinalRank"
+    point_gap: str = "PointGap"
+
+    ## evaluation ##
+    # paired matches
+    home_goals: str = "HomeGoals"
+    away_goals: str = "AwayGoals"
+
+    # scores
+    n_matches: str = "NMatches"
+    rps: str = "RankedProbabilityScore"
+    log_loss: str = "LogLoss"
+    brier: str = "BrierScore"
+
+    # calibration
+    outcome: str = "Outcome"
+    bin_lower: str = "BinLower"
+    bin_upper: str = "BinUpper"
+    mean_prob: str = "MeanProbability"
+    observed_freq: str = "ObservedFrequency"
+    count: str = "Count"
+
 
 COLUMNS = Columns()
 
@@ -196,6 +326,23 @@ class Predictors:
     prev_hist_tgoaldiff: str = "PrevHistoricalTotalGoalDiff"
     prev_hist_tpoint_performance: str = "PrevHistoricalTotalPointPerformance"
 
+    # head-to-head
+    prev_h2h_matches: str = "PrevHeadToHeadMatches"
+    prev_h2h_point_ratio: str = "PrevHeadToHeadPointRatio"
+    prev_h2h_goaldiff_ratio: str = "PrevHeadToHeadGoalDiffRatio"
+    prev_h2h_result_ewm: str = "PrevHeadToHeadResultEwm"
+
+    # ratings
+    prev_elo: str = "PrevElo"
+    prev_goal_elo: str = "PrevGoalElo"
+
+    # strength of schedule
+    prev_adj_tgoaldiff: str = "PrevAdjustedTotalGoalDiff"
+    prev_adj_tpoints: str = "PrevAdjustedTotalPoints"
+
+    # rest and congestion
+    prev_rest_days: str = "PrevRestDays"
+
     # relegation effect
     rel_effect_prev_season_trank: str = "RelEffectPrevSeasonTotalRank"
     rel_effect_prev_season_twins: str = "RelEffectPrevSeasonTotalWins"
@@ -224,6 +371,15 @@ class Predictors:
 PREDICTORS = Predictors
 
 
+@dataclass(frozen=True)
+class Instrumentation:
+    log_path: Path = DATA_ROOT / RUN_LOG_FILE
+    profile_dir: Path = DATA_ROOT / PROFILE_FOLDER
+
+
+INSTRUMENTATION = Instrumentation()
+
+
 # ================
 #  Config Logging
 # ================
@@ -0,0 +1,299 @@
+from __future__ import annotations
+
+import cProfile
+import functools
+import json
+import os
+import time
+import tracemalloc
+import uuid
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Literal, TypeVar
+
+import pandas as pd
+
+from bundesliga_forecasting.BL_config import INSTRUMENTATION
+
+ProfileMode = Literal["none", "cprofile", "tracemalloc"]
+F = TypeVar("F", bound=Callable[..., Any])
+
+# counted pandas operations, patched while an instrumented block runs
+COUNTED_OPS = ("copies", "merges", "concats")
+
+
+@dataclass
+class _Frame:
+    name: str
+    parent: str | None
+    depth: int
+    kind: str
+    start: float = field(default_factory=time.perf_counter)
+    rows_in: int | None = None
+    cols_in: int | None = None
+    mem_in: int | None = None
+    rows_out: int | None = None
+    cols_out: int | None = None
+    mem_out: int | None = None
+    counts: dict[str, int] = field(
+        default_factory=lambda: dict.fromkeys(COUNTED_OPS, 0)
+    )
+
+
+@dataclass
+class _State:
+    enabled: bool = False
+    profile: ProfileMode = "none"
+    log_path: Path = INSTRUMENTATION.log_path
+    profile_dir: Path = INSTRUMENTATION.profile_dir
+    run_id: str = ""
+    stack: list[_Frame] = field(default_factory=list)
+    profiling: bool = False
+    # the unpatched pandas functions, see '_patch_pandas'
+    originals: dict[tuple[Any, str], Callable] = field(default_factory=dict)
+
+
+_state = _State()
+
+
+def configure(
+    *,
+    enabled: bool = True,
+    profile: ProfileMode = "none",
+    log_path: Path = INSTRUMENTATION.log_path,
+    profile_dir: Path = INSTRUMENTATION.profile_dir,
+) -> str:
+    """
+    Description:
+        Switches the instrumentation on or off for the current process and
+        starts a new run id. Without a call, the environment variables
+        'BL_INSTRUMENT' (1/0) and 'BL_PROFILE' (cprofile/tracemalloc) decide.
+
+    Returns:
+        str: Id of the run, written to every record of the run log.
+    """
+    if profile not in ("none", "cprofile", "tracemalloc"):
+        raise ValueError(f"Unsupported profile mode: {profile}")
+    _state.enabled = enabled
+    _state.profile = profile
+    _state.log_path = log_path
+    _state.profile_dir = profile_dir
+    _state.run_id = uuid.uuid4().hex[:12]
+    return _state.run_id
+
+
+def instrumented(
+    func: F | None = None, *, name: str | None = None, kernel: bool = False
+) -> F:
+    """
+    Description:
+        Decorator version of 'track', the record is named after the function
+        unless 'name' is given. The first DataFrame or Series argument and a
+        DataFrame or Series return value are measured automatically.
+
+    Usage location:
+        all S0x/F0x/M0x stage functions and the major F-stage kernels
+    """
+
+    def decorator(func: F) -> F:
+        record_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not _state.enabled:
+                return func(*args, **kwargs)
+            with track(record_name, kernel=kernel):
+                for arg in (*args, *kwargs.values()):
+                    if isinstance(arg, (pd.DataFrame, pd.Series)):
+                        record_input(arg)
+                        break
+                result = func(*args, **kwargs)
+                if isinstance(result, (pd.DataFrame, pd.Series)):
+                    record_output(result)
+                return result
+
+        return wrapper  # type: ignore[return-value]
+
+    if func is not None:
+        return decorator(func)
+    return decorator  # type: ignore[return-value]
+
+
+@contextmanager
+def track(name: str, *, kernel: bool = False) -> Iterator[None]:
+    """
+    Description:
+        Measures the enclosed block and appends one JSON record to the run log:
+        duration, input/output rows and columns, DataFrame memory before and
+        after, and the number of DataFrame copies, merges and concats (counted
+        for every enclosing block, including those made inside pandas).
+        Stages, i.e. blocks which are not kernels, are additionally profiled
+        if a profile mode is set. The counting patches of pandas are only in
+        place while the outermost block runs.
+    """
+    if not _state.enabled:
+        yield
+        return
+    if not _state.run_id:
+        _state.run_id = uuid.uuid4().hex[:12]
+
+    parent = _state.stack[-1].name if _state.stack else None
+    kind = "kernel" if kernel else "stage"
+    frame = _Frame(name=name, parent=parent, depth=len(_state.stack), kind=kind)
+    if not _state.stack:
+        _patch_pandas()
+    _state.stack.append(frame)
+
+    profile = _state.profile if not (kernel or _state.profiling) else "none"
+    profiler = _start_profile(profile)
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        duration = time.perf_counter() - frame.start
+        profile_info = _stop_profile(profile, profiler, name)
+        _state.stack.pop()
+        if not _state.stack:
+            _restore_pandas()
+        _write_record(frame, duration, status, profile_info)
+
+
+def record_input(df: pd.DataFrame | pd.Series) -> None:
+    # the first input of a block counts, later reads are lookups
+    if _state.enabled and _state.stack and _state.stack[-1].rows_in is None:
+        frame = _state.stack[-1]
+        frame.rows_in, frame.cols_in, frame.mem_in = _measure(df)
+
+
+def record_output(df: pd.DataFrame | pd.Series) -> None:
+    if _state.enabled and _state.stack:
+        frame = _state.stack[-1]
+        frame.rows_out, frame.cols_out, frame.mem_out = _measure(df)
+
+
+#################################################################
+
+
+def _configure_from_env() -> None:
+    enabled = os.environ.get("BL_INSTRUMENT", "0").lower() in ("1", "true", "yes")
+    profile = os.environ.get("BL_PROFILE", "none").lower()
+    if enabled or profile != "none":
+        configure(enabled=True, profile=profile)  # type: ignore[arg-type]
+
+
+def _measure(df: pd.DataFrame | pd.Series) -> tuple[int, int, int]:
+    # a Series counts as a single column
+    n_cols = 1 if isinstance(df, pd.Series) else df.shape[1]
+    memory = df.memory_usage(index=True, deep=False)
+    return len(df), n_cols, int(memory if isinstance(df, pd.Series) else memory.sum())
+
+
+def _count(op: str) -> None:
+    for frame in _state.stack:
+        frame.counts[op] += 1
+
+
+def _patch_pandas() -> None:
+    if _state.originals:
+        return
+
+    def counting(op: str, original: Callable) -> Callable:
+        @functools.wraps(original)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if _state.stack:
+                _count(op)
+            return original(*args, **kwargs)
+
+        return wrapper
+
+    for owner, attr, op in [
+        (pd.DataFrame, "copy", "copies"),
+        (pd.DataFrame, "merge", "merges"),
+        (pd, "merge", "merges"),
+        (pd, "concat", "concats"),
+    ]:
+        original = getattr(owner, attr)
+        _state.originals[(owner, attr)] = original
+        setattr(owner, attr, counting(op, original))
+
+
+def _restore_pandas() -> None:
+    for (owner, attr), original in _state.originals.items():
+        setattr(owner, attr, original)
+    _state.originals.clear()
+
+
+def _start_profile(profile: ProfileMode) -> cProfile.Profile | None:
+    if profile == "none":
+        return None
+    _state.profiling = True
+    if profile == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+    if profile == "tracemalloc":
+        tracemalloc.start()
+    return None
+
+
+def _stop_profile(
+    profile: ProfileMode, profiler: cProfile.Profile | None, name: str
+) -> dict[str, Any]:
+    if profile == "none":
+        return {}
+    _state.profiling = False
+    _state.profile_dir.mkdir(parents=True, exist_ok=True)
+    stem = f"{_state.run_id}_{name}"
+
+    if profiler is not None:
+        profiler.disable()
+        path = _state.profile_dir / f"{stem}.prof"
+        profiler.dump_stats(path)
+        return {"profile": str(path)}
+
+    snapshot = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    path = _state.profile_dir / f"{stem}.txt"
+    top = snapshot.statistics("lineno")[:25]
+    path.write_text("\n".join(str(stat) for stat in top))
+    return {"profile": str(path), "traced_peak_mb": peak / 2**20}
+
+
+def _write_record(
+    frame: _Frame, duration: float, status: str, profile_info: dict[str, Any]
+) -> None:
+    record = {
+        "run_id": _state.run_id,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+        "name": frame.name,
+        "parent": frame.parent,
+        "depth": frame.depth,
+        "kind": frame.kind,
+        "status": status,
+        "duration_s": round(duration, 6),
+        "rows_in": frame.rows_in,
+        "cols_in": frame.cols_in,
+        "rows_out": frame.rows_out,
+        "cols_out": frame.cols_out,
+        "mem_in_mb": _megabytes(frame.mem_in),
+        "mem_out_mb": _megabytes(frame.mem_out),
+        **frame.counts,
+        **profile_info,
+    }
+    _state.log_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(_state.log_path, "a", encoding="utf-8") as file:
+        file.write(json.dumps(record) + "\n")
+
+
+def _megabytes(n_bytes: int | None) -> float | None:
+    return None if n_bytes is None else round(n_bytes / 2**20, 3)
+
+
+_configure_from_env()
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import logging
+import shutil
+from collections.abc import Callable, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from bundesliga_forecasting.BL_config import (
+    COLUMNS,
+    CSV_ENCODING,
+    LEAGUE_JOBS,
+    PATHS,
+    Paths,
+    setup_logging,
+)
+from bundesliga_forecasting.BL_instrument import instrumented
+from bundesliga_forecasting.BL_utils import ensure_dir
+from bundesliga_forecasting.data_structuring.S_config import DIVISION_LEAGUES
+from bundesliga_forecasting.data_structuring.S_pipeline import data_structuring
+from bundesliga_forecasting.data_structuring.S_utils import detect_csv_files
+from bundesliga_forecasting.feature_engineering.F_pipeline import feature_engineering
+
+logger = logging.getLogger(__name__)
+
+paths = PATHS
+encoding = CSV_ENCODING
+cols = COLUMNS
+
+
+@instrumented
+def run_leagues(
+    leagues: Sequence[str] | None = None,
+    *,
+    data_paths: Paths = paths,
+    n_jobs: int = LEAGUE_JOBS,
+) -> None:
+    """
+    Description:
+        Runs the data structuring and feature engineering pipelines once per
+        league, every league in its own data tree (see 'Paths.for_league').
+        Step 1 -> Partition the raw files by the league of their division
+        Step 2 -> Structure the leagues in parallel
+        Step 3 -> Warn about teams which play in several leagues, their
+                  features are only built from the matches of each league
+        Step 4 -> Engineer the features of the leagues in parallel
+
+        The wall time is that of the largest league rather than the sum over
+        all leagues, as long as there are enough workers.
+
+    Usage location:
+        cli.py
+
+    Args:
+        leagues (Sequence[str] | None): League codes of 'LEAGUES' to run, all
+            leagues with raw files if None.
+        data_paths (Paths): Data tree with the raw CSV-files of all leagues,
+            the league trees are created next to its folders.
+        n_jobs (int): Number of worker processes.
+    """
+    logger.info("Starting the per-league runs...")
+    league_paths = partition_raw(data_paths)
+    if leagues is not None:
+        missing = sorted(set(leagues) - set(league_paths))
+        if missing:
+            raise ValueError(f"No raw files found for the leagues {missing}.")
+        league_paths = {league: league_paths[league] for league in leagues}
+
+    _run_parallel(data_structuring, list(league_paths.values()), n_jobs)
+    _warn_shared_teams(league_paths)
+    _run_parallel(feature_engineering, list(league_paths.values()), n_jobs)
+    logger.info("%d leagues processed.", len(league_paths))
+
+
+def partition_raw(data_paths: Paths = paths) -> dict[str, Paths]:
+    """
+    Description:
+        Copies every raw CSV-file into the raw folder of its league's data
+        tree. The league is looked up from the division code of the file's
+        first match.
+
+    Returns:
+        dict[str, Paths]: Data tree of every league with raw files.
+    """
+    ensure_dir([data_paths.raw], ["src"])
+    league_paths = {}
+    for file in detect_csv_files(data_paths.raw):
+        division = _read_division(file)
+        if division not in DIVISION_LEAGUES:
+            raise ValueError(f"Division {division!r} of {file.name} is not configured.")
+        league = DIVISION_LEAGUES[division]
+        if league not in league_paths:
+            league_paths[league] = data_paths.for_league(league)
+            ensure_dir([league_paths[league].raw], ["target"])
+        shutil.copy2(file, league_paths[league].raw / file.name)
+    return league_paths
+
+
+#################################################################
+
+
+def _read_division(file: Path) -> str:
+    with open(file, encoding=encoding) as f:
+        header = f.readline().strip().split(",")
+        try:
+            position = header.index(cols.div)
+        except ValueError as e:
+            raise ValueError(f"Missing column '{cols.div}' in {file.name}.") from e
+        for line in f:
+            fields = line.strip().split(",")
+            if any(field.strip() for field in fields):
+                return fields[position].strip()
+    raise ValueError(f"No matches found in {file.name}.")
+
+
+def _warn_shared_teams(league_paths: dict[str, Paths]) -> None:
+    league_teams: dict[str, set[str]] = {}
+    for league, league_path in league_paths.items():
+        teams = set(
+            pd.read_csv(
+                league_path.prepared / league_path.prepared_file,
+                usecols=[cols.team],
+                encoding=encoding,
+            )[cols.team]
+        )
+        for other, other_teams in league_teams.items():
+            if other_teams & teams:
+                logger.warning(
+                    "The leagues %s and %s share the teams %s.",
+                    other,
+                    league,
+                    sorted(other_teams & teams),
+                )
+        league_teams[league] = teams
+
+
+def _run_parallel(function: Callable, args: list, n_jobs: int) -> None:
+    if n_jobs == 1 or len(args) == 1:
+        list(map(function, args))
+    else:
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(args))) as executor:
+            list(executor.map(function, args))
+
+
+def main() -> None:
+    setup_logging()
+    run_leagues()
+
+
+if __name__ == "__main__":
+    main()
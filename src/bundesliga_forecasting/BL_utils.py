@@ -4,9 +4,11 @@ import logging
 from pathlib import Path
 from typing import Literal
 
+import numpy as np
 import pandas as pd
 
 from bundesliga_forecasting.BL_config import COLUMNS, CSV_ENCODING
+from bundesliga_forecasting.BL_instrument import record_input, record_output
 
 logger = logging.getLogger(__name__)
 cols = COLUMNS
@@ -25,13 +27,19 @@ def read_csv(
         df[col] = pd.to_datetime(
             df[col], dayfirst=dayfirst, errors="raise", format="mixed"
         )
+    record_input(df)
     return df
 
 
 def save_to_csv(df: pd.DataFrame, output_path: Path, *, index: bool = False) -> None:
+    record_output(df)
     df.to_csv(output_path, index=index)
 
 
+def append_to_csv(df: pd.DataFrame, output_path: Path, *, index: bool = False) -> None:
+    df.to_csv(output_path, mode="a", header=not output_path.exists(), index=index)
+
+
 def check_columns(df: pd.DataFrame, columns: list[str]) -> None:
     missing = [col for col in columns if col not in df.columns]
     if missing:
@@ -43,9 +51,37 @@ def check_columns(df: pd.DataFrame, columns: list[str]) -> None:
 def df_sort(
     df: pd.DataFrame, *, sort_cols: list[str], kind: SortKind = "mergesort"
 ) -> pd.DataFrame:
+    """
+    Sorts df by 'sort_cols' unless its rows already are in that order, which
+    is checked by one linear scan. Frames read from an artifact of an earlier
+    stage usually are, so the stages skip the sort and the copy of all
+    columns. The scan always runs, as an order recorded in df.attrs would be
+    carried along unchanged by pandas through later reorderings.
+    """
     check_columns(df, sort_cols)
-    df = df.sort_values(sort_cols, kind=kind)
-    return df
+    if is_sorted(df, sort_cols):
+        # shallow, the columns are only copied when they are written to
+        return df.copy(deep=False)
+    return df.sort_values(sort_cols, kind=kind)
+
+
+def is_sorted(df: pd.DataFrame, sort_cols: list[str]) -> bool:
+    """
+    Whether the rows are in ascending lexicographic order of 'sort_cols', in
+    O(n) per column. Missing values count as unsorted.
+    """
+    check_columns(df, sort_cols)
+    if len(df) < 2:
+        return True
+    # in_order[i]: row i + 1 does not precede row i on the columns seen so far
+    in_order = np.ones(len(df) - 1, dtype=bool)
+    for col in reversed(sort_cols):
+        if df[col].isna().any():
+            return False
+        values = df[col].to_numpy()
+        previous, current = values[:-1], values[1:]
+        in_order = (previous < current) | ((previous == current) & in_order)
+    return bool(in_order.all())
 
 
 def ensure_dir(paths: list[Path], dir_types: list[Literal["src", "target"]]) -> None:
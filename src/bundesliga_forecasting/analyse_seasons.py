@@ -1,65 +1,88 @@
-import matplotlib.pyplot as plt
+from pathlib import Path
+
 import numpy as np
 import pandas as pd
 
 from bundesliga_forecasting.BL_config import PATHS
-from bundesliga_forecasting.BL_utils import read_csv, save_to_csv
+from bundesliga_forecasting.BL_utils import check_columns, save_to_csv
 from bundesliga_forecasting.feature_engineering.F_config import COLUMNS
+from bundesliga_forecasting.feature_engineering.F_standings import StandingsStore
 
 paths = PATHS
 cols = COLUMNS
 
-df = read_csv(paths.features / paths.daily_tables_file)
-
 
-def _add_point_gap_col(df: pd.DataFrame, col_name: str = "PointGap") -> pd.DataFrame:
-    season_end = (
-        df.loc[
-            df.groupby([cols.season, cols.div])[cols.date].transform("max")
-            == df[cols.date]
-        ]
-        .copy()
-        .sort_values([cols.season, cols.div, cols.post_rank], ascending=True)
+def analyse_seasons(
+    src_dir: Path = paths.features,
+    target_dir: Path = paths.features,
+    src_file: str = paths.standings_file,
+    *,
+    plot: bool = True,
+) -> None:
+    store = StandingsStore.load(src_dir / src_file)
+    gaps = season_end_point_gaps(store.season_end())
+
+    for div in sorted(gaps[cols.div].unique()):
+        matrix = point_gap_matrix(gaps, div)
+        save_to_csv(matrix, target_dir / f"D{div}_point_gaps.csv", index=True)
+        if plot:
+            plot_point_gaps(matrix, title=f"D{div} Point Gaps per Position Difference")
+
+
+def season_end_point_gaps(season_end: pd.DataFrame) -> pd.DataFrame:
+    """
+    Description:
+        Point gap between every pair of adjacent final positions of every
+        season and division.
+        Step 1 -> Number the positions of each final table in rank order
+        Step 2 -> Subtract the points of the next position within each table
+
+        Works on the final tables of the standings store for any number of
+        divisions and any league size.
+
+    Returns:
+        pd.DataFrame: One row per (season, division, position) except the last
+        position of each table, with the gap to the next position.
+    """
+    table_cols = [cols.season, cols.div]
+    check_columns(
+        season_end, table_cols + [cols.team, cols.post_tpoints, cols.post_rank]
     )
 
-    season_end[col_name] = season_end.groupby([cols.season, cols.div])[
+    season_end = season_end.sort_values(table_cols + [cols.post_rank], kind="mergesort")
+    tables = season_end.groupby(table_cols, sort=False)
+    season_end[cols.final_rank] = tables.cumcount() + 1
+    season_end[cols.point_gap] = season_end[cols.post_tpoints] - tables[
         cols.post_tpoints
-    ].diff(-1)
-
-    season_end = season_end.dropna(subset=[col_name])
-
-    return season_end
+    ].shift(-1)
 
+    gaps = season_end.dropna(subset=[cols.point_gap])
+    return gaps[table_cols + [cols.final_rank, cols.team, cols.point_gap]].reset_index(
+        drop=True
+    )
 
-def build_point_gap_matrix(df: pd.DataFrame, division: str) -> pd.DataFrame:
-    gap_col = "PointGap"
-    season_end = _add_point_gap_col(df, col_name=gap_col)
-    league = season_end[season_end[cols.div] == division].copy()
-    seasons = sorted(league[cols.season].unique())
-    ranks = list(range(1, 19))
-    idx_labels = [f"{rank}-{rank + 1}" for rank in ranks[:-1]]
-
-    matrix = pd.DataFrame(index=idx_labels, columns=seasons, dtype=float)
-
-    for season in seasons:
-        league_table = league[league[cols.season] == season]
-        matrix[season] = league_table[gap_col].values
 
-    # matrix["average"] =
+def point_gap_matrix(gaps: pd.DataFrame, div: int) -> pd.DataFrame:
+    """
+    Description:
+        Position pairs (rows) by seasons (columns) of one division, e.g. for
+        plotting. Seasons with smaller leagues are NaN in the lower rows.
+    """
+    check_columns(gaps, [cols.season, cols.div, cols.final_rank, cols.point_gap])
+    matrix = gaps[gaps[cols.div] == div].pivot(
+        index=cols.final_rank, columns=cols.season, values=cols.point_gap
+    )
+    matrix.index = [f"{rank}-{rank + 1}" for rank in matrix.index]
     return matrix
 
 
-matrix1 = build_point_gap_matrix(df, division="D1")
-matrix2 = build_point_gap_matrix(df, division="D2")
-
-save_to_csv(matrix1, paths.features / "D1_point_gaps.csv")
-save_to_csv(matrix2, paths.features / "D2_point_gaps.csv")
-
-
 def plot_point_gaps(
     matrix: pd.DataFrame,
     title: str = "Point Gaps per Position Difference",
 ):
+    # matplotlib is only needed for plotting, so it is not imported with the module
+    import matplotlib.pyplot as plt
+
     plt.figure(figsize=(12, 6))
 
     x_labels = matrix.index
@@ -89,6 +112,9 @@ def plot_point_gaps(
     plt.show()
 
 
-# Beispielaufruf
-plot_point_gaps(matrix1, title="D1 Point Gaps per Position Difference")
-plot_point_gaps(matrix2, title="D2 Point Gaps per Position Difference")
+def main() -> None:
+    analyse_seasons()
+
+
+if __name__ == "__main__":
+    main()
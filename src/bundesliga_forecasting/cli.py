@@ -0,0 +1,209 @@
+import argparse
+import sys
+from pathlib import Path
+
+from bundesliga_forecasting.BL_config import LEAGUE_JOBS, PATHS
+from bundesliga_forecasting.feature_engineering.F_config import STREAMING, WEIGHTS
+from bundesliga_forecasting.models.M_config import SEARCH
+
+# Only the standard library and the config dataclasses are imported here. Every
+# command imports its stage inside the handler, so that 'bundesliga --help' and
+# 'bundesliga predict' do not pay for pandas, scikit-learn or matplotlib.
+
+paths = PATHS
+search = SEARCH
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = _build_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        sys.exit(2)
+
+    if args.instrument or args.profile != "none":
+        from bundesliga_forecasting.BL_instrument import configure
+
+        configure(profile=args.profile)
+
+    args.handler(args)
+
+
+#################################################################
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="bundesliga", description="Bundesliga forecasting pipeline."
+    )
+    parser.add_argument(
+        "--instrument",
+        action="store_true",
+        help="Append per-stage measurements to the JSONL run log.",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=["none", "cprofile", "tracemalloc"],
+        default="none",
+        help="Dump a profile per stage (implies --instrument).",
+    )
+    commands = parser.add_subparsers(dest="command", metavar="command")
+
+    structure = commands.add_parser(
+        "structure", help="Clean, merge and prepare the raw CSV-files."
+    )
+    structure.set_defaults(handler=_structure)
+
+    features = commands.add_parser(
+        "features", help="Run the feature engineering stages."
+    )
+    features.add_argument(
+        "--stream",
+        action="store_true",
+        help="Process the seasons in chunks with bounded memory.",
+    )
+    features.add_argument(
+        "--seasons-per-chunk",
+        type=int,
+        default=STREAMING.seasons_per_chunk,
+        metavar="N",
+    )
+    features.set_defaults(handler=_features)
+
+    leagues = commands.add_parser(
+        "leagues", help="Structure and engineer every league in parallel."
+    )
+    leagues.add_argument("--league", nargs="+", default=None, metavar="CODE")
+    leagues.add_argument("--jobs", type=int, default=LEAGUE_JOBS)
+    leagues.set_defaults(handler=_leagues)
+
+    sweep = commands.add_parser(
+        "sweep", help="Compute the weight-dependent features for parameter grids."
+    )
+    sweep.add_argument(
+        "--rolling", type=int, nargs="+", default=[WEIGHTS.rolling], metavar="WINDOW"
+    )
+    sweep.add_argument(
+        "--history", type=float, nargs="+", default=[WEIGHTS.history], metavar="ALPHA"
+    )
+    sweep.set_defaults(handler=_sweep)
+
+    select = commands.add_parser(
+        "select", help="Elastic-Net feature selection and train/valid/test split."
+    )
+    _add_search_args(select)
+    select.set_defaults(handler=_select)
+
+    train = commands.add_parser(
+        "train", help="Train the Poisson regressor and save the model artifact."
+    )
+    _add_search_args(train)
+    train.set_defaults(handler=_train)
+
+    predict = commands.add_parser(
+        "predict", help="Predict goal rates with a saved model artifact."
+    )
+    predict.add_argument("input", type=Path, help="CSV file with the model features.")
+    predict.add_argument("-o", "--output", type=Path, default=None)
+    predict.add_argument("--model-dir", type=Path, default=paths.models)
+    predict.add_argument("--model-name", default=paths.model_name)
+    predict.set_defaults(handler=_predict)
+
+    analyse = commands.add_parser(
+        "analyse", help="Season-end point gaps between table positions."
+    )
+    analyse.add_argument("--no-plot", action="store_true")
+    analyse.set_defaults(handler=_analyse)
+
+    inspect = commands.add_parser(
+        "inspect", help="Print the season-end features of a team."
+    )
+    inspect.add_argument("--team", default="Karlsruhe")
+    inspect.add_argument("--rows", type=int, default=10)
+    inspect.set_defaults(handler=_inspect)
+
+    return parser
+
+
+def _add_search_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--search-mode", choices=["grid", "halving", "poisson"], default=search.mode
+    )
+    parser.add_argument(
+        "--time-budget", type=float, default=search.time_budget, metavar="SECONDS"
+    )
+
+
+def _structure(args: argparse.Namespace) -> None:
+    from bundesliga_forecasting.data_structuring.S_pipeline import data_structuring
+
+    data_structuring()
+
+
+def _features(args: argparse.Namespace) -> None:
+    if args.stream:
+        from bundesliga_forecasting.feature_engineering.F_streaming import (
+            stream_features,
+        )
+
+        stream_features(seasons_per_chunk=args.seasons_per_chunk)
+        return
+
+    from bundesliga_forecasting.feature_engineering.F_pipeline import (
+        feature_engineering,
+    )
+
+    feature_engineering()
+
+
+def _leagues(args: argparse.Namespace) -> None:
+    from bundesliga_forecasting.BL_leagues import run_leagues
+
+    run_leagues(args.league, n_jobs=args.jobs)
+
+
+def _sweep(args: argparse.Namespace) -> None:
+    from bundesliga_forecasting.feature_engineering.F_sweep import sweep_features
+
+    sweep_features(rolling=args.rolling, history=args.history)
+
+
+def _select(args: argparse.Namespace) -> None:
+    from bundesliga_forecasting.models.M01_elnet_feature_selection import data_setup
+
+    data_setup(search_mode=args.search_mode, time_budget=args.time_budget)
+
+
+def _train(args: argparse.Namespace) -> None:
+    from bundesliga_forecasting.models.M02_poisson_regressor import data_setup
+
+    data_setup(search_mode=args.search_mode, time_budget=args.time_budget)
+
+
+def _predict(args: argparse.Namespace) -> None:
+    from bundesliga_forecasting.models.M_predict import predict
+
+    rates = predict(
+        args.input,
+        args.output,
+        model_dir=args.model_dir,
+        model_name=args.model_name,
+    )
+    if args.output is None:
+        print("\n".join(f"{rate:.6f}" for rate in rates))
+
+
+def _analyse(args: argparse.Namespace) -> None:
+    from bundesliga_forecasting.analyse_seasons import analyse_seasons
+
+    analyse_seasons(plot=not args.no_plot)
+
+
+def _inspect(args: argparse.Namespace) -> None:
+    from bundesliga_forecasting.inspect_df import inspect_df
+
+    inspect_df(team=args.team, n_rows=args.rows)
+
+
+if __name__ == "__main__":
+    main()
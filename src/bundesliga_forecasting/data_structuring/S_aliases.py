@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from bundesliga_forecasting.BL_config import CSV_ENCODING
+from bundesliga_forecasting.BL_utils import check_columns
+from bundesliga_forecasting.data_structuring.S_config import RENAME_MAP
+
+logger = logging.getLogger(__name__)
+
+encoding = CSV_ENCODING
+ALIAS_COL = "Alias"
+TEAM_COL = "Team"
+
+
+class AliasTable:
+    """
+    Maps every known spelling of a team name to its canonical name. The
+    canonical names map to themselves, so that a name is known if and only if
+    it is found in the table.
+
+    Usage:
+        aliases = AliasTable.load(paths.aliases)
+        (home, away), unknown = aliases.resolve(df["HomeTeam"], df["AwayTeam"])
+    """
+
+    def __init__(self, aliases: dict[str, str], *, complete: bool) -> None:
+        names = {team: team for team in aliases.values()}
+        names.update(aliases)
+        self.spellings = pd.Index(list(names))
+        self.teams = np.array(list(names.values()), dtype=object)
+        # unknown names are only reported by a table which lists all teams
+        self.complete = complete
+
+    @classmethod
+    def load(cls, path: Path, *, encoding: str = encoding) -> AliasTable:
+        """
+        Description:
+            Reads the alias table (columns 'Alias' and 'Team', further columns
+            such as the league or the data source are ignored) on top of the
+            built-in RENAME_MAP. Without a file only the built-in aliases are
+            applied.
+        """
+        if not path.exists():
+            logger.info("No alias table at %s, using the built-in aliases.", path)
+            return cls(dict(RENAME_MAP), complete=False)
+
+        table = pd.read_csv(path, encoding=encoding, dtype=str)
+        check_columns(table, [ALIAS_COL, TEAM_COL])
+        table = pd.DataFrame(
+            {col: table[col].str.strip() for col in [ALIAS_COL, TEAM_COL]}
+        ).drop_duplicates()
+        conflicts = table[table[ALIAS_COL].duplicated(keep=False)]
+        if not conflicts.empty:
+            raise ValueError(
+                "Aliases with more than one team: "
+                f"{sorted(conflicts[ALIAS_COL].unique())}."
+            )
+        aliases = dict(RENAME_MAP)
+        aliases.update(zip(table[ALIAS_COL], table[TEAM_COL]))
+        logger.info(
+            "Loaded %d aliases of %d teams.", len(table), table[TEAM_COL].nunique()
+        )
+        return cls(aliases, complete=True)
+
+    def resolve(self, *columns: pd.Series) -> tuple[list[pd.Series], list[str]]:
+        """
+        Description:
+            Step 1 -> Factorize the names of all columns together
+            Step 2 -> Strip and look up the unique names in the table
+            Step 3 -> Map the codes back to the rows, missing names stay
+                      missing
+
+            The lookups scale with the number of unique names, the rows are
+            only touched by the factorization and the final take.
+
+        Returns:
+            tuple[list[pd.Series], list[str]]: The columns with canonical names
+            and the unknown names (empty unless the table is complete).
+        """
+        codes, uniques = pd.factorize(pd.concat(columns, ignore_index=True))
+        names = pd.Index(uniques.astype(str)).str.strip()
+        positions = self.spellings.get_indexer(names)
+        known = positions >= 0
+        resolved = np.where(known, self.teams[positions], names).astype(object)
+        # missing names have the code -1, which picks the appended NaN
+        resolved = np.append(resolved, np.nan)
+
+        rows = np.cumsum([0] + [len(column) for column in columns])
+        resolved_columns = [
+            pd.Series(resolved[codes[start:end]], index=column.index, name=column.name)
+            for column, start, end in zip(columns, rows[:-1], rows[1:])
+        ]
+        unknown = sorted(names[~known]) if self.complete else []
+        return resolved_columns, unknown
@@ -6,6 +6,8 @@ from dataclasses import dataclass, field
 
 SEASON_COL = "Season"
 SEASON_START_MONTH = 7
+# date formats of the cleaned files, detected once per file
+DATE_FORMATS = ("%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%d/%m/%Y", "%d/%m/%y")
 
 RENAME_MAP = {
     "Dusseldorf": "Fortuna Dusseldorf",
@@ -65,7 +67,63 @@ class ColumnLists:
         ]
     )
     team: list[str] = field(default_factory=lambda: ["HomeTeam", "AwayTeam"])
+    # identity of a match across the cleaned files and its result
+    match_key: list[str] = field(
+        default_factory=lambda: ["Div", "Date", "HomeTeam", "AwayTeam"]
+    )
+    score: list[str] = field(default_factory=lambda: ["FTHG", "FTAG"])
     sort_by: list[str] = field(default_factory=lambda: ["Season", "Div", "Date"])
 
 
 COLUMNLISTS = ColumnLists()
+
+
+@dataclass(frozen=True)
+class League:
+    # football-data.co.uk division codes, top division first
+    divisions: tuple[str, ...]
+
+    @property
+    def levels(self) -> dict[str, int]:
+        return {code: level for level, code in enumerate(self.divisions, start=1)}
+
+
+# keyed by the football-data.co.uk country code
+LEAGUES = {
+    "D": League(divisions=("D1", "D2")),
+    "E": League(divisions=("E0", "E1", "E2", "E3")),
+    "F": League(divisions=("F1", "F2")),
+    "I": League(divisions=("I1", "I2")),
+    "SP": League(divisions=("SP1", "SP2")),
+    "N": League(divisions=("N1",)),
+    "P": League(divisions=("P1",)),
+    "B": League(divisions=("B1",)),
+    "T": League(divisions=("T1",)),
+    "G": League(divisions=("G1",)),
+    "SC": League(divisions=("SC0", "SC1", "SC2", "SC3")),
+}
+# division code -> league code, e.g. "E0" -> "E"
+DIVISION_LEAGUES = {
+    div: code for code, league in LEAGUES.items() for div in league.divisions
+}
+
+
+@dataclass(frozen=True)
+class Synthetic:
+    n_leagues: int = 1
+    n_divisions: int = 2
+    n_teams: int = 18
+    n_seasons: int = 60
+    first_season: int = 1963
+    churn: int = 3
+    seed: int = 42
+    base_rate: float = 1.3
+    home_advantage: float = 0.2
+    strength_sd: float = 0.3
+    strength_drift: float = 0.1
+    division_gap: float = 0.25
+    mixed_date_rate: float = 0.05
+    blank_line_rate: float = 0.01
+
+
+SYNTHETIC = Synthetic()
@@ -1,6 +1,6 @@
 import logging
 
-from bundesliga_forecasting.BL_config import setup_logging
+from bundesliga_forecasting.BL_config import PATHS, Paths, setup_logging
 from bundesliga_forecasting.data_structuring.structure.S01_clean import clean
 from bundesliga_forecasting.data_structuring.structure.S02_merge import merge
 from bundesliga_forecasting.data_structuring.structure.S03_prepare import prepare
@@ -8,14 +8,14 @@ from bundesliga_forecasting.data_structuring.structure.S03_prepare import prepar
 logger = logging.getLogger(__name__)
 
 
-def data_structuring() -> None:
+def data_structuring(paths: Paths = PATHS) -> None:
     setup_logging()
 
     logger.info("Starting data structuring pipeline...")
 
-    clean()
-    merge()
-    prepare()
+    clean(paths.raw, paths.cleaned)
+    merge(paths.cleaned, paths.merged)
+    prepare(paths.merged, paths.prepared)
 
     logger.info("Data structuring pipeline finished successfully.")
 
@@ -0,0 +1,300 @@
+from __future__ import annotations
+
+import logging
+from datetime import date, timedelta
+from itertools import product
+from pathlib import Path
+
+import numpy as np
+
+from bundesliga_forecasting.BL_config import CSV_ENCODING, PATHS, setup_logging
+from bundesliga_forecasting.BL_instrument import instrumented
+from bundesliga_forecasting.BL_utils import ensure_dir
+from bundesliga_forecasting.data_structuring.S_config import (
+    COLUMNLISTS,
+    LEAGUES,
+    SYNTHETIC,
+)
+
+logger = logging.getLogger(__name__)
+
+paths = PATHS
+col_lists = COLUMNLISTS
+encoding = CSV_ENCODING
+synthetic = SYNTHETIC
+
+# two-digit years are parsed relative to the current date, so they are only
+# written where the century cannot be resolved wrongly
+TWO_DIGIT_YEARS = range(1990, 2040)
+SEASON_DAYS = 280
+SYLLABLES = (
+    "Ber", "Dor", "Ham", "Mun", "Kol", "Bre", "Lev", "Sch", "Wol", "Stu",
+    "Fra", "Hof", "Aug", "Mai", "Fre", "Bie", "Nur", "Kai", "Bo", "Dui",
+    "lin", "den", "burg", "chen", "feld", "hausen", "stadt", "heim", "au", "tal",
+)  # fmt: skip
+PREFIXES = ("FC", "SV", "VfB", "TSV", "SC", "VfL", "SpVgg", "Borussia")
+
+
+@instrumented
+def generate_raw_data(
+    target_dir: Path = paths.raw,
+    *,
+    n_leagues: int = synthetic.n_leagues,
+    n_divisions: int = synthetic.n_divisions,
+    n_teams: int = synthetic.n_teams,
+    n_seasons: int = synthetic.n_seasons,
+    first_season: int = synthetic.first_season,
+    churn: int = synthetic.churn,
+    seed: int = synthetic.seed,
+    encoding: str = encoding,
+) -> None:
+    """
+    Description:
+        Writes synthetic match results in the raw football-data format, one file
+        per division and season, to load test the pipeline offline.
+        Step 1 -> Draw unique team names and latent team strengths per league
+        Step 2 -> For every season build a double round robin per division and
+                  draw the goals from Poisson rates given by the strengths
+        Step 3 -> Write the file with mixed date formats and stray blank lines
+        Step 4 -> Promote/relegate the 'churn' best/worst teams between adjacent
+                  divisions and let the strengths drift
+
+        The output only depends on the arguments, equal seeds give identical
+        files.
+
+    Usage location:
+        data_structuring/structure/S00_synthetic.py
+
+    Args:
+        target_dir (Path): Directory for the raw CSV-files.
+        n_leagues (int): Number of independent leagues (countries).
+        n_divisions (int): Number of divisions per league.
+        n_teams (int): Number of teams per division, must be even.
+        n_seasons (int): Number of seasons.
+        first_season (int): Starting year of the first season.
+        churn (int): Number of promoted/relegated teams between two divisions.
+        seed (int): Seed of the random generator.
+    """
+    if n_teams < 2 or n_teams % 2:
+        raise ValueError(f"The variable 'n_teams' must be even, got {n_teams}.")
+    if not 0 <= churn <= n_teams // 2:
+        raise ValueError(
+            f"The variable 'churn' must be between 0 and {n_teams // 2}, got {churn}."
+        )
+    # configured leagues with a ladder of at least 'n_divisions' divisions
+    ladders = [
+        league.divisions
+        for league in LEAGUES.values()
+        if len(league.divisions) >= n_divisions
+    ]
+    if n_leagues > len(ladders):
+        raise ValueError(
+            f"At most {len(ladders)} leagues with {n_divisions} divisions are configured."
+        )
+    n_rounds = 2 * (n_teams - 1)
+    if n_rounds > SEASON_DAYS:
+        raise ValueError(f"{n_teams} teams do not fit into one season.")
+
+    logger.info("Starting synthetic data generation...")
+    ensure_dir([target_dir], ["target"])
+
+    rng = np.random.default_rng(seed)
+    names = _team_names(n_leagues * n_divisions * n_teams, rng)
+    home_idx, away_idx = _round_robin(n_teams)
+
+    n_files = 0
+    n_matches = 0
+    for league in range(n_leagues):
+        ladder = ladders[league]
+        offset = league * n_divisions * n_teams
+        # divisions[d] holds the team ids of division d, ordered by last rank
+        divisions = np.arange(n_divisions * n_teams).reshape(n_divisions, n_teams)
+        strength = rng.normal(0.0, synthetic.strength_sd, size=divisions.size)
+        strength -= np.repeat(np.arange(n_divisions), n_teams) * synthetic.division_gap
+
+        for season in range(first_season, first_season + n_seasons):
+            ranked = np.empty_like(divisions)
+            for division, teams in enumerate(divisions):
+                home = teams[home_idx]
+                away = teams[away_idx]
+                diff = strength[home] - strength[away]
+                log_rate = np.log(synthetic.base_rate)
+                home_goals = rng.poisson(
+                    np.exp(log_rate + diff + synthetic.home_advantage)
+                )
+                away_goals = rng.poisson(np.exp(log_rate - diff))
+                home_goals = home_goals.reshape(n_rounds, -1)
+                away_goals = away_goals.reshape(n_rounds, -1)
+
+                div_code = ladder[division]
+                lines = _format_lines(
+                    div_code,
+                    _match_dates(season, n_rounds, home_idx.shape[1], rng),
+                    names[offset + home].ravel(),
+                    names[offset + away].ravel(),
+                    home_goals.ravel(),
+                    away_goals.ravel(),
+                    two_digit=season in TWO_DIGIT_YEARS and season < 2017,
+                    rng=rng,
+                )
+                with open(
+                    target_dir / f"{div_code}_{season}.csv", "w", encoding=encoding
+                ) as f:
+                    f.write("\n".join(lines) + "\n")
+
+                ranked[division] = _final_ranking(
+                    teams, home.ravel(), away.ravel(), home_goals, away_goals
+                )
+                n_files += 1
+                n_matches += home_goals.size
+
+            divisions = _promote_relegate(ranked, churn)
+            strength += rng.normal(0.0, synthetic.strength_drift, size=strength.size)
+
+    logger.info(
+        f"{n_files} files with {n_matches} matches generated and saved in {target_dir}."
+    )
+
+
+#################################################################
+
+
+def _team_names(n_names: int, rng: np.random.Generator) -> np.ndarray:
+    towns = [
+        f"{first}{second.lower()}{third}"
+        for first, second, third in product(SYLLABLES[:20], SYLLABLES, SYLLABLES[20:])
+    ]
+    if n_names > len(towns):
+        raise ValueError(f"At most {len(towns)} teams are supported, got {n_names}.")
+    picks = rng.choice(len(towns), size=n_names, replace=False)
+    prefixes = rng.choice(len(PREFIXES), size=n_names)
+    return np.array(
+        [f"{PREFIXES[p]} {towns[t]}" for p, t in zip(prefixes, picks)], dtype=object
+    )
+
+
+def _round_robin(n_teams: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Description:
+        Circle method: team 0 stays fixed while the others rotate, the second
+        half of the season mirrors the first with swapped venues.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Home and away indices of shape
+        (2 * (n_teams - 1), n_teams / 2).
+    """
+    rotation = np.arange(1, n_teams)
+    home_rounds = []
+    away_rounds = []
+    for round_ in range(n_teams - 1):
+        order = np.concatenate([[0], np.roll(rotation, round_)])
+        first, second = order[: n_teams // 2], order[::-1][: n_teams // 2]
+        # alternate the venue of the fixed team
+        if round_ % 2:
+            first, second = second, first
+        home_rounds.append(first)
+        away_rounds.append(second)
+    home = np.array(home_rounds)
+    away = np.array(away_rounds)
+    return np.vstack([home, away]), np.vstack([away, home])
+
+
+def _match_dates(
+    season: int, n_rounds: int, n_pairs: int, rng: np.random.Generator
+) -> list[date]:
+    start = date(season, 8, 1)
+    round_days = np.linspace(0, SEASON_DAYS, n_rounds).astype(int)
+    # matches of a round are spread over up to three consecutive days
+    offsets = rng.integers(0, 3, size=(n_rounds, n_pairs))
+    spacing = np.diff(round_days, append=SEASON_DAYS + 3)
+    offsets = np.minimum(offsets, spacing[:, None] - 1)
+    days = (round_days[:, None] + offsets).ravel()
+    return [start + timedelta(days=int(day)) for day in days]
+
+
+def _format_lines(
+    div_code: str,
+    dates: list[date],
+    home_teams: np.ndarray,
+    away_teams: np.ndarray,
+    home_goals: np.ndarray,
+    away_goals: np.ndarray,
+    *,
+    two_digit: bool,
+    rng: np.random.Generator,
+) -> list[str]:
+    # football-data files switched from dd/mm/yy to dd/mm/yyyy over time, some
+    # rows of a file deviate from its main format
+    mixed = rng.random(len(dates)) < synthetic.mixed_date_rate
+    short = np.logical_xor(mixed, two_digit) & (
+        dates[0].year in TWO_DIGIT_YEARS and dates[-1].year in TWO_DIGIT_YEARS
+    )
+    formatted = {
+        (day, is_short): day.strftime("%d/%m/%y" if is_short else "%d/%m/%Y")
+        for day, is_short in set(zip(dates, short.tolist()))
+    }
+    result = np.where(
+        home_goals > away_goals, "H", np.where(home_goals < away_goals, "A", "D")
+    )
+
+    lines = [",".join(col_lists.raw + ["FTR"])]
+    for i, day in enumerate(dates):
+        lines.append(
+            f"{div_code},{formatted[day, short[i]]},{home_teams[i]},{away_teams[i]},"
+            f"{home_goals[i]},{away_goals[i]},{result[i]}"
+        )
+
+    # exports often contain empty records, both bare and as a row of commas
+    blank = np.flatnonzero(rng.random(len(lines)) < synthetic.blank_line_rate)
+    for position in blank[::-1]:
+        if position > 0:
+            lines.insert(position, "" if position % 2 else ",,,,,,")
+    lines.append(",,,,,,")
+    return lines
+
+
+def _final_ranking(
+    teams: np.ndarray,
+    home: np.ndarray,
+    away: np.ndarray,
+    home_goals: np.ndarray,
+    away_goals: np.ndarray,
+) -> np.ndarray:
+    home_goals = home_goals.ravel()
+    away_goals = away_goals.ravel()
+    home_points = np.where(
+        home_goals > away_goals, 3, np.where(home_goals == away_goals, 1, 0)
+    )
+    away_points = np.where(
+        away_goals > home_goals, 3, np.where(home_goals == away_goals, 1, 0)
+    )
+    local_home = np.searchsorted(np.sort(teams), home)
+    local_away = np.searchsorted(np.sort(teams), away)
+    size = len(teams)
+    points = np.bincount(local_home, home_points, size) + np.bincount(
+        local_away, away_points, size
+    )
+    goaldiff = np.bincount(local_home, home_goals - away_goals, size) + np.bincount(
+        local_away, away_goals - home_goals, size
+    )
+    order = np.lexsort((-goaldiff, -points))
+    return np.sort(teams)[order]
+
+
+def _promote_relegate(ranked: np.ndarray, churn: int) -> np.ndarray:
+    divisions = ranked.copy()
+    if churn == 0:
+        return divisions
+    for upper in range(len(ranked) - 1):
+        divisions[upper, -churn:] = ranked[upper + 1, :churn]
+        divisions[upper + 1, :churn] = ranked[upper, -churn:]
+    return divisions
+
+
+def main() -> None:
+    setup_logging()
+    generate_raw_data()
+
+
+if __name__ == "__main__":
+    main()
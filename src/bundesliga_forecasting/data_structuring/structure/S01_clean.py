@@ -6,8 +6,10 @@ from pathlib import Path
 import pandas as pd
 
 from bundesliga_forecasting.BL_config import COLUMNS, CSV_ENCODING, PATHS
+from bundesliga_forecasting.BL_instrument import instrumented
 from bundesliga_forecasting.BL_utils import ensure_dir, save_to_csv
-from bundesliga_forecasting.data_structuring.S_config import COLUMNLISTS, RENAME_MAP
+from bundesliga_forecasting.data_structuring.S_aliases import AliasTable
+from bundesliga_forecasting.data_structuring.S_config import COLUMNLISTS
 from bundesliga_forecasting.data_structuring.S_utils import detect_csv_files
 
 logger = logging.getLogger(__name__)
@@ -18,18 +20,21 @@ encoding = CSV_ENCODING
 cols = COLUMNS
 
 
+@instrumented
 def clean(
     src_dir: Path = paths.raw,
     target_dir: Path = paths.cleaned,
     *,
+    alias_file: Path = paths.aliases,
     encoding: str = encoding,
 ) -> None:
     """
     Description:
         Step 1 -> Read the lines of each CSV-file in the source directory
         Step 2 -> Create the data frame with required columns & remove empty rows and spaces
-        Step 3 -> Adjust team names
+        Step 3 -> Resolve the team names with the alias table
         Step 4 -> Save the data frame to the target directory
+        Step 5 -> Report the team names missing in the alias table
 
     Usage location:
         data_creation/pipeline.py
@@ -37,6 +42,7 @@ def clean(
     Args:
         src_dir (Path): _description_
         target_dir (Path): _description_
+        alias_file (Path): Alias table of the team names, see 'AliasTable'.
         col_names (list[str]): _description_
         rename_map (dict[str, str]): _description_
         encoding (str, optional): _description_. Defaults to "latin1".
@@ -47,6 +53,8 @@ def clean(
     ensure_dir([src_dir, target_dir], ["src", "target"])
 
     csv_files = detect_csv_files(src_dir)
+    aliases = AliasTable.load(alias_file)
+    unknown: set[str] = set()
 
     for file in csv_files:
         logger.info("Processing: %s", file.name)
@@ -61,11 +69,20 @@ def clean(
             )
 
             # Step 3:
-            df = _adjust_team_names(df)
+            df, file_unknown = _adjust_team_names(df, aliases)
+            unknown.update(file_unknown)
 
             # Step 4:
             save_to_csv(df, target_dir / file.name)
 
+    # Step 5:
+    if unknown:
+        logger.warning(
+            "%d team names are not in the alias table: %s",
+            len(unknown),
+            sorted(unknown),
+        )
+
     logger.info(
         f"{len(csv_files)} files cleaned successfully and saved in {target_dir}."
     )
@@ -118,23 +135,23 @@ def _extract_columns(
 
 def _adjust_team_names(
     df: pd.DataFrame,
+    aliases: AliasTable,
     team_cols: list[str] = col_lists.team,
-    rename_teams: dict[str, str] = RENAME_MAP,
-) -> pd.DataFrame:
+) -> tuple[pd.DataFrame, list[str]]:
     """
     Description:
+        Replaces the names in the team columns by their canonical names. Only
+        the unique names are stripped and looked up, the other columns are
+        left untouched.
 
     Usage location:
-        data_creation/io/clean.py
-
-    Args:
-        df (pd.DataFrame): _description_
-        col_names (list[str]): _description_
-        rename_map (dict[str, str]): _description_
+        data_structuring/structure/S01_clean.py
 
     Returns:
-        pd.DataFrame: _description_
+        tuple[pd.DataFrame, list[str]]: The data frame and the team names
+        missing in the alias table.
     """
-    df[team_cols] = df[team_cols].apply(lambda col: col.str.strip())
-
-    return df.replace(rename_teams)
+    resolved, unknown = aliases.resolve(*(df[col] for col in team_cols))
+    for col, names in zip(team_cols, resolved):
+        df[col] = names
+    return df, unknown
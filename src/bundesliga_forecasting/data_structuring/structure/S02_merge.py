@@ -1,34 +1,62 @@
 import logging
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
-from bundesliga_forecasting.BL_config import COLUMNS, PATHS
-from bundesliga_forecasting.BL_utils import ensure_dir, read_csv, save_to_csv
+from bundesliga_forecasting.BL_config import (
+    COLUMNS,
+    CSV_ENCODING,
+    MERGE_THREADS,
+    PATHS,
+)
+from bundesliga_forecasting.BL_instrument import instrumented, record_input
+from bundesliga_forecasting.BL_utils import check_columns, ensure_dir, save_to_csv
+from bundesliga_forecasting.data_structuring.S_config import COLUMNLISTS, DATE_FORMATS
 from bundesliga_forecasting.data_structuring.S_utils import detect_csv_files
 
 logger = logging.getLogger(__name__)
 paths = PATHS
+encoding = CSV_ENCODING
 cols = COLUMNS
+col_lists = COLUMNLISTS
 
 
+@instrumented
 def merge(
     src_dir: Path = paths.cleaned,
     target_dir: Path = paths.merged,
     target_file: str = paths.merged_file,
+    conflicts_file: str = paths.merge_conflicts_file,
+    *,
+    n_threads: int = MERGE_THREADS,
 ) -> None:
     """
     Description:
-        1st - Concatinate all CSV-files onto each other in one data frame
-        2nd - SSave the data frame to the target directory
+        1st - Read the CSV-files concurrently and look up every match, in file
+              order, in a hash index of the matches read so far, keyed by
+              (Div, Date, HomeTeam, AwayTeam)
+        2nd - Keep the first row of every match, drop exact duplicates and
+              set rows with a different score aside as conflicts
+        3rd - Copy the kept rows into one preallocated array per column and
+              save them to the target directory, the conflicts next to them
+
+        Overlapping files, e.g. a season downloaded twice or from two sources,
+        no longer duplicate matches in the merged file.
 
     Usage location:
-        data_creation/pipeline.py
+        data_structuring/S_pipeline.py
 
     Args:
-        src_dir (Path): _description_
-        target_dir (Path): _description_
-        col_names (list[str]): _description_
+        src_dir (Path): Directory of the cleaned CSV-files.
+        target_dir (Path): Directory of the merged file.
+        target_file (str): Name of the merged file.
+        conflicts_file (str): Name of the file with the conflicting rows, only
+            written if there are any.
+        n_threads (int): Maximum number of files read at the same time.
     """
 
     logger.info("Starting file merging...")
@@ -36,13 +64,137 @@ def merge(
     ensure_dir([src_dir, target_dir], ["src", "target"])
 
     output_path = target_dir / target_file
+    conflicts_path = target_dir / conflicts_file
 
-    csv_files = detect_csv_files(src_dir)
+    # the first file of a match wins, so the order must not depend on the file system
+    csv_files = sorted(detect_csv_files(src_dir))
 
-    df = pd.concat((read_csv(file) for file in csv_files), ignore_index=True)
+    df, conflicts, n_duplicates = merge_matches(
+        read_cleaned(csv_files, n_threads=n_threads)
+    )
 
     save_to_csv(df, output_path)
+    conflicts_path.unlink(missing_ok=True)
+    if n_duplicates:
+        logger.info("Dropped %d duplicate matches.", n_duplicates)
+    if not conflicts.empty:
+        logger.warning(
+            "%d matches with conflicting scores, the first score is kept. "
+            "The other rows are saved in %s.",
+            len(conflicts),
+            conflicts_path,
+        )
+        save_to_csv(conflicts, conflicts_path)
 
     logger.info(
         f"{len(csv_files)} files merged successfully and saved in {output_path}."
     )
+
+
+def merge_matches(
+    frames: Iterable[pd.DataFrame],
+) -> tuple[pd.DataFrame, pd.DataFrame, int]:
+    """
+    Description:
+        Merges the frames in order, each match once. The index maps the hash
+        of a match key to the hash of its first score, so it holds two
+        integers per match and every row is looked up in constant time.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame, int]: The unique matches, the rows
+        whose score conflicts with the first row of their match and the
+        number of exact duplicates.
+    """
+    index: dict[int, int] = {}
+    kept, conflicts = [], []
+    n_duplicates = 0
+    for df in frames:
+        check_columns(df, col_lists.match_key + col_lists.score)
+        record_input(df)
+        keep, conflict = _index_matches(df, index)
+        n_duplicates += int((~keep & ~conflict).sum())
+        kept.append((df, keep))
+        conflicts.append(df[conflict])
+
+    return (
+        _concat_rows(kept),
+        pd.concat(conflicts, ignore_index=True),
+        n_duplicates,
+    )
+
+
+def read_cleaned(
+    csv_files: list[Path], *, n_threads: int = MERGE_THREADS
+) -> Iterator[pd.DataFrame]:
+    """
+    Description:
+        Yields the cleaned files in the given order while up to 'n_threads'
+        of them are read in the background. The parser releases the GIL for
+        most of its work, so the reads overlap with each other and with the
+        merging of the files already yielded.
+    """
+    n_workers = max(1, min(n_threads, len(csv_files)))
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        yield from executor.map(_read_cleaned, csv_files)
+
+
+#################################################################
+
+
+def _index_matches(
+    df: pd.DataFrame, index: dict[int, int]
+) -> tuple[np.ndarray, np.ndarray]:
+    keys = pd.util.hash_pandas_object(df[col_lists.match_key], index=False)
+    scores = pd.util.hash_pandas_object(df[col_lists.score], index=False)
+
+    keep = np.zeros(len(df), dtype=bool)
+    conflict = np.zeros(len(df), dtype=bool)
+    for row, (key, score) in enumerate(zip(keys.tolist(), scores.tolist())):
+        first = index.get(key)
+        if first is None:
+            index[key] = score
+            keep[row] = True
+        elif first != score:
+            conflict[row] = True
+    return keep, conflict
+
+
+def _read_cleaned(file: Path) -> pd.DataFrame:
+    df = pd.read_csv(file, encoding=encoding)
+    # one format per file instead of inferring it for every date
+    date_format = _detect_date_format(df[cols.date])
+    df[cols.date] = pd.to_datetime(df[cols.date], format=date_format, errors="raise")
+    return df
+
+
+def _detect_date_format(dates: pd.Series) -> str:
+    values = dates.dropna()
+    if values.empty:
+        return DATE_FORMATS[0]
+    sample = str(values.iloc[0])
+    for date_format in DATE_FORMATS:
+        try:
+            datetime.strptime(sample, date_format)
+        except ValueError:
+            continue
+        return date_format
+    raise ValueError(f"Unknown date format: {sample!r}.")
+
+
+def _concat_rows(parts: list[tuple[pd.DataFrame, np.ndarray]]) -> pd.DataFrame:
+    # the kept rows of all frames, written once into arrays of the final size
+    columns = parts[0][0].columns
+    n_rows = sum(int(keep.sum()) for _, keep in parts)
+    arrays = {}
+    for col in columns:
+        values = [df[col].to_numpy() for df, _ in parts]
+        array = np.empty(
+            n_rows, dtype=np.result_type(*(value.dtype for value in values))
+        )
+        start = 0
+        for value, (_, keep) in zip(values, parts):
+            end = start + int(keep.sum())
+            array[start:end] = value[keep]
+            start = end
+        arrays[col] = array
+    return pd.DataFrame(arrays)
@@ -8,6 +8,7 @@ import pandas as pd
 from pandas.api.types import is_datetime64_any_dtype
 
 from bundesliga_forecasting.BL_config import COLUMNS, PATHS
+from bundesliga_forecasting.BL_instrument import instrumented
 from bundesliga_forecasting.BL_utils import (
     df_sort,
     ensure_dir,
@@ -16,6 +17,7 @@ from bundesliga_forecasting.BL_utils import (
 )
 from bundesliga_forecasting.data_structuring.S_config import (
     COLUMNLISTS,
+    LEAGUES,
     SEASON_START_MONTH,
 )
 
@@ -26,6 +28,7 @@ col_lists = COLUMNLISTS
 cols = COLUMNS
 
 
+@instrumented
 def prepare(
     src_dir: Path = paths.merged,
     target_dir: Path = paths.prepared,
@@ -113,7 +116,17 @@ def _add_season(
 
 
 def _division_indicator(df: pd.DataFrame) -> pd.DataFrame:
-    df[cols.div] = np.where(df[cols.div] == "D1", 1, 2)
+    # level of the division within its league's ladder, 1 for the top division
+    levels = {
+        code: level
+        for league in LEAGUES.values()
+        for code, level in league.levels.items()
+    }
+    div = df[cols.div].map(levels)
+    if div.isna().any():
+        unknown = sorted(df.loc[div.isna(), cols.div].astype(str).unique())
+        raise ValueError(f"Divisions without a configured league: {unknown}.")
+    df[cols.div] = div.astype(int)
     return df
 
 
@@ -12,6 +12,7 @@ class Weights:
     season: float = 0.4
     history: float = 0.75
     rolling: int = 5
+    head_to_head: float = 0.3
 
 
 WEIGHTS = Weights()
@@ -26,6 +27,59 @@ class Zones:
 ZONES = Zones()
 
 
+@dataclass(frozen=True)
+class MomentumBank:
+    # None is the season to date
+    windows: tuple[int | None, ...] = (3, 5, 10, None)
+    half_lives: tuple[float, ...] = (2.0, 5.0)
+
+
+MOMENTUM_BANK = MomentumBank()
+
+
+@dataclass(frozen=True)
+class Elo:
+    initial: float = 1500.0
+    k: float = 20.0
+    home_advantage: float = 65.0
+    scale: float = 400.0
+    # share of the distance to the initial rating removed at every season start
+    season_regression: float = 0.25
+
+
+ELO = Elo()
+
+
+@dataclass(frozen=True)
+class StrengthOfSchedule:
+    ridge: float = 5.0
+    tol: float = 1e-6
+    max_iter: int = 200
+
+
+SOS = StrengthOfSchedule()
+
+
+@dataclass(frozen=True)
+class Rest:
+    # rest days are capped, so that the summer and winter breaks do not dominate
+    max_days: int = 28
+    windows: tuple[int, ...] = (7, 14, 28)
+
+
+REST = Rest()
+
+
+@dataclass(frozen=True)
+class Streaming:
+    seasons_per_chunk: int = 1
+    # rows per read of the prepared file
+    read_rows: int = 50_000
+
+
+STREAMING = Streaming()
+
+
 PREV_RANK_COLS = [
     COLUMNS.prev_tpoints,
     COLUMNS.prev_tgoaldiff,
@@ -38,6 +92,14 @@ POST_RANK_COLS = [
     COLUMNS.post_tgoalsf,
 ]
 
+# post-match totals persisted by the standings store
+STANDINGS_COLS = POST_RANK_COLS + [
+    COLUMNS.post_tgoalsa,
+    COLUMNS.post_twins,
+    COLUMNS.post_tdraws,
+    COLUMNS.post_tlosses,
+]
+
 MATCH_COLS = [
     COLUMNS.goalsf,
     COLUMNS.goalsa,
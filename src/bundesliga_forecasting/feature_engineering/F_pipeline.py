@@ -1,6 +1,6 @@
 import logging
 
-from bundesliga_forecasting.BL_config import setup_logging
+from bundesliga_forecasting.BL_config import PATHS, Paths, setup_logging
 from bundesliga_forecasting.feature_engineering.features.F01_score import (
     add_score_features,
 )
@@ -25,23 +25,39 @@ from bundesliga_forecasting.feature_engineering.features.F07_history import (
 from bundesliga_forecasting.feature_engineering.features.F08_combine import (
     apply_feature_combination,
 )
+from bundesliga_forecasting.feature_engineering.features.F09_head_to_head import (
+    add_head_to_head,
+)
+from bundesliga_forecasting.feature_engineering.features.F10_elo import (
+    add_elo_ratings,
+)
+from bundesliga_forecasting.feature_engineering.features.F11_strength_of_schedule import (
+    add_strength_of_schedule,
+)
+from bundesliga_forecasting.feature_engineering.features.F12_rest_days import (
+    add_rest_days,
+)
 
 logger = logging.getLogger(__name__)
 
 
-def feature_engineering() -> None:
+def feature_engineering(paths: Paths = PATHS) -> None:
     setup_logging()
 
     logger.info("Starting feature engineering pipeline...")
 
-    add_score_features()
-    add_daily_comparisons()
-    add_momentum()
-    add_season_performance()
-    add_prev_season_performance()
-    add_relprom_effects()
-    add_historical_features()
-    apply_feature_combination()
+    add_score_features(paths.prepared, paths.features)
+    add_daily_comparisons(paths.features, paths.features)
+    add_momentum(paths.features, paths.features)
+    add_season_performance(paths.features, paths.features)
+    add_prev_season_performance(paths.features, paths.features)
+    add_relprom_effects(paths.features, paths.features)
+    add_historical_features(paths.features, paths.features)
+    add_head_to_head(paths.features, paths.features)
+    add_elo_ratings(paths.features, paths.features)
+    add_strength_of_schedule(paths.features, paths.features)
+    add_rest_days(paths.features, paths.features)
+    apply_feature_combination(paths.features, paths.features)
 
     logger.info("Feature engineering pipeline finished successfully.")
 
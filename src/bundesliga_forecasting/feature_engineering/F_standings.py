@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from bundesliga_forecasting.BL_utils import check_columns
+from bundesliga_forecasting.feature_engineering.F_config import (
+    COLUMNS,
+    POST_RANK_COLS,
+    STANDINGS_COLS,
+)
+from bundesliga_forecasting.feature_engineering.F_utils import rank_key
+
+logger = logging.getLogger(__name__)
+cols = COLUMNS
+
+# bits reserved for the day offset in the (team, day) search key of a block
+DAY_BITS = 20
+
+
+def save_standings(df: pd.DataFrame, output_path: Path) -> None:
+    """
+    Description:
+        Persists the post-match totals of every team-match row, i.e. the points
+        at which a team's table entry changes, as one sorted block per
+        (season, div). Within a block the rows are ordered by team and date,
+        so that the state of every team at any date is one binary search away.
+
+    Usage location:
+        feature_engineering/features/F02_daily_table.py
+
+    Args:
+        df (pd.DataFrame): Team-match rows with the post-match totals.
+        output_path (Path): Target '.npz' file.
+    """
+    check_columns(df, [cols.season, cols.div, cols.date, cols.team] + STANDINGS_COLS)
+    logger.info("Saving the standings store...")
+
+    team_codes, teams = pd.factorize(df[cols.team], sort=True)
+    blocks = df.groupby([cols.season, cols.div], sort=True).ngroup().to_numpy()
+    days = df[cols.date].to_numpy().astype("datetime64[D]").astype(np.int64)
+    order = np.lexsort((days, team_codes, blocks))
+
+    blocks = blocks[order]
+    block_start = np.searchsorted(blocks, np.arange(blocks.max() + 2))
+    first_rows = order[block_start[:-1]]
+
+    np.savez_compressed(
+        output_path,
+        teams=np.asarray(teams, dtype=str),
+        block_season=df[cols.season].to_numpy()[first_rows],
+        block_div=df[cols.div].to_numpy()[first_rows],
+        block_start=block_start,
+        team=team_codes[order].astype(np.int32),
+        day=days[order].astype(np.int32),
+        **{col: df[col].to_numpy(dtype=np.int32)[order] for col in STANDINGS_COLS},
+    )
+
+
+class StandingsStore:
+    """
+    Point-in-time league tables read from the file written by F02.
+
+    Usage:
+        store = StandingsStore.load(paths.features / paths.standings_file)
+        store.standings(2023, 1, "2024-02-10")
+    """
+
+    def __init__(self, arrays: dict[str, np.ndarray]) -> None:
+        self.teams = arrays["teams"]
+        self.block_season = arrays["block_season"]
+        self.block_div = arrays["block_div"]
+        self.block_start = arrays["block_start"]
+        self.team = arrays["team"]
+        self.day = arrays["day"].astype(np.int64)
+        self.values = {col: arrays[col] for col in STANDINGS_COLS}
+        self.day_offset = int(self.day.min()) if len(self.day) else 0
+        self.key = (self.team.astype(np.int64) << DAY_BITS) + (
+            self.day - self.day_offset
+        )
+        self.block_index = {
+            (int(season), int(div)): block
+            for block, (season, div) in enumerate(
+                zip(self.block_season, self.block_div)
+            )
+        }
+
+    @classmethod
+    def load(cls, path: Path) -> StandingsStore:
+        with np.load(path) as arrays:
+            return cls({name: arrays[name] for name in arrays.files})
+
+    def blocks(self) -> pd.DataFrame:
+        return pd.DataFrame({cols.season: self.block_season, cols.div: self.block_div})
+
+    def standings(self, season: int, div: int, date) -> pd.DataFrame:
+        """
+        Description:
+            League table of (season, div) after all matches played on or before
+            'date', ranked like F02 (points, goal difference, goals scored with
+            dense ranks). Teams without a match so far are listed with zeros.
+            Step 1 -> Look up the block of (season, div)
+            Step 2 -> Binary search the last row of every team up to 'date'
+            Step 3 -> Rank the gathered totals
+
+        Returns:
+            pd.DataFrame: One row per team of the block, ordered by rank.
+        """
+        block = self.block_index.get((int(season), int(div)))
+        if block is None:
+            raise KeyError(f"No standings stored for season {season}, div {div}.")
+        start, end = self.block_start[block], self.block_start[block + 1]
+        team = self.team[start:end]
+        team_first = np.flatnonzero(np.r_[True, team[1:] != team[:-1]])
+
+        day = np.datetime64(pd.Timestamp(date), "D").astype(np.int64)
+        offset = np.clip(day - self.day_offset, -1, (1 << DAY_BITS) - 1)
+        query = (team[team_first].astype(np.int64) << DAY_BITS) + offset
+        last = np.searchsorted(self.key[start:end], query, side="right") - 1
+        played = last >= team_first
+
+        table = pd.DataFrame(
+            {
+                cols.season: self.block_season[block],
+                cols.div: self.block_div[block],
+                cols.team: self.teams[team[team_first]],
+                **{
+                    col: np.where(played, values[start:end][last], 0)
+                    for col, values in self.values.items()
+                },
+            }
+        )
+        return _rank_tables(table)
+
+    def season_end(self) -> pd.DataFrame:
+        """
+        Description:
+            Final tables of all stored (season, div) blocks, i.e. the last row
+            of every team within its block.
+        """
+        rows = np.arange(len(self.team))
+        block = np.repeat(np.arange(len(self.block_season)), np.diff(self.block_start))
+        is_last = np.r_[
+            (self.team[1:] != self.team[:-1]) | (block[1:] != block[:-1]), True
+        ]
+        last = rows[is_last]
+        table = pd.DataFrame(
+            {
+                cols.season: self.block_season[block[last]],
+                cols.div: self.block_div[block[last]],
+                cols.team: self.teams[self.team[last]],
+                **{col: values[last] for col, values in self.values.items()},
+            }
+        )
+        return _rank_tables(table)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Description:
+            All stored change points as team-match rows, e.g. for analyses over
+            many league-seasons at once.
+        """
+        block_sizes = np.diff(self.block_start)
+        return pd.DataFrame(
+            {
+                cols.season: np.repeat(self.block_season, block_sizes),
+                cols.div: np.repeat(self.block_div, block_sizes),
+                cols.date: self.day.astype("datetime64[D]"),
+                cols.team: self.teams[self.team],
+                **self.values,
+            }
+        )
+
+
+#########################################################################################################
+
+
+def _rank_tables(tables: pd.DataFrame) -> pd.DataFrame:
+    table_cols = [cols.season, cols.div]
+    tables["_rank_key"] = rank_key([tables[col] for col in POST_RANK_COLS])
+    tables[cols.post_rank] = (
+        tables.groupby(table_cols, sort=False)["_rank_key"]
+        .rank(method="dense", ascending=False)
+        .astype(int)
+    )
+    tables = tables.drop(columns=["_rank_key"])
+    return tables.sort_values(
+        table_cols + [cols.post_rank, cols.team], kind="mergesort"
+    ).reset_index(drop=True)
@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import logging
+from collections.abc import Generator, Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import pandas as pd
+
+from bundesliga_forecasting.BL_config import (
+    COLUMNS,
+    CSV_ENCODING,
+    PATHS,
+    setup_logging,
+)
+from bundesliga_forecasting.BL_instrument import instrumented
+from bundesliga_forecasting.BL_utils import append_to_csv, ensure_dir
+from bundesliga_forecasting.feature_engineering.F_config import STREAMING
+from bundesliga_forecasting.feature_engineering.features.F01_score import (
+    score_features,
+)
+from bundesliga_forecasting.feature_engineering.features.F02_daily_table import (
+    daily_comparisons,
+)
+from bundesliga_forecasting.feature_engineering.features.F03_momentum import momentum
+from bundesliga_forecasting.feature_engineering.features.F04_current_season import (
+    season_performance,
+)
+from bundesliga_forecasting.feature_engineering.features.F05_prev_season import (
+    last_season_end,
+    prev_season_performance,
+)
+from bundesliga_forecasting.feature_engineering.features.F06_relprom_effects import (
+    relprom_effects,
+)
+from bundesliga_forecasting.feature_engineering.features.F07_history import (
+    historical_features,
+)
+from bundesliga_forecasting.feature_engineering.features.F08_combine import (
+    feature_combination,
+)
+from bundesliga_forecasting.feature_engineering.features.F09_head_to_head import (
+    head_to_head,
+)
+from bundesliga_forecasting.feature_engineering.features.F10_elo import (
+    RatingState,
+    elo_ratings,
+)
+from bundesliga_forecasting.feature_engineering.features.F11_strength_of_schedule import (
+    strength_of_schedule,
+)
+from bundesliga_forecasting.feature_engineering.features.F12_rest_days import (
+    rest_days,
+)
+
+logger = logging.getLogger(__name__)
+
+paths = PATHS
+encoding = CSV_ENCODING
+cols = COLUMNS
+streaming = STREAMING
+
+
+@dataclass
+class StreamState:
+    """
+    Everything a chunk of seasons needs from the chunks before it. The within-
+    season features (totals, tables, streaks, rolling windows, strength of
+    schedule) start from scratch every season and need no state, the rest
+    grows with the number of clubs, not with the number of seasons.
+    """
+
+    prev_season_end: pd.DataFrame | None = None  # F05, last season's final rows
+    history: pd.DataFrame | None = None  # F07, EWM per team
+    pair_records: pd.DataFrame | None = None  # F09, totals and EWM per club pair
+    ratings: RatingState = field(default_factory=RatingState)  # F10
+    recent: pd.DataFrame | None = None  # F12, matches of the last days
+
+
+@instrumented
+def stream_features(
+    src_dir: Path = paths.prepared,
+    target_dir: Path = paths.features,
+    src_file: str = paths.prepared_file,
+    target_file: str = paths.feature_file,
+    combined_file: str = paths.combined_file,
+    *,
+    seasons_per_chunk: int = streaming.seasons_per_chunk,
+) -> StreamState:
+    """
+    Description:
+        Out-of-core variant of the feature engineering pipeline with the same
+        feature and combined files as output.
+        Step 1 -> Read the prepared file in season-ordered chunks of
+                  'seasons_per_chunk' seasons
+        Step 2 -> Run all stages on the chunk in memory, continuing the
+                  cross-season features from the carried state
+        Step 3 -> Append the chunk to the output files and keep only the
+                  state for the next chunk
+
+        Peak memory is bounded by the largest chunk instead of the full
+        history. The standings store is not written in this mode.
+
+    Usage location:
+        cli.py
+
+    Returns:
+        StreamState: The state after the last chunk, e.g. to continue with
+        later seasons.
+    """
+    logger.info("Streaming the feature engineering pipeline...")
+    ensure_dir([src_dir, target_dir], ["src", "target"])
+
+    output_path = target_dir / target_file
+    combined_path = target_dir / combined_file
+    # the outputs are appended chunk by chunk
+    output_path.unlink(missing_ok=True)
+    combined_path.unlink(missing_ok=True)
+
+    state = StreamState()
+    for chunk in iter_season_chunks(
+        src_dir / src_file, seasons_per_chunk=seasons_per_chunk
+    ):
+        logger.info(
+            "Processing the seasons %s to %s...",
+            chunk[cols.season].iloc[0],
+            chunk[cols.season].iloc[-1],
+        )
+        df = process_chunk(chunk, state)
+        append_to_csv(df, output_path)
+        append_to_csv(feature_combination(df), combined_path)
+
+    state.ratings.save(target_dir / paths.elo_state_file)
+    return state
+
+
+def process_chunk(df: pd.DataFrame, state: StreamState) -> pd.DataFrame:
+    """
+    Description:
+        All feature stages in pipeline order on the prepared rows of complete
+        seasons. Updates 'state' in place.
+    """
+    df = score_features(df)
+    df = daily_comparisons(df)
+    df = momentum(df)
+    df = season_performance(df)
+    df = prev_season_performance(df, prev_season_end=state.prev_season_end)
+    df = relprom_effects(df)
+    df, state.history = historical_features(df, initial=state.history)
+    df, state.pair_records = head_to_head(df, records=state.pair_records)
+    df = elo_ratings(df, state.ratings)
+    df = strength_of_schedule(df)
+    df, state.recent = rest_days(df, recent=state.recent)
+
+    state.prev_season_end = last_season_end(df)
+    return df
+
+
+def iter_season_chunks(
+    input_path: Path,
+    *,
+    seasons_per_chunk: int = streaming.seasons_per_chunk,
+    read_rows: int = streaming.read_rows,
+) -> Iterator[pd.DataFrame]:
+    """
+    Description:
+        Yields the rows of 'seasons_per_chunk' complete seasons at a time. The
+        file has to be sorted by season, as written by S03. A season is
+        complete once a row of a later season has been read.
+    """
+    if seasons_per_chunk < 1:
+        raise ValueError("'seasons_per_chunk' has to be at least 1.")
+
+    pending = pd.DataFrame()
+    for rows in pd.read_csv(input_path, encoding=encoding, chunksize=read_rows):
+        pending = pd.concat([pending, rows], ignore_index=True)
+        seasons = pending[cols.season].to_numpy()
+        if (seasons[1:] < seasons[:-1]).any():
+            raise ValueError(f"The rows of {input_path} are not sorted by season.")
+        while pending[cols.season].nunique() > seasons_per_chunk:
+            pending = yield from _yield_seasons(pending, seasons_per_chunk)
+
+    while not pending.empty:
+        pending = yield from _yield_seasons(pending, seasons_per_chunk)
+
+
+#################################################################
+
+
+def _yield_seasons(
+    pending: pd.DataFrame, n_seasons: int
+) -> Generator[pd.DataFrame, None, pd.DataFrame]:
+    seasons = pending[cols.season].drop_duplicates()
+    is_chunk = pending[cols.season].isin(seasons.iloc[:n_seasons])
+    chunk = pending[is_chunk].reset_index(drop=True)
+    chunk[cols.date] = pd.to_datetime(chunk[cols.date], format="mixed")
+    yield chunk
+    return pending[~is_chunk].reset_index(drop=True)
+
+
+def main() -> None:
+    setup_logging()
+    stream_features()
+
+
+if __name__ == "__main__":
+    main()
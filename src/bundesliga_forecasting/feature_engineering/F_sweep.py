@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import logging
+from collections.abc import Iterator, Sequence
+from itertools import product
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from bundesliga_forecasting.BL_config import COLUMNS, PATHS, setup_logging
+from bundesliga_forecasting.BL_instrument import instrumented
+from bundesliga_forecasting.BL_utils import (
+    check_columns,
+    df_sort,
+    ensure_dir,
+    read_csv,
+    save_to_csv,
+)
+from bundesliga_forecasting.feature_engineering.F_config import (
+    WEIGHTS,
+    ZONES,
+    Zones,
+)
+from bundesliga_forecasting.feature_engineering.F_utils import (
+    create_season_end,
+    group_order,
+    momentum_bank,
+)
+from bundesliga_forecasting.feature_engineering.features.F04_current_season import (
+    assign_zones,
+)
+from bundesliga_forecasting.feature_engineering.features.F07_history import (
+    compute_history,
+    merge_cols as history_merge_cols,
+    merge_on as history_merge_on,
+    required_cols as history_required_cols,
+)
+
+logger = logging.getLogger(__name__)
+
+paths = PATHS
+cols = COLUMNS
+id_cols = [cols.season, cols.div, cols.date, cols.team, cols.opp]
+history_cols = [col for col in history_merge_cols if col not in history_merge_on]
+# columns depending on each swept parameter
+SWEPT_COLS = {
+    "rolling": [cols.prev_rolling_point_ratio, cols.prev_rolling_goaldiff_ratio],
+    "history": history_cols,
+    "zones": [cols.zone],
+}
+
+
+@instrumented
+def sweep_features(
+    src_dir: Path = paths.features,
+    target_dir: Path = paths.features,
+    src_file: str = paths.feature_file,
+    target_file: str = paths.sweep_file,
+    *,
+    rolling: Sequence[int] = (WEIGHTS.rolling,),
+    history: Sequence[float] = (WEIGHTS.history,),
+    zones: Sequence[Zones] = (ZONES,),
+) -> pd.DataFrame:
+    """
+    Description:
+        Computes the columns which depend on the feature weights for every
+        value of the given grids in one run and saves them as a wide frame
+        next to the match identifiers.
+
+    Usage location:
+        cli.py
+
+    Args:
+        src_dir (Path): Directory of the feature file (output of F07 or later).
+        rolling (Sequence[int]): Windows of the rolling point and goal
+            difference ratios (F03).
+        history (Sequence[float]): EWM weights of the historical features (F07).
+        zones (Sequence[Zones]): Table zone definitions (F04).
+
+    Returns:
+        pd.DataFrame: Identifier columns and one column per swept feature and
+        parameter value, see 'sweep_column'.
+    """
+    logger.info("Sweeping the feature parameters...")
+    ensure_dir([src_dir, target_dir], ["src", "target"])
+
+    df = read_csv(src_dir / src_file)
+    df = df_sort(df, sort_cols=[cols.season, cols.div, cols.date])
+    wide = pd.concat(
+        [df[id_cols], sweep(df, rolling=rolling, history=history, zones=zones)],
+        axis=1,
+    )
+    save_to_csv(wide, target_dir / target_file)
+    return wide
+
+
+def sweep(
+    df: pd.DataFrame,
+    *,
+    rolling: Sequence[int] = (WEIGHTS.rolling,),
+    history: Sequence[float] = (WEIGHTS.history,),
+    zones: Sequence[Zones] = (ZONES,),
+) -> pd.DataFrame:
+    """
+    Description:
+        Step 1 -> Rolling ratios: one momentum bank with all windows, i.e. one
+                  prefix sum shared by every window
+        Step 2 -> Historical features: the season-end frame and its row
+                  positions are built once, only the EWM runs per weight
+        Step 3 -> Zones: one cut of the ranks per zone definition
+
+        The swept parameters act on disjoint columns, so every combination of
+        values is covered by the per-parameter variants, see 'feature_matrix'.
+
+    Returns:
+        pd.DataFrame: The swept columns, aligned with the index of df, which
+        has to be sorted by date within each season and team.
+    """
+    variants = {
+        **_sweep_rolling(df, rolling),
+        **_sweep_history(df, history),
+        **_sweep_zones(df, zones),
+    }
+    return pd.DataFrame(variants, index=df.index)
+
+
+def sweep_column(col: str, param: str, value: int | float | Zones) -> str:
+    if isinstance(value, Zones):
+        value = "-".join(str(bin_) for bin_ in value.bins)
+    return f"{col}[{param}={value}]"
+
+
+def feature_matrix(
+    df: pd.DataFrame,
+    wide: pd.DataFrame,
+    *,
+    rolling: int = WEIGHTS.rolling,
+    history: float = WEIGHTS.history,
+    zones: Zones = ZONES,
+) -> pd.DataFrame:
+    """
+    Description:
+        Feature frame of one parameter combination: df with the swept columns
+        replaced by the variants for the given values.
+    """
+    choice = {"rolling": rolling, "history": history, "zones": zones}
+    replaced = {
+        col: wide[sweep_column(col, param, choice[param])]
+        for param, swept_cols in SWEPT_COLS.items()
+        for col in swept_cols
+    }
+    return df.assign(**replaced)
+
+
+def iter_feature_matrices(
+    df: pd.DataFrame,
+    wide: pd.DataFrame,
+    *,
+    rolling: Sequence[int] = (WEIGHTS.rolling,),
+    history: Sequence[float] = (WEIGHTS.history,),
+    zones: Sequence[Zones] = (ZONES,),
+) -> Iterator[tuple[dict, pd.DataFrame]]:
+    for values in product(rolling, history, zones):
+        params = dict(zip(["rolling", "history", "zones"], values))
+        yield params, feature_matrix(df, wide, **params)
+
+
+##############################################################
+
+
+def _sweep_rolling(df: pd.DataFrame, windows: Sequence[int]) -> dict[str, np.ndarray]:
+    group_cols = [cols.season, cols.team]
+    # one team order for the bank and the number of previous matches
+    order = group_order(df, group_cols)
+    bank = momentum_bank(df, group_cols, windows=windows, half_lives=(), order=order)
+    previous = order.row_position()
+
+    variants = {}
+    for window in windows:
+        games = np.clip(np.minimum(previous, window), 1, None)
+        variants[sweep_column(cols.prev_rolling_point_ratio, "rolling", window)] = (
+            bank[f"PrevRollingPoints{window}"].to_numpy() / games
+        )
+        variants[sweep_column(cols.prev_rolling_goaldiff_ratio, "rolling", window)] = (
+            bank[f"PrevRollingGoalDiff{window}"].to_numpy() / games
+        )
+    return variants
+
+
+def _sweep_history(df: pd.DataFrame, alphas: Sequence[float]) -> dict[str, np.ndarray]:
+    season_end = create_season_end(df, history_required_cols)
+    # row of the season-end frame for every team-match row
+    keys = season_end[history_merge_on].reset_index()
+    position = df[history_merge_on].merge(keys, on=history_merge_on, how="left")
+    position = position["index"].to_numpy()
+
+    variants = {}
+    for alpha in alphas:
+        history = compute_history(season_end.copy(), alpha=alpha)
+        for col in history_cols:
+            variants[sweep_column(col, "history", alpha)] = history[col].to_numpy()[
+                position
+            ]
+    return variants
+
+
+def _sweep_zones(df: pd.DataFrame, zones: Sequence[Zones]) -> dict[str, np.ndarray]:
+    check_columns(df, [cols.prev_rank])
+    return {
+        sweep_column(cols.zone, "zones", zone): assign_zones(df[cols.prev_rank], zone)
+        .astype(float)
+        .to_numpy()
+        for zone in zones
+    }
+
+
+def main() -> None:
+    setup_logging()
+    sweep_features(rolling=(3, 5, 10), history=(0.5, 0.75, 0.9))
+
+
+if __name__ == "__main__":
+    main()
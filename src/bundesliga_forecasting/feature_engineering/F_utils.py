@@ -1,10 +1,13 @@
 from __future__ import annotations
 
 import logging
+from collections.abc import Sequence
 from typing import NamedTuple
 
+import numpy as np
 import pandas as pd
 
+from bundesliga_forecasting.BL_instrument import instrumented
 from bundesliga_forecasting.BL_utils import check_columns
 from bundesliga_forecasting.feature_engineering.F_config import (
     COLUMNS,
@@ -15,6 +18,7 @@ from bundesliga_forecasting.feature_engineering.F_config import (
 logger = logging.getLogger(__name__)
 cols = COLUMNS
 RANK_COLS = PREV_RANK_COLS + POST_RANK_COLS
+RANK_KEY_BASE = 10**3
 
 
 class OutcomeSeries(NamedTuple):
@@ -26,6 +30,22 @@ class OutcomeSeries(NamedTuple):
     goalsa: pd.Series
 
 
+class GroupOrder(NamedTuple):
+    """
+    Permutation of the rows of a frame which makes every group contiguous and
+    in date order, with the group boundaries in that order, see 'group_order'.
+    """
+
+    order: np.ndarray  # row at every sorted position
+    inverse: np.ndarray  # sorted position of every row
+    group_start: np.ndarray  # first sorted position of the group
+    position: np.ndarray  # position within the group
+
+    def row_position(self) -> np.ndarray:
+        """Position of every row within its group, aligned with the rows."""
+        return self.position[self.inverse]
+
+
 def produce_outcome_series(df: pd.DataFrame) -> OutcomeSeries:
     check_columns(df, [cols.season, cols.team, cols.points, cols.goalsf, cols.goalsa])
 
@@ -39,6 +59,7 @@ def produce_outcome_series(df: pd.DataFrame) -> OutcomeSeries:
     )
 
 
+@instrumented(kernel=True)
 def grouped_aggregate(
     s: pd.Series,
     group_keys,
@@ -75,6 +96,127 @@ def grouped_aggregate(
     return out
 
 
+def division_offsets(df: pd.DataFrame) -> pd.Series:
+    """
+    Number of teams in the higher divisions of the same season, indexed by
+    (season, div), i.e. the offset of a division's ranks in the total ranking
+    of the league's ladder. Rows with div 0 (teams without a match in the
+    season) are not counted.
+    """
+    check_columns(df, [cols.season, cols.div, cols.team])
+    played = df[df[cols.div] > 0]
+    sizes = played.groupby([cols.season, cols.div])[cols.team].nunique()
+    return sizes.groupby(level=cols.season).cumsum() - sizes
+
+
+def group_order(df: pd.DataFrame, group_cols: list[str]) -> GroupOrder:
+    """
+    Team-contiguous (or any other group-contiguous) order of df, computed once
+    and shared by the kernels that scan the groups instead of every kernel
+    grouping and sorting the rows again.
+    """
+    check_columns(df, group_cols + [cols.date])
+    n_rows = len(df)
+    groups = df.groupby(group_cols, sort=False).ngroup().to_numpy()
+    order = np.lexsort((df[cols.date].to_numpy(), groups))
+    inverse = np.empty(n_rows, dtype=np.int64)
+    inverse[order] = np.arange(n_rows)
+
+    is_start = np.r_[True, groups[order][1:] != groups[order][:-1]]
+    group_start = np.maximum.accumulate(np.where(is_start, np.arange(n_rows), 0))
+    position = np.arange(n_rows) - group_start
+    return GroupOrder(order, inverse, group_start, position)
+
+
+def rank_key(columns: Sequence, *, base: int = RANK_KEY_BASE) -> np.ndarray:
+    """
+    Collapses the table tiebreak columns (most significant first, i.e. points,
+    goal difference, goals scored) into a single key, so that a higher key means
+    a better table position and equal keys mean a tie. Works on Series as well
+    as on arrays of any shape, e.g. (n_simulations, n_teams).
+    """
+    key = np.zeros(np.shape(columns[0]), dtype=float)
+    for column in columns:
+        key = key * base + np.asarray(column, dtype=float)
+    return key
+
+
+@instrumented(kernel=True)
+def momentum_bank(
+    df: pd.DataFrame,
+    group_cols: list[str],
+    *,
+    windows: Sequence[int | None],
+    half_lives: Sequence[float],
+    order: GroupOrder | None = None,
+) -> pd.DataFrame:
+    """
+    Description:
+        Form of every team before each match, for points, goal difference,
+        goals for and goals against at once.
+        Step 1 -> Reorder the rows so that every group is contiguous and in
+                  date order, by 'order' if it was already computed
+        Step 2 -> Rolling sums over the previous 'windows' matches (None for
+                  all previous matches of the group) as differences of one
+                  exclusive prefix sum
+        Step 3 -> Exponentially weighted means of the previous matches for
+                  every half-life (in matches) by one scan over the position
+                  within the group, vectorized over all groups
+
+    Returns:
+        pd.DataFrame: One column per metric and window/half-life, e.g.
+        'PrevRollingPoints5', 'PrevSeasonToDateGoalDiff' or
+        'PrevEwmGoalsForHalfLife2', aligned with the index of df.
+    """
+    check_columns(df, group_cols + [cols.date, cols.points, cols.goalsf, cols.goalsa])
+    metrics = {
+        "Points": df[cols.points].to_numpy(dtype=float),
+        "GoalDiff": (df[cols.goalsf] - df[cols.goalsa]).to_numpy(dtype=float),
+        "GoalsFor": df[cols.goalsf].to_numpy(dtype=float),
+        "GoalsAgainst": df[cols.goalsa].to_numpy(dtype=float),
+    }
+    n_rows = len(df)
+    if order is None:
+        order = group_order(df, group_cols)
+    values = np.column_stack(list(metrics.values()))[order.order]
+    group_start, position = order.group_start, order.position
+
+    # prefix[i] holds the sum of all rows before i
+    prefix = np.vstack([np.zeros(values.shape[1]), np.cumsum(values, axis=0)])
+    bank = {}
+    for window in windows:
+        first = (
+            group_start
+            if window is None
+            else np.maximum(np.arange(n_rows) - window, group_start)
+        )
+        sums = prefix[:-1] - prefix[first]
+        suffix = "SeasonToDate" if window is None else "Rolling"
+        for i, name in enumerate(metrics):
+            bank[f"Prev{suffix}{name}{'' if window is None else window}"] = sums[:, i]
+
+    # rows by position within their group, the scan advances all groups at once
+    by_position = np.argsort(position, kind="stable")
+    steps = np.split(by_position, np.flatnonzero(np.diff(position[by_position])) + 1)
+    for half_life in half_lives:
+        decay = 0.5 ** (1 / half_life)
+        # decayed sums of the previous values and of their weights
+        sums = np.zeros_like(values)
+        weights = np.zeros(n_rows)
+        for rows in steps[1:]:
+            sums[rows] = values[rows - 1] + decay * sums[rows - 1]
+            weights[rows] = 1 + decay * weights[rows - 1]
+        means = sums / np.maximum(weights, 1)[:, None]
+        for i, name in enumerate(metrics):
+            bank[f"PrevEwm{name}HalfLife{half_life:g}"] = means[:, i]
+
+    return pd.DataFrame(
+        {name: column[order.inverse] for name, column in bank.items()},
+        index=df.index,
+    )
+
+
+@instrumented(kernel=True)
 def create_season_end(df: pd.DataFrame, required_cols: list[str]) -> pd.DataFrame:
 
     ## Internal function ##
@@ -99,6 +241,14 @@ def create_season_end(df: pd.DataFrame, required_cols: list[str]) -> pd.DataFram
     return season_end
 
 
+def join_columns(df: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    """
+    Joins the columns of 'new' onto df, replacing existing columns of the same
+    name, so that a stage can run again on its own output.
+    """
+    return df.drop(columns=new.columns, errors="ignore").join(new)
+
+
 def prev_season_value(df: pd.DataFrame, new_col: str, ref_col: str) -> pd.DataFrame:
     df = df.copy()
     df["prev_season"] = df[cols.season] - 1
@@ -5,6 +5,7 @@ import numpy as np
 import pandas as pd
 
 from bundesliga_forecasting.BL_config import COLUMNS, CSV_ENCODING, PATHS
+from bundesliga_forecasting.BL_instrument import instrumented
 from bundesliga_forecasting.BL_utils import (
     check_columns,
     ensure_dir,
@@ -20,8 +21,10 @@ logger = logging.getLogger(__name__)
 cols = COLUMNS
 paths = PATHS
 encoding = CSV_ENCODING
+required_cols = [cols.season, cols.team, cols.goalsf, cols.goalsa]
 
 
+@instrumented
 def add_score_features(
     src_dir: Path = paths.prepared,
     target_dir: Path = paths.features,
@@ -34,16 +37,20 @@ def add_score_features(
 
     input_path = src_dir / src_file
     output_path = target_dir / target_file
-    required_cols = [cols.season, cols.team, cols.goalsf, cols.goalsa]
 
     df = read_csv(input_path)
+    df = score_features(df)
+
+    save_to_csv(df, output_path)
+
+
+def score_features(df: pd.DataFrame) -> pd.DataFrame:
     check_columns(df, required_cols)
 
     df = _add_match_scores(df)
     df = _add_cum_post_match_scores(df)
     df = _add_cum_prev_match_scores(df)
-
-    save_to_csv(df, output_path)
+    return df
 
 
 #######################################################
@@ -1,10 +1,12 @@
 import logging
 from pathlib import Path
+from typing import NamedTuple
 
 import numpy as np
 import pandas as pd
 
 from bundesliga_forecasting.BL_config import COLUMNS, CSV_ENCODING, PATHS
+from bundesliga_forecasting.BL_instrument import instrumented
 from bundesliga_forecasting.BL_utils import (
     check_columns,
     ensure_dir,
@@ -16,6 +18,14 @@ from bundesliga_forecasting.feature_engineering.F_config import (
     POST_RANK_COLS,
     PREV_RANK_COLS,
 )
+from bundesliga_forecasting.feature_engineering.F_standings import (
+    DAY_BITS,
+    save_standings,
+)
+from bundesliga_forecasting.feature_engineering.F_utils import (
+    division_offsets,
+    rank_key,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -24,227 +34,211 @@ encoding = CSV_ENCODING
 cols = COLUMNS
 
 # global variables
-rank_group_by = [cols.season, cols.div, cols.date]
+table_cols = [cols.season, cols.div]
 RANK_COLS = PREV_RANK_COLS + POST_RANK_COLS
+required_cols = [cols.season, cols.div, cols.date, cols.team] + MATCH_COLS + RANK_COLS
+
+
+class AsofTables(NamedTuple):
+    """
+    Full tables of every (season, div) on every match date, recovered from the
+    change points by an as-of join. One cell per (table date, team), the cells
+    of a table date are contiguous. Only lives while the ranks are computed.
+    """
+
+    table_start: np.ndarray  # first cell of every table date (+ end)
+    prev_key: np.ndarray
+    post_key: np.ndarray
+    prev_points: np.ndarray
+    post_points: np.ndarray
+    row_table: np.ndarray  # table date of every change point
+    row_cell: np.ndarray  # cell of every change point
 
 
+@instrumented
 def add_daily_comparisons(
     src_dir: Path = paths.features,
     target_dir: Path = paths.features,
     src_file: str = paths.feature_file,
     target_file: str = paths.feature_file,
 ) -> None:
-
+    """
+    Description:
+        Adds the table ranks and the table point extrema before and after every
+        match.
+        Step 1 -> Keep the change points, i.e. the rows where a team's table
+                  entry changes (its matches)
+        Step 2 -> Recover the full tables on every match date by an as-of join
+                  of the change points and rank them
+        Step 3 -> Determine the minimum and maximum points of every table
+        Step 4 -> Attach ranks and extrema to the matches and persist the
+                  change points in the standings store
+
+        Teams which did not play on a date are never materialized as rows, the
+        table of any date can be queried from the standings store.
+
+    Usage location:
+        feature_engineering/F_pipeline.py
+    """
     logger.info("Adding season-features to the DataFrame...")
     ensure_dir([src_dir, target_dir], ["src", "target"])
 
     input_path = src_dir / src_file
     output_path = target_dir / target_file
-    required_cols = (
-        [cols.season, cols.div, cols.date, cols.team] + MATCH_COLS + RANK_COLS
-    )
 
     df = read_csv(input_path)
+    df = daily_comparisons(df)
+    save_to_csv(df, output_path)
+    save_standings(df, target_dir / paths.standings_file)
+
+
+def daily_comparisons(df: pd.DataFrame) -> pd.DataFrame:
     check_columns(df, required_cols)
 
     daily_tables = _create_daily_tables(df)
-    daily_tables = _compute_ranks(daily_tables)
-    daily_tables = _add_table_extrema(daily_tables)
-    # save_to_csv(daily_tables, target_dir / paths.daily_tables_file)
-    df = _merge_back(df, daily_tables)
-    save_to_csv(df, output_path)
+    tables = _asof_tables(daily_tables)
+    daily_tables = _compute_ranks(daily_tables, tables)
+    daily_tables = _add_table_extrema(daily_tables, tables)
+    return _merge_back(df, daily_tables)
 
 
 #########################################################################################################
 
 
+@instrumented(kernel=True)
 def _create_daily_tables(df: pd.DataFrame) -> pd.DataFrame:
-
-    ## Internal function ##
-    def _create_calendar(df: pd.DataFrame) -> pd.DataFrame:
-
-        logger.info("Creating the season team-date calendar...")
-        check_columns(df, [cols.season, cols.div, cols.date, cols.team])
-        dates_df = (
-            df[[cols.season, cols.div, cols.date]]
-            .drop_duplicates()
-            .reset_index(drop=True)
-        )
-        teams_df = (
-            df[[cols.season, cols.div, cols.team]]
-            .drop_duplicates()
-            .reset_index(drop=True)
-        )
-        calendar = dates_df.merge(teams_df, on=[cols.season, cols.div], how="inner")
-
-        return calendar
-
-    ## Main function ##
-    logger.info("Creating the season snap from the season team-date calendar...")
-    check_columns(
-        df, [cols.season, cols.div, cols.date, cols.team] + MATCH_COLS + RANK_COLS
-    )
-    calendar = _create_calendar(df)
-    daily_tables = calendar.merge(
-        df[[cols.season, cols.div, cols.date, cols.team] + MATCH_COLS + RANK_COLS],
-        on=[cols.season, cols.div, cols.date, cols.team],
-        how="left",
+    logger.info("Collecting the change points of the daily tables...")
+    check_columns(df, [cols.season, cols.div, cols.date, cols.team] + POST_RANK_COLS)
+    return df[[cols.season, cols.div, cols.date, cols.team] + POST_RANK_COLS].copy()
+
+
+def _asof_tables(daily_tables: pd.DataFrame) -> AsofTables:
+    """
+    Description:
+        Step 1 -> Number the (season, div) blocks, their match dates (table
+                  dates) and their teams
+        Step 2 -> Span one cell per table date and team of the block
+        Step 3 -> Look up the last change point of the cell's team on or before
+                  (post) and strictly before (prev) the table date with a binary
+                  search on the key (block team, day)
+    """
+    blocks = daily_tables.groupby(table_cols, sort=True).ngroup().to_numpy()
+    days = daily_tables[cols.date].to_numpy().astype("datetime64[D]").astype(np.int64)
+    days -= days.min()
+    team_codes = pd.factorize(daily_tables[cols.team])[0]
+
+    # table dates and teams of every block, both ordered by block
+    table_id, table_block, table_days = _unique_pairs(blocks, days)
+    pair_id, pair_block, _ = _unique_pairs(blocks, team_codes)
+    block_pairs = np.bincount(pair_block, minlength=blocks.max() + 1)
+    pair_start = np.r_[0, np.cumsum(block_pairs)]
+
+    # cells: every team of the block on every table date of the block
+    table_size = block_pairs[table_block]
+    table_start = np.r_[0, np.cumsum(table_size)]
+    cell_table = np.repeat(np.arange(len(table_days)), table_size)
+    cell_pair = (
+        np.arange(table_start[-1])
+        - table_start[cell_table]
+        + pair_start[table_block[cell_table]]
     )
-    return daily_tables
-
 
-def _sort_ffill_rank(
-    daily_tables: pd.DataFrame, rank_cols: list[str], out_col: str
-) -> pd.DataFrame:
-
-    ## Internal functions ##
-    def _sort_for_ranking(
-        daily_tables: pd.DataFrame,
-        rank_cols: list[str],
-        ascending: list[bool] | None = None,
-    ) -> pd.DataFrame:
-        if not ascending:
-            ascending_group = [True] * len(rank_group_by)
-            ascending_rank = [False] * len(rank_cols)
-            ascending = ascending_group + ascending_rank
-        daily_tables = daily_tables.sort_values(
-            by=rank_group_by + rank_cols, ascending=ascending, kind="mergesort"
-        )
-        return daily_tables
-
-    def _forward_fill(
-        daily_tables: pd.DataFrame, col_pairs: list[tuple[str, str]]
-    ) -> pd.DataFrame:
-        ffill_by = [cols.season, cols.team]
-        for prev_col, post_col in col_pairs:
-            daily_tables[post_col] = daily_tables.groupby(ffill_by, sort=False)[
-                post_col
-            ].ffill()
-            daily_tables[prev_col] = daily_tables.groupby(ffill_by, sort=False)[
-                post_col
-            ].shift(1)
-
-        daily_tables[MATCH_COLS + RANK_COLS] = daily_tables[
-            MATCH_COLS + RANK_COLS
-        ].fillna(0)
-        return daily_tables
-
-    def _rank(
-        daily_tables: pd.DataFrame, rank_cols: list[str], out_col: str
-    ) -> pd.DataFrame:
-        base_factor = 10**3
-        rev_rank_cols = rank_cols[::-1]
-        daily_tables["_rank_key"] = 0
-        for index in range(len(rev_rank_cols)):
-            daily_tables["_rank_key"] += (
-                daily_tables[rev_rank_cols[index]] * base_factor**index
-            )
-        daily_tables[out_col] = (
-            daily_tables.groupby(rank_group_by, sort=False)["_rank_key"]
-            .rank(method="dense", ascending=False)
-            .astype(int)
-        )
-        daily_tables.drop(columns=["_rank_key"], inplace=True)
-        daily_tables = daily_tables.reset_index(drop=True)
-        return daily_tables
-
-    ## Main function ##
-    check_columns(
-        daily_tables,
-        [cols.season, cols.div, cols.date, cols.team] + MATCH_COLS + RANK_COLS,
+    # as-of join of the cells on the change points
+    order = np.lexsort((days, pair_id))
+    key = (pair_id[order] << DAY_BITS) + days[order]
+    cell_key = (cell_pair << DAY_BITS) + table_days[cell_table]
+    first_row = np.searchsorted(key, cell_pair << DAY_BITS)
+    prev_row = np.searchsorted(key, cell_key, side="left") - 1
+    post_row = np.searchsorted(key, cell_key, side="right") - 1
+
+    rank_keys = rank_key([daily_tables[col] for col in POST_RANK_COLS])[order]
+    points = daily_tables[cols.post_tpoints].to_numpy(dtype=float)[order]
+
+    def _gather(values: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        # teams without a change point so far are at zero
+        return np.where(rows >= first_row, values[rows], 0.0)
+
+    return AsofTables(
+        table_start=table_start,
+        prev_key=_gather(rank_keys, prev_row),
+        post_key=_gather(rank_keys, post_row),
+        prev_points=_gather(points, prev_row),
+        post_points=_gather(points, post_row),
+        row_table=table_id,
+        row_cell=table_start[table_id] + pair_id - pair_start[blocks],
     )
-    col_pairs = list(zip(PREV_RANK_COLS, POST_RANK_COLS))
-
-    daily_tables = _sort_for_ranking(daily_tables, rank_cols)
-    daily_tables = _forward_fill(daily_tables, col_pairs)
-    daily_tables = _rank(daily_tables, rank_cols, out_col)
 
-    # daily_tables = daily_tables.sort_values(
-    #     by=rank_group_by + rank_cols, ascending=ascending, kind="mergesort"
-    # )
 
-    return daily_tables
-
-
-def _compute_ranks(daily_tables: pd.DataFrame) -> pd.DataFrame:
-    logger.info("Calculating ranks by sorting and grouping in the season-snap...")
-    check_columns(
-        daily_tables,
-        [cols.season, cols.div, cols.date] + PREV_RANK_COLS + POST_RANK_COLS,
-    )
+def _unique_pairs(
+    blocks: np.ndarray, values: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # id of every row's (block, value) pair, ids are numbered block by block,
+    # and the block and value of every pair
+    pairs = (blocks.astype(np.int64) << 32) + values
+    unique, inverse = np.unique(pairs, return_inverse=True)
+    return inverse.ravel(), unique >> 32, unique & ((1 << 32) - 1)
+
+
+def _dense_rank(keys: np.ndarray, table_start: np.ndarray) -> np.ndarray:
+    # dense rank (highest key first) within every table
+    cell_table = np.repeat(np.arange(len(table_start) - 1), np.diff(table_start))
+    order = np.lexsort((-keys, cell_table))
+    sorted_keys = keys[order]
+    new_value = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]
+    new_value[table_start[:-1]] = True
+    counter = np.cumsum(new_value)
+    ranks = np.empty(len(keys), dtype=np.int64)
+    ranks[order] = counter - counter[table_start[:-1]][cell_table] + 1
+    return ranks
+
+
+@instrumented(kernel=True)
+def _compute_ranks(daily_tables: pd.DataFrame, tables: AsofTables) -> pd.DataFrame:
+    logger.info("Calculating the ranks of the as-of tables...")
+    check_columns(daily_tables, [cols.div])
     rank_configs = [
         {
-            "rank_cols": PREV_RANK_COLS,
+            "keys": tables.prev_key,
             "out_col": cols.prev_rank,
             "out_tcol": cols.prev_trank,
         },
         {
-            "rank_cols": POST_RANK_COLS,
+            "keys": tables.post_key,
             "out_col": cols.post_rank,
             "out_tcol": cols.post_trank,
         },
     ]
+    # total ranks continue below the teams of the higher divisions
+    offsets = division_offsets(daily_tables).reindex(
+        pd.MultiIndex.from_frame(daily_tables[[cols.season, cols.div]])
+    )
     # prev and post match rankings
     for config in rank_configs:
-        daily_tables = _sort_ffill_rank(
-            daily_tables,
-            rank_cols=config["rank_cols"],
-            out_col=config["out_col"],
-        )
-        daily_tables[config["out_tcol"]] = np.where(
-            daily_tables[cols.div] == 1,
-            daily_tables[config["out_col"]],
-            daily_tables[config["out_col"]] + 18,
+        ranks = _dense_rank(config["keys"], tables.table_start)
+        daily_tables[config["out_col"]] = ranks[tables.row_cell]
+        daily_tables[config["out_tcol"]] = (
+            daily_tables[config["out_col"]] + offsets.to_numpy()
         )
-
-    # post-match ranks
-    # daily_tables = _sort_ffill_rank(
-    #     daily_tables,
-    #     rank_cols=POST_RANK_COLS,
-    #     out_col=cols.post_rank,
-    # )
-    # daily_tables[cols.post_trank] = np.where(
-    #     daily_tables[cols.div] == 1,
-    #     daily_tables[cols.post_rank],
-    #     daily_tables[cols.post_rank] + 18,
-    # )
     return daily_tables
 
 
-def _add_table_extrema(daily_tables: pd.DataFrame) -> pd.DataFrame:
-    logger.info("Determining total point extreme values within the season-snap...")
-    check_columns(
-        daily_tables, [cols.div, cols.date, cols.prev_tpoints, cols.post_tpoints]
-    )
-    # prior-match max points
-    daily_tables[cols.prev_max_tpoints] = daily_tables.groupby([cols.div, cols.date])[
-        cols.prev_tpoints
-    ].transform("max")
-
-    # prior-match min points
-    daily_tables[cols.prev_min_tpoints] = daily_tables.groupby([cols.div, cols.date])[
-        cols.prev_tpoints
-    ].transform("min")
-
-    # post-match max points
-    daily_tables[cols.post_max_tpoints] = daily_tables.groupby([cols.div, cols.date])[
-        cols.post_tpoints
-    ].transform("max")
-
-    # post-match min points
-    daily_tables[cols.post_min_tpoints] = daily_tables.groupby([cols.div, cols.date])[
-        cols.post_tpoints
-    ].transform("min")
-
+def _add_table_extrema(daily_tables: pd.DataFrame, tables: AsofTables) -> pd.DataFrame:
+    logger.info("Determining total point extreme values of the as-of tables...")
+    starts = tables.table_start[:-1]
+    extrema = {
+        cols.prev_max_tpoints: np.maximum.reduceat(tables.prev_points, starts),
+        cols.prev_min_tpoints: np.minimum.reduceat(tables.prev_points, starts),
+        cols.post_max_tpoints: np.maximum.reduceat(tables.post_points, starts),
+        cols.post_min_tpoints: np.minimum.reduceat(tables.post_points, starts),
+    }
+    for col, values in extrema.items():
+        daily_tables[col] = values[tables.row_table]
     return daily_tables
 
 
 def _merge_back(df: pd.DataFrame, daily_tables: pd.DataFrame) -> pd.DataFrame:
-    logger.info("Merging season snap back into original DataFrame...")
+    logger.info("Attaching the table comparisons to the original DataFrame...")
     merge_columns = [
-        cols.season,
-        cols.date,
-        cols.team,
         cols.prev_min_tpoints,
         cols.prev_max_tpoints,
         cols.prev_rank,
@@ -254,13 +248,6 @@ def _merge_back(df: pd.DataFrame, daily_tables: pd.DataFrame) -> pd.DataFrame:
         cols.post_rank,
         cols.post_trank,
     ]
-    on_columns = [cols.season, cols.date, cols.team]
     check_columns(daily_tables, merge_columns)
-
-    df = df.merge(
-        daily_tables[merge_columns],
-        on=on_columns,
-        how="left",
-    )
-
-    return df
+    # the change points are the rows of df, so they align on the index
+    return df.assign(**{col: daily_tables[col] for col in merge_columns})
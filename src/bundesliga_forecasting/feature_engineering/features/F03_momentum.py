@@ -1,9 +1,11 @@
 import logging
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
 from bundesliga_forecasting.BL_config import COLUMNS, CSV_ENCODING, PATHS
+from bundesliga_forecasting.BL_instrument import instrumented
 from bundesliga_forecasting.BL_utils import (
     check_columns,
     df_sort,
@@ -12,10 +14,14 @@ from bundesliga_forecasting.BL_utils import (
     save_to_csv,
 )
 from bundesliga_forecasting.feature_engineering.F_config import (
+    MOMENTUM_BANK,
     WEIGHTS,
 )
 from bundesliga_forecasting.feature_engineering.F_utils import (
-    grouped_aggregate,
+    GroupOrder,
+    group_order,
+    join_columns,
+    momentum_bank,
     produce_outcome_series,
 )
 
@@ -23,8 +29,16 @@ logger = logging.getLogger(__name__)
 paths = PATHS
 encoding = CSV_ENCODING
 cols = COLUMNS
+input_cols = [cols.season, cols.date, cols.team, cols.points, cols.goalsf, cols.goalsa]
+momentum_cols = [
+    cols.prev_win_streak,
+    cols.prev_loss_streak,
+    cols.prev_rolling_point_ratio,
+    cols.prev_rolling_goaldiff_ratio,
+]
 
 
+@instrumented
 def add_momentum(
     src_dir: Path = paths.features,
     target_dir: Path = paths.features,
@@ -37,14 +51,25 @@ def add_momentum(
     output_path = target_dir / target_file
 
     df = read_csv(input_path)
-    df = df_sort(df, sort_cols=[cols.season, cols.div, cols.date])
-    df = _add_streak(df)
-    df = _add_rolling_point_ratio(df)
-    df = _add_rolling_goaldiff_ratio(df)
+    df = momentum(df)
 
     save_to_csv(df, output_path)
 
 
+def momentum(df: pd.DataFrame) -> pd.DataFrame:
+    df = df_sort(df, sort_cols=[cols.season, cols.div, cols.date])
+    check_columns(df, input_cols)
+    # the features are built on the input columns only and joined in one step,
+    # replacing the columns of an earlier run
+    work = df[input_cols]
+    # one team order for the bank and the number of previous matches
+    order = group_order(work, [cols.season, cols.team])
+    bank = _momentum_bank(work, order)
+    work = _add_streak(work)
+    work = _add_rolling_ratios(work, bank, order.row_position())
+    return join_columns(df, pd.concat([work[momentum_cols], bank], axis=1))
+
+
 #################################################################
 
 
@@ -86,58 +111,30 @@ def _add_streak(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def _add_rolling_point_ratio(df: pd.DataFrame) -> pd.DataFrame:
-    logger.info("Calculating rolling win-loss-rate...")
-    check_columns(df, [cols.season, cols.team, cols.points, cols.goalsf, cols.goalsa])
-
-    group_cols = [cols.season, cols.team]
-    group_keys = [df[col] for col in group_cols]
-
-    outcome_series = produce_outcome_series(df)
-
-    wins = grouped_aggregate(
-        outcome_series.wins, group_keys, window=WEIGHTS.rolling, shift=1
+def _add_rolling_ratios(
+    df: pd.DataFrame, bank: pd.DataFrame, previous: np.ndarray
+) -> pd.DataFrame:
+    logger.info("Calculating rolling point- and goaldiff-rates...")
+    # the rolling sums come from the bank, whose windows include WEIGHTS.rolling
+    games = np.clip(np.minimum(previous, WEIGHTS.rolling), 1, None)
+    df[cols.prev_rolling_point_ratio] = (
+        bank[f"PrevRollingPoints{WEIGHTS.rolling}"] / games
     )
-    draws = grouped_aggregate(
-        outcome_series.draws, group_keys, window=WEIGHTS.rolling, shift=1
+    df[cols.prev_rolling_goaldiff_ratio] = (
+        bank[f"PrevRollingGoalDiff{WEIGHTS.rolling}"] / games
     )
-    games = grouped_aggregate(
-        outcome_series.games,
-        group_keys,
-        window=WEIGHTS.rolling,
-        shift=1,
-        clip_lower=1,
-    )
-
-    df[cols.prev_rolling_point_ratio] = (3 * wins + draws) / games
-
     return df
 
 
-def _add_rolling_goaldiff_ratio(df: pd.DataFrame) -> pd.DataFrame:
-    logger.info("Calculating rolling goaldiff-rate...")
-
-    group_cols = [cols.season, cols.team]
-    group_keys = [df[col] for col in group_cols]
-
-    outcome_series = produce_outcome_series(df)
-
-    goalsf = grouped_aggregate(
-        outcome_series.goalsf, group_keys, window=WEIGHTS.rolling, shift=1
+def _momentum_bank(df: pd.DataFrame, order: GroupOrder) -> pd.DataFrame:
+    logger.info("Calculating the momentum bank...")
+    return momentum_bank(
+        df,
+        [cols.season, cols.team],
+        windows=MOMENTUM_BANK.windows,
+        half_lives=MOMENTUM_BANK.half_lives,
+        order=order,
     )
-    goalsa = grouped_aggregate(
-        outcome_series.goalsa, group_keys, window=WEIGHTS.rolling, shift=1
-    )
-    games = grouped_aggregate(
-        outcome_series.games,
-        group_keys,
-        window=WEIGHTS.rolling,
-        shift=1,
-        clip_lower=1,
-    )
-    df[cols.prev_rolling_goaldiff_ratio] = (goalsf - goalsa) / games
-
-    return df
 
 
 # def _add_total_rank_performance(df: pd.DataFrame) -> pd.DataFrame:
@@ -5,6 +5,7 @@ import numpy as np
 import pandas as pd
 
 from bundesliga_forecasting.BL_config import COLUMNS, CSV_ENCODING, PATHS
+from bundesliga_forecasting.BL_instrument import instrumented
 from bundesliga_forecasting.BL_utils import (
     check_columns,
     df_sort,
@@ -14,6 +15,7 @@ from bundesliga_forecasting.BL_utils import (
 )
 from bundesliga_forecasting.feature_engineering.F_config import (
     ZONES,
+    Zones,
 )
 
 logger = logging.getLogger(__name__)
@@ -22,6 +24,7 @@ encoding = CSV_ENCODING
 cols = COLUMNS
 
 
+@instrumented
 def add_season_performance(
     src_dir: Path = paths.features,
     target_dir: Path = paths.features,
@@ -34,11 +37,26 @@ def add_season_performance(
     output_path = target_dir / target_file
 
     df = read_csv(input_path)
+    df = season_performance(df)
+
+    save_to_csv(df, output_path)
+
+
+def season_performance(df: pd.DataFrame) -> pd.DataFrame:
     df = df_sort(df, sort_cols=[cols.season, cols.div, cols.date])
     df = _add_zones(df)
     df = _add_total_point_performance(df)
+    return df
 
-    save_to_csv(df, output_path)
+
+def assign_zones(ranks: pd.Series, zones: Zones = ZONES) -> pd.Series:
+    return pd.cut(
+        ranks,
+        bins=zones.bins,
+        labels=zones.labels,
+        right=True,
+        include_lowest=True,
+    )
 
 
 #################################################################
@@ -48,13 +66,7 @@ def _add_zones(df: pd.DataFrame) -> pd.DataFrame:
     logger.info("Creating table zones...")
     check_columns(df, [cols.prev_rank])
 
-    df[cols.zone] = pd.cut(
-        df[cols.prev_rank],
-        bins=ZONES.bins,
-        labels=ZONES.labels,
-        right=True,
-        include_lowest=True,
-    )
+    df[cols.zone] = assign_zones(df[cols.prev_rank])
 
     return df
 
@@ -5,6 +5,7 @@ from pathlib import Path
 import pandas as pd
 
 from bundesliga_forecasting.BL_config import COLUMNS, CSV_ENCODING, PATHS
+from bundesliga_forecasting.BL_instrument import instrumented
 from bundesliga_forecasting.BL_utils import (
     check_columns,
     df_sort,
@@ -14,6 +15,7 @@ from bundesliga_forecasting.BL_utils import (
 )
 from bundesliga_forecasting.feature_engineering.F_utils import (
     create_season_end,
+    division_offsets,
     merge_back,
     prev_season_value,
 )
@@ -50,6 +52,7 @@ merge_cols = [
 merge_on = [cols.season, cols.team]
 
 
+@instrumented
 def add_prev_season_performance(
     src_dir: Path = paths.features,
     target_dir: Path = paths.features,
@@ -63,16 +66,46 @@ def add_prev_season_performance(
     output_path = target_dir / target_file
 
     df = read_csv(input_path)
+    df = prev_season_performance(df)
+
+    save_to_csv(df, output_path)
+
+
+def prev_season_performance(
+    df: pd.DataFrame, *, prev_season_end: pd.DataFrame | None = None
+) -> pd.DataFrame:
+    """
+    Args:
+        prev_season_end (pd.DataFrame | None): Season-end rows of the season
+            before the first season of df (see 'last_season_end'), if df
+            continues an earlier chunk of seasons.
+    """
     df = df_sort(df, sort_cols=[cols.season, cols.div, cols.date])
-    season_end = create_season_end(df, required_cols)
+    if prev_season_end is None:
+        season_end = create_season_end(df, required_cols)
+    else:
+        # the previous season becomes the first season of the frame, so that
+        # only its own rows fall back to the fill values
+        season_end = create_season_end(
+            pd.concat([prev_season_end, df[required_cols]], ignore_index=True),
+            required_cols,
+        )
     season_end = _add_prev_season_division(season_end)
     season_end = _add_prev_season_trank(season_end)
     season_end = _add_prev_season_outcomes(season_end)
     season_end = _add_prev_season_tgoaldiff(season_end)
     season_end = _add_prev_season_tpoint_performance(season_end)
-    df = merge_back(df, season_end, merge_cols=merge_cols, merge_on=merge_on)
+    return merge_back(df, season_end, merge_cols=merge_cols, merge_on=merge_on)
 
-    save_to_csv(df, output_path)
+
+def last_season_end(df: pd.DataFrame) -> pd.DataFrame:
+    check_columns(df, required_cols)
+    last_season = df[df[cols.season] == df[cols.season].max()]
+    return (
+        last_season[required_cols]
+        .groupby([cols.season, cols.team], as_index=False, sort=False)
+        .last()
+    )
 
 
 ##############################################################
@@ -93,7 +126,8 @@ def _add_prev_season_division(season_end: pd.DataFrame) -> pd.DataFrame:
         new_col=cols.prev_season_div,
         required_cols=[cols.season, cols.div, cols.team],
         fallback_function=_fallback_function,
-        fillval=3,
+        # below the lowest division
+        fillval=int(season_end[cols.div].max()) + 1,
     )
 
     return season_end
@@ -105,17 +139,29 @@ def _add_prev_season_trank(season_end: pd.DataFrame) -> pd.DataFrame:
     def _fallback_function(
         team_season: pd.DataFrame, mask: pd.Series, ref_col: str, new_col: str
     ) -> pd.Series:
-        series = team_season.loc[mask, cols.prev_season_div]
-        return (series - 1) * 18 + 1
+        # top rank of the division
+        keys = pd.MultiIndex.from_arrays(
+            [
+                team_season.loc[mask, cols.season],
+                team_season.loc[mask, cols.prev_season_div],
+            ]
+        )
+        return pd.Series(
+            offsets.reindex(keys).to_numpy() + 1, index=team_season.index[mask]
+        )
 
     ## Main function ##
+    offsets = division_offsets(season_end)
+    played = season_end[season_end[cols.div] > 0]
+    n_ladder_teams = played.groupby(cols.season)[cols.team].nunique()
     season_end = _add_prev_season_feature(
         season_end,
         ref_col=cols.post_trank,
         new_col=cols.prev_season_trank,
         required_cols=[cols.season, cols.div, cols.team, cols.post_trank],
         fallback_function=_fallback_function,
-        fillval=37,
+        # below the lowest rank
+        fillval=int(n_ladder_teams.max()) + 1,
     )
 
     return season_end
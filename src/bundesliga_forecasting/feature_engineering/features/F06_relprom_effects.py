@@ -4,6 +4,7 @@ from pathlib import Path
 import pandas as pd
 
 from bundesliga_forecasting.BL_config import COLUMNS, CSV_ENCODING, PATHS
+from bundesliga_forecasting.BL_instrument import instrumented
 from bundesliga_forecasting.BL_utils import (
     check_columns,
     df_sort,
@@ -28,6 +29,7 @@ feature_cols = [
 merge_on = [cols.season, cols.team]
 
 
+@instrumented
 def add_relprom_effects(
     src_dir: Path = paths.features,
     target_dir: Path = paths.features,
@@ -4,6 +4,7 @@ from pathlib import Path
 import pandas as pd
 
 from bundesliga_forecasting.BL_config import COLUMNS, CSV_ENCODING, PATHS
+from bundesliga_forecasting.BL_instrument import instrumented
 from bundesliga_forecasting.BL_utils import (
     check_columns,
     df_sort,
@@ -47,8 +48,18 @@ merge_cols = [
     cols.prev_hist_tpoint_performance,
 ]
 merge_on = [cols.season, cols.team]
+pre_hist_map = {
+    cols.prev_hist_div: cols.prev_season_div,
+    cols.prev_hist_trank: cols.prev_season_trank,
+    cols.prev_hist_twins: cols.prev_season_twins,
+    cols.prev_hist_tlosses: cols.prev_season_tlosses,
+    cols.prev_hist_tdraws: cols.prev_season_tdraws,
+    cols.prev_hist_tgoaldiff: cols.prev_season_tgoaldiff,
+    cols.prev_hist_tpoint_performance: cols.prev_season_tpoint_performance,
+}
 
 
+@instrumented
 def add_historical_features(
     src_dir: Path = paths.features,
     target_dir: Path = paths.features,
@@ -62,27 +73,61 @@ def add_historical_features(
     output_path = target_dir / target_file
 
     df = read_csv(input_path)
-    df = df_sort(df, sort_cols=[cols.season, cols.div, cols.date])
-    season_end = create_season_end(df, required_cols)
-    season_end = _compute_history(season_end)
-    df = merge_back(df, season_end, merge_cols=merge_cols, merge_on=merge_on)
+    df, _ = historical_features(df)
 
     save_to_csv(df, output_path)
 
 
-##############################################################
+def historical_features(
+    df: pd.DataFrame, *, initial: pd.DataFrame | None = None
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Args:
+        initial (pd.DataFrame | None): EWM state per team before the first
+            season of df, if df continues an earlier chunk of seasons.
 
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: df with the historical features and
+        the EWM state per team after the last season of df, which includes the
+        teams of 'initial' without rows in df.
+    """
+    df = df_sort(df, sort_cols=[cols.season, cols.div, cols.date])
+    season_end = create_season_end(df, required_cols)
+    season_end = compute_history(season_end, initial=initial)
+    df = merge_back(df, season_end, merge_cols=merge_cols, merge_on=merge_on)
 
-def _compute_history(season_end: pd.DataFrame) -> pd.DataFrame:
-    pre_hist_map = {
-        cols.prev_hist_div: cols.prev_season_div,
-        cols.prev_hist_trank: cols.prev_season_trank,
-        cols.prev_hist_twins: cols.prev_season_twins,
-        cols.prev_hist_tlosses: cols.prev_season_tlosses,
-        cols.prev_hist_tdraws: cols.prev_season_tdraws,
-        cols.prev_hist_tgoaldiff: cols.prev_season_tgoaldiff,
-        cols.prev_hist_tpoint_performance: cols.prev_season_tpoint_performance,
-    }
+    state = season_end.groupby(cols.team, as_index=False, sort=False)[
+        list(pre_hist_map)
+    ].last()
+    if initial is not None:
+        # teams without rows in df had a zero row in every season of df
+        absent = initial[~initial[cols.team].isin(state[cols.team])].copy()
+        n_seasons = season_end[cols.season].nunique()
+        absent[list(pre_hist_map)] *= (1 - WEIGHTS.history) ** n_seasons
+        state = pd.concat([state, absent], ignore_index=True)
+    return df, state
+
+
+def compute_history(
+    season_end: pd.DataFrame,
+    *,
+    alpha: float = WEIGHTS.history,
+    initial: pd.DataFrame | None = None,
+) -> pd.DataFrame:
+    if initial is not None:
+        # the state enters the EWM as a first row per team, teams without
+        # state had a zero row in every earlier season
+        teams = season_end[cols.team].drop_duplicates()
+        start = (
+            initial.set_index(cols.team)[list(pre_hist_map)]
+            .reindex(teams, fill_value=0)
+            .rename(columns=pre_hist_map)
+            .reset_index()
+        )
+        season_end = pd.concat(
+            [start.assign(_initial=True), season_end.assign(_initial=False)],
+            ignore_index=True,
+        )
 
     for hist_col, pre_col in pre_hist_map.items():
         check_columns(season_end, [pre_col])
@@ -90,9 +135,15 @@ def _compute_history(season_end: pd.DataFrame) -> pd.DataFrame:
             season_end.groupby(cols.team, sort=False)[pre_col]
             # .shift(1, fill_value=0)
             # .groupby(season_end[cols.team], sort=False)
-            .ewm(alpha=WEIGHTS.history, adjust=False)
+            .ewm(alpha=alpha, adjust=False)
             .mean()
             .reset_index(level=0, drop=True)
         )
 
+    if initial is not None:
+        season_end = (
+            season_end[~season_end["_initial"]]
+            .drop(columns=["_initial"])
+            .reset_index(drop=True)
+        )
     return season_end
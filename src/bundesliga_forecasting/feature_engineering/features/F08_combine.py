@@ -4,6 +4,7 @@ from pathlib import Path
 import pandas as pd
 
 from bundesliga_forecasting.BL_config import COLUMNS, CSV_ENCODING, PATHS, PREDICTORS
+from bundesliga_forecasting.BL_instrument import instrumented
 from bundesliga_forecasting.BL_utils import (
     check_columns,
     ensure_dir,
@@ -19,6 +20,7 @@ encoding = CSV_ENCODING
 cols = COLUMNS
 
 
+@instrumented
 def apply_feature_combination(
     src_dir: Path = paths.features,
     target_dir: Path = paths.features,
@@ -32,11 +34,15 @@ def apply_feature_combination(
     output_path = target_dir / target_file
 
     df = read_csv(input_path)
-    df = _combine_home_away_features(df)
-    df = _select_features(df)
+    df = feature_combination(df)
     save_to_csv(df, output_path)
 
 
+def feature_combination(df: pd.DataFrame) -> pd.DataFrame:
+    df = _combine_home_away_features(df)
+    return _select_features(df)
+
+
 #################################################################
 
 
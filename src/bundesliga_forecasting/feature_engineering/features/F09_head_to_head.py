@@ -0,0 +1,182 @@
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from bundesliga_forecasting.BL_config import COLUMNS, CSV_ENCODING, PATHS
+from bundesliga_forecasting.BL_instrument import instrumented
+from bundesliga_forecasting.BL_utils import (
+    check_columns,
+    df_sort,
+    ensure_dir,
+    read_csv,
+    save_to_csv,
+)
+from bundesliga_forecasting.feature_engineering.F_config import DRAW_VALUE, WEIGHTS
+from bundesliga_forecasting.feature_engineering.F_utils import (
+    join_columns,
+    produce_outcome_series,
+)
+
+logger = logging.getLogger(__name__)
+
+paths = PATHS
+encoding = CSV_ENCODING
+cols = COLUMNS
+required_cols = [
+    cols.season,
+    cols.div,
+    cols.date,
+    cols.team,
+    cols.opp,
+    cols.points,
+    cols.goalsf,
+    cols.goalsa,
+]
+pair_cols = ["_first", "_second"]
+total_cols = ["_games", "_points", "_opp_points", "_goaldiff"]
+h2h_cols = [
+    cols.prev_h2h_matches,
+    cols.prev_h2h_point_ratio,
+    cols.prev_h2h_goaldiff_ratio,
+    cols.prev_h2h_result_ewm,
+]
+
+
+@instrumented
+def add_head_to_head(
+    src_dir: Path = paths.features,
+    target_dir: Path = paths.features,
+    src_file: str = paths.feature_file,
+    target_file: str = paths.feature_file,
+) -> None:
+    """
+    Description:
+        Adds the record of all previous meetings of team and opponent, over
+        all seasons and divisions, to every team-match row.
+        Step 1 -> Key every match by the unordered pair of its clubs and keep
+                  one row per match, seen from the pair's first club
+        Step 2 -> Cumulate meetings, points, goal difference and an EWM of the
+                  results per pair, shifted by one meeting
+        Step 3 -> Mirror the pair records onto both team-match rows
+
+        Every step is a grouped pass over the date-sorted rows, so the stage
+        is linear in the number of matches.
+
+    Usage location:
+        feature_engineering/F_pipeline.py
+    """
+    logger.info("Adding head-to-head features to the DataFrame...")
+    ensure_dir([src_dir, target_dir], ["src", "target"])
+
+    input_path = src_dir / src_file
+    output_path = target_dir / target_file
+
+    df = read_csv(input_path)
+    df, _ = head_to_head(df)
+
+    save_to_csv(df, output_path)
+
+
+def head_to_head(
+    df: pd.DataFrame, *, records: pd.DataFrame | None = None
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Args:
+        records (pd.DataFrame | None): Pair records after all earlier meetings,
+            if df continues an earlier chunk of seasons.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: df with the head-to-head features
+        and the record of every pair after its last meeting, which includes the
+        pairs of 'records' without a meeting in df.
+    """
+    check_columns(df, required_cols)
+    df = df_sort(df, sort_cols=[cols.season, cols.div, cols.date])
+    # computed on the input columns only, the features of an earlier run are
+    # replaced by the join
+    pairs = _add_pair_key(df[required_cols])
+    matches, records = _compute_pair_records(pairs, records)
+    return join_columns(df, _mirror_pair_records(pairs, matches)), records
+
+
+#################################################################
+
+
+def _add_pair_key(df: pd.DataFrame) -> pd.DataFrame:
+    logger.info("Keying the matches by club pair...")
+    # the first club of a pair is the one with the lower name, so that the
+    # orientation of a pair does not depend on the rows of one run
+    df["_is_first"] = df[cols.team] < df[cols.opp]
+    df["_first"] = df[cols.team].where(df["_is_first"], df[cols.opp])
+    df["_second"] = df[cols.opp].where(df["_is_first"], df[cols.team])
+    return df
+
+
+def _compute_pair_records(
+    df: pd.DataFrame, records: pd.DataFrame | None
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    logger.info("Cumulating the head-to-head records...")
+    matches = df.loc[df["_is_first"], [cols.date] + pair_cols].copy()
+    outcome_series = produce_outcome_series(df.loc[df["_is_first"]])
+    # seen from the pair's first club
+    wins, draws, losses = (
+        outcome_series.wins,
+        outcome_series.draws,
+        outcome_series.losses,
+    )
+    matches["_games"] = 1
+    matches["_points"] = 3 * wins + draws
+    matches["_opp_points"] = 3 * losses + draws
+    matches["_goaldiff"] = outcome_series.goalsf - outcome_series.goalsa
+    matches["_result"] = wins + draws * DRAW_VALUE
+    if records is not None:
+        # the records enter as a first meeting per pair, which carries the
+        # totals and the EWM of all earlier meetings
+        matches = pd.concat(
+            [records.assign(_record=True), matches.assign(_record=False)],
+            ignore_index=True,
+        )
+
+    pairs = matches.groupby(pair_cols, sort=False)
+    totals = {col: pairs[col].cumsum() for col in total_cols}
+    result_ewm = (
+        pairs["_result"]
+        .ewm(alpha=WEIGHTS.head_to_head, adjust=False)
+        .mean()
+        .reset_index(level=list(range(len(pair_cols))), drop=True)
+        .reindex(matches.index)
+    )
+    records = matches[pair_cols].assign(**totals, _result=result_ewm)
+    records = records.groupby(pair_cols, as_index=False, sort=False).last()
+
+    for col in total_cols:
+        # totals of the meetings before the current one
+        matches[col] = totals[col] - matches[col]
+    matches["_result"] = result_ewm.groupby(
+        [matches[col] for col in pair_cols], sort=False
+    ).shift(1, fill_value=DRAW_VALUE)
+    if "_record" in matches:
+        matches = matches[~matches["_record"]].drop(columns=["_record"])
+    matches = matches.rename(columns={"_games": cols.prev_h2h_matches})
+    return matches, records
+
+
+def _mirror_pair_records(df: pd.DataFrame, pair_records: pd.DataFrame) -> pd.DataFrame:
+    logger.info("Mirroring the head-to-head records onto both teams...")
+    pair_index = df.index
+    df = df.merge(pair_records, on=[cols.date] + pair_cols, how="left")
+
+    games = df[cols.prev_h2h_matches].fillna(0).clip(lower=1)
+    sign = np.where(df["_is_first"], 1, -1)
+    points = np.where(df["_is_first"], df["_points"], df["_opp_points"])
+    result = np.where(df["_is_first"], df["_result"], 1 - df["_result"])
+
+    df[cols.prev_h2h_matches] = df[cols.prev_h2h_matches].fillna(0).astype(int)
+    df[cols.prev_h2h_point_ratio] = np.nan_to_num(points / games)
+    df[cols.prev_h2h_goaldiff_ratio] = np.nan_to_num(sign * df["_goaldiff"] / games)
+    df[cols.prev_h2h_result_ewm] = np.nan_to_num(result, nan=DRAW_VALUE)
+
+    # the left merge keeps the rows of df in order
+    return df[h2h_cols].set_axis(pair_index)
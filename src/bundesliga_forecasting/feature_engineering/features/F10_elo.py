@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import json
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from bundesliga_forecasting.BL_config import COLUMNS, CSV_ENCODING, PATHS
+from bundesliga_forecasting.BL_instrument import instrumented
+from bundesliga_forecasting.BL_utils import (
+    check_columns,
+    df_sort,
+    ensure_dir,
+    read_csv,
+    save_to_csv,
+)
+from bundesliga_forecasting.feature_engineering.F_config import DRAW_VALUE, ELO
+from bundesliga_forecasting.feature_engineering.F_utils import join_columns
+
+logger = logging.getLogger(__name__)
+
+paths = PATHS
+encoding = CSV_ENCODING
+cols = COLUMNS
+elo = ELO
+required_cols = [
+    cols.season,
+    cols.date,
+    cols.home,
+    cols.team,
+    cols.opp,
+    cols.goalsf,
+    cols.goalsa,
+]
+rating_cols = [cols.prev_elo, cols.prev_goal_elo]
+opp_rating_cols = [cols.prev_opp_elo, cols.prev_opp_goal_elo]
+
+
+@dataclass
+class RatingState:
+    """
+    Ratings of all teams after the last rated matchday. Passing the state of a
+    previous run to 'rate_matches' continues the ratings with new matches only.
+    """
+
+    teams: dict[str, int] = field(default_factory=dict)
+    elo: np.ndarray = field(default_factory=lambda: np.empty(0))
+    goal_elo: np.ndarray = field(default_factory=lambda: np.empty(0))
+    season: int | None = None
+    date: np.datetime64 | None = None
+
+    def team_codes(self, teams: pd.Series) -> np.ndarray:
+        # unseen teams are appended with the initial rating
+        for team in teams.drop_duplicates():
+            if team not in self.teams:
+                self.teams[team] = len(self.teams)
+        n_new = len(self.teams) - len(self.elo)
+        if n_new:
+            self.elo = np.r_[self.elo, np.full(n_new, elo.initial)]
+            self.goal_elo = np.r_[self.goal_elo, np.full(n_new, elo.initial)]
+        return teams.map(self.teams).to_numpy()
+
+    def save(self, path: Path) -> None:
+        state = {
+            "season": self.season,
+            "date": None if self.date is None else str(self.date),
+            "ratings": {
+                team: [self.elo[code], self.goal_elo[code]]
+                for team, code in self.teams.items()
+            },
+        }
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(state, file, indent=2)
+
+    @classmethod
+    def load(cls, path: Path) -> RatingState:
+        with open(path, encoding="utf-8") as file:
+            state = json.load(file)
+        ratings = np.array(list(state["ratings"].values()), dtype=float).reshape(-1, 2)
+        return cls(
+            teams={team: code for code, team in enumerate(state["ratings"])},
+            elo=ratings[:, 0],
+            goal_elo=ratings[:, 1],
+            season=state["season"],
+            date=None if state["date"] is None else np.datetime64(state["date"], "D"),
+        )
+
+
+@instrumented
+def add_elo_ratings(
+    src_dir: Path = paths.features,
+    target_dir: Path = paths.features,
+    src_file: str = paths.feature_file,
+    target_file: str = paths.feature_file,
+    state_file: str = paths.elo_state_file,
+    *,
+    resume: bool = False,
+) -> None:
+    """
+    Description:
+        Adds the pre-match Elo ratings of team and opponent, once from the
+        results only and once weighted by the goal margin.
+        Step 1 -> Reduce the team-match rows to one row per match
+        Step 2 -> Rate the matches chronologically over all seasons and
+                  divisions, one matchday per vectorized batch
+        Step 3 -> Attach the ratings to the home and the away rows
+        Step 4 -> Save the final ratings, so that new matchdays can be rated
+                  without replaying the history
+
+        With 'resume', the ratings continue from the saved state: only the
+        rows after its date are rated, the earlier rows keep the ratings of
+        the previous run.
+
+    Usage location:
+        feature_engineering/F_pipeline.py
+    """
+    logger.info("Adding Elo ratings to the DataFrame...")
+    ensure_dir([src_dir, target_dir], ["src", "target"])
+
+    input_path = src_dir / src_file
+    output_path = target_dir / target_file
+
+    state_path = target_dir / state_file
+
+    df = read_csv(input_path)
+    if resume and state_path.exists():
+        state = RatingState.load(state_path)
+        df = _resume_ratings(df, state)
+    else:
+        state = RatingState()
+        df = elo_ratings(df, state)
+
+    save_to_csv(df, output_path)
+    state.save(state_path)
+
+
+def elo_ratings(df: pd.DataFrame, state: RatingState) -> pd.DataFrame:
+    check_columns(df, required_cols)
+    matches = df_sort(df[df[cols.home] == 1], sort_cols=[cols.date])
+    ratings = rate_matches(matches, state)
+    return _merge_ratings(df, matches, ratings)
+
+
+@instrumented(kernel=True)
+def rate_matches(matches: pd.DataFrame, state: RatingState) -> np.ndarray:
+    """
+    Description:
+        Rates matches in date order and updates 'state' in place. All matches
+        of a date are rated from the ratings before that date.
+        Step 1 -> At the first date of a new season, regress all ratings
+                  towards the initial rating by 'season_regression'
+        Step 2 -> Gather the home and away ratings of the date's matches and
+                  record them as pre-match ratings
+        Step 3 -> Update both ratings by k * (result - expected result), for
+                  the goal-based variant scaled by the goal margin
+
+    Args:
+        matches (pd.DataFrame): One row per match from the home team's view,
+            sorted by date and later than 'state.date'.
+        state (RatingState): Ratings to start from, e.g. of a previous run.
+
+    Returns:
+        np.ndarray: Pre-match ratings of shape (n_matches, 4) with the columns
+        home Elo, home goal Elo, away Elo, away goal Elo.
+    """
+    check_columns(matches, required_cols)
+    dates = matches[cols.date].to_numpy().astype("datetime64[D]")
+    if len(dates) and state.date is not None and dates[0] <= state.date:
+        raise ValueError(
+            f"The matches have to be later than the rated ones ({state.date})."
+        )
+
+    home = state.team_codes(matches[cols.team])
+    away = state.team_codes(matches[cols.opp])
+    seasons = matches[cols.season].to_numpy()
+    goaldiff = (matches[cols.goalsf] - matches[cols.goalsa]).to_numpy()
+    result = np.where(goaldiff > 0, 1.0, np.where(goaldiff < 0, 0.0, DRAW_VALUE))
+    margin = np.abs(goaldiff)
+    # goal margin multiplier of the World Football Elo Ratings
+    margin_weight = np.where(
+        margin <= 1, 1.0, np.where(margin == 2, 1.5, (11 + margin) / 8)
+    )
+
+    ratings = np.empty((len(matches), 4))
+    starts = np.flatnonzero(np.r_[True, dates[1:] != dates[:-1]])
+    for start, end in zip(starts, np.r_[starts[1:], len(dates)]):
+        if seasons[start] != state.season:
+            for values in (state.elo, state.goal_elo):
+                values -= elo.season_regression * (values - elo.initial)
+            state.season = seasons[start]
+
+        h, a = home[start:end], away[start:end]
+        ratings[start:end] = np.column_stack(
+            [state.elo[h], state.goal_elo[h], state.elo[a], state.goal_elo[a]]
+        )
+        for values, weight, offset in (
+            (state.elo, 1.0, 0),
+            (state.goal_elo, margin_weight[start:end], 1),
+        ):
+            rating_diff = (
+                ratings[start:end, offset]
+                - ratings[start:end, offset + 2]
+                + elo.home_advantage
+            )
+            expected = 1 / (1 + 10 ** (-rating_diff / elo.scale))
+            delta = elo.k * weight * (result[start:end] - expected)
+            np.add.at(values, h, delta)
+            np.add.at(values, a, -delta)
+
+    if len(dates):
+        state.date = dates[-1]
+        state.season = int(seasons[-1])
+    return ratings
+
+
+#################################################################
+
+
+def _resume_ratings(df: pd.DataFrame, state: RatingState) -> pd.DataFrame:
+    dates = df[cols.date].to_numpy().astype("datetime64[D]")
+    is_new = dates > state.date if state.date is not None else np.ones(len(df), bool)
+    if is_new.all():
+        return elo_ratings(df, state)
+    if not set(rating_cols + opp_rating_cols) <= set(df.columns):
+        raise ValueError(
+            "The rows up to the saved state have no ratings, "
+            "rate them without 'resume' first."
+        )
+    logger.info("Rating %d rows after %s...", is_new.sum(), state.date)
+    new = elo_ratings(df[is_new], state)
+    df = df.copy()
+    df.loc[is_new, rating_cols + opp_rating_cols] = new[rating_cols + opp_rating_cols]
+    return df
+
+
+def _merge_ratings(
+    df: pd.DataFrame, matches: pd.DataFrame, ratings: np.ndarray
+) -> pd.DataFrame:
+    logger.info("Attaching the ratings to the team-match rows...")
+    home_view = matches[[cols.date, cols.team]].assign(
+        **dict(zip(rating_cols + opp_rating_cols, ratings.T))
+    )
+    away_view = matches[[cols.date, cols.opp]].rename(columns={cols.opp: cols.team})
+    away_view = away_view.assign(**dict(zip(opp_rating_cols + rating_cols, ratings.T)))
+    team_ratings = pd.concat([home_view, away_view], ignore_index=True)
+    # merged on the keys only, the ratings of an earlier run are replaced by
+    # the join; the left merge keeps the rows of df in order
+    row_ratings = df[[cols.date, cols.team]].merge(
+        team_ratings, on=[cols.date, cols.team], how="left"
+    )
+    return join_columns(
+        df, row_ratings[rating_cols + opp_rating_cols].set_axis(df.index)
+    )
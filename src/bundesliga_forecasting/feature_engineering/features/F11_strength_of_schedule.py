@@ -0,0 +1,189 @@
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.linalg import lsmr
+
+from bundesliga_forecasting.BL_config import COLUMNS, CSV_ENCODING, PATHS
+from bundesliga_forecasting.BL_instrument import instrumented
+from bundesliga_forecasting.BL_utils import (
+    check_columns,
+    df_sort,
+    ensure_dir,
+    read_csv,
+    save_to_csv,
+)
+from bundesliga_forecasting.feature_engineering.F_config import SOS
+from bundesliga_forecasting.feature_engineering.F_utils import join_columns
+
+logger = logging.getLogger(__name__)
+
+paths = PATHS
+encoding = CSV_ENCODING
+cols = COLUMNS
+sos = SOS
+required_cols = [
+    cols.season,
+    cols.date,
+    cols.home,
+    cols.team,
+    cols.opp,
+    cols.goalsf,
+    cols.goalsa,
+    cols.points,
+]
+
+
+@instrumented
+def add_strength_of_schedule(
+    src_dir: Path = paths.features,
+    target_dir: Path = paths.features,
+    src_file: str = paths.feature_file,
+    target_file: str = paths.feature_file,
+) -> None:
+    """
+    Description:
+        Adds the season goal difference and points of every team before the
+        match, adjusted for the strength of the opponents played so far.
+        Step 1 -> For every date, fit attack/defence strengths on goals and
+                  a strength on points to all earlier matches of the season
+                  (ridge least squares on a sparse design, warm-started from
+                  the previous date)
+        Step 2 -> Subtract from every earlier result what an average team
+                  would have been expected to get in that fixture
+        Step 3 -> Sum the adjusted results per team up to the match
+
+    Usage location:
+        feature_engineering/F_pipeline.py
+    """
+    logger.info("Adding strength-of-schedule features to the DataFrame...")
+    ensure_dir([src_dir, target_dir], ["src", "target"])
+
+    input_path = src_dir / src_file
+    output_path = target_dir / target_file
+
+    df = read_csv(input_path)
+    df = strength_of_schedule(df)
+
+    save_to_csv(df, output_path)
+
+
+def strength_of_schedule(df: pd.DataFrame) -> pd.DataFrame:
+    check_columns(df, required_cols)
+    # the seasons are adjusted in date order, df keeps its own row order
+    ordered = df_sort(df, sort_cols=[cols.season, cols.date])
+
+    adjusted = [
+        _adjust_season(season_df)
+        for _, season_df in ordered.groupby(cols.season, sort=False)
+    ]
+    return join_columns(df, pd.concat(adjusted))
+
+
+#################################################################
+
+
+@instrumented(kernel=True)
+def _adjust_season(season_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Description:
+        Goals are modelled as mean + attack(team) - defence(opp) + home, points
+        as mean + strength(team) - strength(opp) + home, with home = +1/-1 for
+        the home/away row. An average team has zero strengths, so its expected
+        goal difference against 'opp' is -(attack(opp) + defence(opp)) +
+        2 * home and its expected points are mean - strength(opp) + home.
+    """
+    team, teams = pd.factorize(season_df[cols.team])
+    opp = teams.get_indexer(season_df[cols.opp])
+    if (opp < 0).any():
+        # opponents without own rows still need a column
+        opp_codes, opp_teams = pd.factorize(season_df[cols.opp].where(opp < 0))
+        opp = np.where(opp < 0, len(teams) + opp_codes, opp)
+        teams = teams.append(opp_teams)
+    n_teams = len(teams)
+    n_rows = len(season_df)
+
+    venue = np.where(season_df[cols.home].to_numpy() == 1, 1.0, -1.0)
+    goalsf = season_df[cols.goalsf].to_numpy(dtype=float)
+    goaldiff = goalsf - season_df[cols.goalsa].to_numpy(dtype=float)
+    points = season_df[cols.points].to_numpy(dtype=float)
+
+    rows = np.arange(n_rows)
+    ones = np.ones(n_rows)
+
+    def full(column: int) -> np.ndarray:
+        return np.full(n_rows, column)
+
+    # columns: attack of team, defence of opp, home
+    goal_design = sparse.csr_matrix(
+        (
+            np.r_[ones, -ones, venue],
+            (np.r_[rows, rows, rows], np.r_[team, n_teams + opp, full(2 * n_teams)]),
+        ),
+        shape=(n_rows, 2 * n_teams + 1),
+    )
+    # columns: strength of team and opp, home
+    point_design = sparse.csr_matrix(
+        (
+            np.r_[ones, -ones, venue],
+            (np.r_[rows, rows, rows], np.r_[team, opp, full(n_teams)]),
+        ),
+        shape=(n_rows, n_teams + 1),
+    )
+
+    goal_theta = np.zeros(2 * n_teams + 1)
+    point_theta = np.zeros(n_teams + 1)
+    adj_goaldiff = np.zeros(n_rows)
+    adj_points = np.zeros(n_rows)
+
+    dates = season_df[cols.date].to_numpy()
+    starts = np.flatnonzero(np.r_[True, dates[1:] != dates[:-1]])
+    for start, end in zip(starts, np.r_[starts[1:], n_rows]):
+        if start == 0:
+            continue
+        prev = slice(0, start)
+        goal_mean = goalsf[prev].mean()
+        point_mean = points[prev].mean()
+        goal_theta = _ridge(goal_design[prev], goalsf[prev] - goal_mean, goal_theta)
+        point_theta = _ridge(point_design[prev], points[prev] - point_mean, point_theta)
+
+        attack, defence = goal_theta[:n_teams], goal_theta[n_teams:-1]
+        expected_goaldiff = (
+            -(attack[opp[prev]] + defence[opp[prev]]) + 2 * goal_theta[-1] * venue[prev]
+        )
+        expected_points = (
+            point_mean - point_theta[opp[prev]] + point_theta[-1] * venue[prev]
+        )
+        team_goaldiff = np.bincount(
+            team[prev], goaldiff[prev] - expected_goaldiff, minlength=n_teams
+        )
+        team_points = np.bincount(
+            team[prev], points[prev] - expected_points, minlength=n_teams
+        )
+        adj_goaldiff[start:end] = team_goaldiff[team[start:end]]
+        adj_points[start:end] = team_points[team[start:end]]
+
+    return pd.DataFrame(
+        {cols.prev_adj_tgoaldiff: adj_goaldiff, cols.prev_adj_tpoints: adj_points},
+        index=season_df.index,
+    )
+
+
+def _ridge(design: sparse.csr_matrix, target: np.ndarray, x0: np.ndarray) -> np.ndarray:
+    # the penalty rows are stacked onto the design instead of passing 'damp',
+    # since lsmr would only damp the correction to the warm start 'x0'
+    n_params = design.shape[1]
+    augmented = sparse.vstack(
+        [design, np.sqrt(sos.ridge) * sparse.identity(n_params, format="csr")],
+        format="csr",
+    )
+    return lsmr(
+        augmented,
+        np.r_[target, np.zeros(n_params)],
+        atol=sos.tol,
+        btol=sos.tol,
+        maxiter=sos.max_iter,
+        x0=x0,
+    )[0]
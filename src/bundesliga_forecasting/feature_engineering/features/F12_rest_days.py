@@ -0,0 +1,144 @@
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from bundesliga_forecasting.BL_config import COLUMNS, CSV_ENCODING, PATHS
+from bundesliga_forecasting.BL_instrument import instrumented
+from bundesliga_forecasting.BL_utils import (
+    check_columns,
+    df_sort,
+    ensure_dir,
+    read_csv,
+    save_to_csv,
+)
+from bundesliga_forecasting.feature_engineering.F_config import REST
+from bundesliga_forecasting.feature_engineering.F_standings import DAY_BITS
+from bundesliga_forecasting.feature_engineering.F_utils import join_columns
+
+logger = logging.getLogger(__name__)
+
+paths = PATHS
+encoding = CSV_ENCODING
+cols = COLUMNS
+rest = REST
+required_cols = [cols.season, cols.div, cols.date, cols.team, cols.opp]
+
+
+def congestion_col(window: int) -> str:
+    return f"PrevMatchesLast{window}Days"
+
+
+@instrumented
+def add_rest_days(
+    src_dir: Path = paths.features,
+    target_dir: Path = paths.features,
+    src_file: str = paths.feature_file,
+    target_file: str = paths.feature_file,
+) -> None:
+    """
+    Description:
+        Adds the rest before every match and the fixture congestion of the
+        team, over all seasons and divisions.
+        Step 1 -> Order the rows by team and date, so that every team's dates
+                  form one sorted run of a (team, day) key
+        Step 2 -> Rest days as the difference to the previous key of the same
+                  team, capped at 'max_days' (also for a team's first match)
+        Step 3 -> Matches in the last 'windows' days as the distance to the
+                  binary-searched start of each window
+        Step 4 -> Look up the opponent's rest by its (opp, day) key
+
+        All steps are vectorized over the whole frame, so the stage is linear
+        in the number of rows apart from one sort.
+
+    Usage location:
+        feature_engineering/F_pipeline.py
+    """
+    logger.info("Adding rest and congestion features to the DataFrame...")
+    ensure_dir([src_dir, target_dir], ["src", "target"])
+
+    input_path = src_dir / src_file
+    output_path = target_dir / target_file
+
+    df = read_csv(input_path)
+    df, _ = rest_days(df)
+
+    save_to_csv(df, output_path)
+
+
+def rest_days(
+    df: pd.DataFrame, *, recent: pd.DataFrame | None = None
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Args:
+        recent (pd.DataFrame | None): Matches of the days before df which are
+            still within reach of the rest cap and the windows, if df
+            continues an earlier chunk of seasons.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: df with the rest and congestion
+        features and its own recent matches, to continue from.
+    """
+    check_columns(df, required_cols)
+    df = df_sort(df, sort_cols=[cols.season, cols.div, cols.date])
+    if recent is None:
+        df = join_columns(df, compute_rest_days(df))
+    else:
+        rows = pd.concat([recent, df[required_cols]], ignore_index=True)
+        rest_cols = compute_rest_days(rows).iloc[len(recent) :]
+        df = join_columns(df, rest_cols.set_axis(df.index))
+
+    horizon = np.timedelta64(max(rest.max_days, *rest.windows), "D")
+    recent = df.loc[df[cols.date] >= df[cols.date].max() - horizon, required_cols]
+    return df, recent
+
+
+@instrumented(kernel=True)
+def compute_rest_days(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns:
+        pd.DataFrame: The rest and congestion columns, aligned with the index
+        of df.
+    """
+    team_codes, teams = pd.factorize(df[cols.team])
+    opp_codes = teams.get_indexer(df[cols.opp])
+    days = df[cols.date].to_numpy().astype("datetime64[D]").astype(np.int64)
+    days = days - days.min()
+
+    key = (team_codes.astype(np.int64) << DAY_BITS) + days
+    order = np.argsort(key, kind="stable")
+    sorted_key = key[order]
+    same_team = np.r_[False, team_codes[order][1:] == team_codes[order][:-1]]
+
+    rest_days = np.full(len(df), rest.max_days, dtype=np.int64)
+    gaps = np.diff(sorted_key, prepend=0)
+    rest_days[order[same_team]] = np.minimum(gaps[same_team], rest.max_days)
+
+    position = np.empty(len(df), dtype=np.int64)
+    position[order] = np.arange(len(df))
+    congestion = {}
+    for window in rest.windows:
+        # the window start is clipped to the team's own run of keys
+        start_key = (team_codes.astype(np.int64) << DAY_BITS) + np.maximum(
+            days - window, 0
+        )
+        congestion[congestion_col(window)] = position - np.searchsorted(
+            sorted_key, start_key, side="left"
+        )
+
+    # opponents without own rows keep the capped rest
+    opp_key = (opp_codes.astype(np.int64) << DAY_BITS) + days
+    opp_position = np.clip(np.searchsorted(sorted_key, opp_key), 0, len(df) - 1)
+    found = (opp_codes >= 0) & (sorted_key[opp_position] == opp_key)
+    opp_rest_days = np.where(found, rest_days[order[opp_position]], rest.max_days)
+
+    return pd.DataFrame(
+        {
+            cols.prev_rest_days: rest_days,
+            cols.prev_opp_rest_days: opp_rest_days,
+            cols.prev_rest_diff: rest_days - opp_rest_days,
+            **congestion,
+        },
+        index=df.index,
+    )
@@ -1,3 +1,5 @@
+from pathlib import Path
+
 from bundesliga_forecasting.BL_config import PATHS
 from bundesliga_forecasting.BL_utils import check_columns, read_csv
 from bundesliga_forecasting.feature_engineering.F_config import COLUMNS
@@ -5,12 +7,7 @@ from bundesliga_forecasting.feature_engineering.F_config import COLUMNS
 paths = PATHS
 cols = COLUMNS
 
-df = read_csv(paths.features / paths.combined_file)
-all_cols = df.columns
-for col in all_cols:
-    print(f"\n{col}")
-team = "Karlsruhe"
-columns = [
+INSPECT_COLS = [
     cols.season,
     cols.div,
     cols.date,
@@ -21,19 +18,36 @@ columns = [
     # cols.prev_hist_tpoint_performance,
 ]
 
-check_columns(df, columns)
 
+def inspect_df(
+    src_dir: Path = paths.features,
+    src_file: str = paths.combined_file,
+    *,
+    team: str = "Karlsruhe",
+    columns: list[str] = INSPECT_COLS,
+    n_rows: int = 10,
+    list_columns: bool = True,
+) -> None:
+    df = read_csv(src_dir / src_file)
+    if list_columns:
+        for col in df.columns:
+            print(f"\n{col}")
 
-filter_df = df.loc[
-    (df[cols.team] == team),
-    columns,
-]
+    check_columns(df, columns)
+
+    group_df = (
+        df[df[cols.team] == team]
+        .groupby([cols.season])[columns]
+        .last()
+        .reset_index(drop=True)
+    )
+
+    print(group_df.head(n_rows))
+
+
+def main() -> None:
+    inspect_df()
 
-group_df = (
-    df[df[cols.team] == team]
-    .groupby([cols.season])[columns]
-    .last()
-    .reset_index(drop=True)
-)
 
-print(group_df.head(10))
+if __name__ == "__main__":
+    main()
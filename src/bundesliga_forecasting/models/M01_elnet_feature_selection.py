@@ -1,3 +1,4 @@
+import json
 import logging
 from pathlib import Path
 from typing import Tuple
@@ -17,13 +18,17 @@ from bundesliga_forecasting.BL_config import (
     PREDICTORS,
     setup_logging,
 )
+from bundesliga_forecasting.BL_instrument import instrumented
 from bundesliga_forecasting.BL_utils import (
     check_columns,
+    df_sort,
     ensure_dir,
     read_csv,
     save_to_csv,
 )
-from bundesliga_forecasting.models.M_config import ELASTICNET
+from bundesliga_forecasting.models.M_config import ELASTICNET, SEARCH, SearchMode
+from bundesliga_forecasting.models.M_poisson_elnet import PoissonElasticNetCV
+from bundesliga_forecasting.models.M_search import halving_search
 
 logger = logging.getLogger(__name__)
 
@@ -32,15 +37,30 @@ preds = list(PREDICTORS.values())
 encoding = CSV_ENCODING
 cols = COLUMNS
 elnet = ELASTICNET
+search = SEARCH
 
 opp_preds = [f"{pred}_opp" for pred in preds if pred != cols.home]
 preds = preds + opp_preds
 
 
+def id_columns(selected_features: list[str]) -> list[str]:
+    """
+    Columns of the train, valid and test files which are not model features.
+    The opponent and the venue identify the match when pairing team rows for
+    scoring, the venue is a feature instead if it was selected.
+    """
+    id_cols = [cols.goalsf, cols.season, cols.div, cols.date, cols.team, cols.opp]
+    return id_cols + ([cols.home] if cols.home not in selected_features else [])
+
+
+@instrumented
 def data_setup(
     src_dir: Path = paths.features,
     src_file: str = paths.combined_file,
     target_dir: Path = paths.features,
+    *,
+    search_mode: SearchMode = search.mode,
+    time_budget: float | None = search.time_budget,
 ) -> None:
     setup_logging()
     logger.info("Starting Elastic-Net feature selection process...")
@@ -49,23 +69,25 @@ def data_setup(
     input_path = src_dir / src_file
 
     df = read_csv(input_path)
-    df = df.sort_values([cols.date]).reset_index(drop=True)
+    df = df_sort(df, sort_cols=[cols.date]).reset_index(drop=True)
     train, valid, test = _split(df)
-    model = _train_poisson_elnet(train)
+    model = _train_poisson_elnet(
+        train, search_mode=search_mode, time_budget=time_budget
+    )
 
     # model output
     selected_features = _log_selected_features(model, train[preds])
     # scaler = model.named_steps["scaler"]
 
-    df_selected = df[
-        [cols.goalsf, cols.season, cols.div, cols.date, cols.team] + selected_features
-    ]
+    df_selected = df[id_columns(selected_features) + selected_features]
     df_train = df_selected.loc[train.index]
     df_valid = df_selected.loc[valid.index]
     df_test = df_selected.loc[test.index]
-    save_to_csv(df_train, paths.features / paths.train_file)
-    save_to_csv(df_valid, paths.features / paths.valid_file)
-    save_to_csv(df_test, paths.features / paths.test_file)
+    save_to_csv(df_train, target_dir / paths.train_file)
+    save_to_csv(df_valid, target_dir / paths.valid_file)
+    save_to_csv(df_test, target_dir / paths.test_file)
+    with open(target_dir / paths.selected_features_file, "w", encoding="utf-8") as file:
+        json.dump(selected_features, file, indent=2)
 
 
 #################################################################
@@ -93,13 +115,31 @@ def _split(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     return train, valid, test
 
 
-def _train_poisson_elnet(train: pd.DataFrame) -> Pipeline:
-    logger.info("Training Elastic-Net model with Gaussian loss...")
-
+def _train_poisson_elnet(
+    train: pd.DataFrame,
+    *,
+    search_mode: SearchMode = search.mode,
+    time_budget: float | None = search.time_budget,
+) -> Pipeline:
     X_train = train[preds]
     y_train = train[cols.goalsf]
 
-    tscv = TimeSeriesSplit(n_splits=5)
+    if search_mode == "poisson":
+        logger.info("Training Elastic-Net model with Poisson loss...")
+        model = Pipeline(
+            [
+                ("scaler", StandardScaler()),
+                ("model", PoissonElasticNetCV(cv=search.n_splits)),
+            ]
+        )
+        model.fit(X_train, y_train)
+        logger.info(f"Best alpha-value: {model.named_steps['model'].alpha_}")
+        logger.info(f"Best l1_ratio: {model.named_steps['model'].l1_ratio_}")
+        return model
+
+    logger.info("Training Elastic-Net model with Gaussian loss...")
+
+    tscv = TimeSeriesSplit(n_splits=search.n_splits)
 
     pipeline = Pipeline(
         [
@@ -123,6 +163,24 @@ def _train_poisson_elnet(train: pd.DataFrame) -> Pipeline:
         "model__l1_ratio": [0.1, 0.3, 0.5, 0.7, 0.9],
     }
 
+    if search_mode == "halving":
+        result = halving_search(
+            pipeline,
+            param_grid,
+            X_train,
+            y_train,
+            cv=tscv,
+            loss=mean_squared_error,
+            iter_param="model__max_iter",
+            time_budget=time_budget,
+        )
+        logger.info(f"Best alpha-value: {result.best_params['model__alpha']}")
+        logger.info(f"Best l1_ratio: {result.best_params['model__l1_ratio']}")
+        return result.best_estimator
+
+    if search_mode != "grid":
+        raise ValueError(f"Unsupported search mode: {search_mode}")
+
     scorer = make_scorer(mean_squared_error, greater_is_better=False)
 
     grid = GridSearchCV(
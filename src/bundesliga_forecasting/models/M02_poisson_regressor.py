@@ -1,7 +1,14 @@
+import json
 import logging
 from pathlib import Path
 
+import numpy as np
+import pandas as pd
 from sklearn.linear_model import PoissonRegressor
+from sklearn.metrics import make_scorer, mean_poisson_deviance
+from sklearn.model_selection import GridSearchCV, TimeSeriesSplit
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
 
 from bundesliga_forecasting.BL_config import (
     COLUMNS,
@@ -10,11 +17,24 @@ from bundesliga_forecasting.BL_config import (
     PREDICTORS,
     setup_logging,
 )
+from bundesliga_forecasting.BL_instrument import instrumented
 from bundesliga_forecasting.BL_utils import (
     ensure_dir,
     read_csv,
 )
-from bundesliga_forecasting.models.M_config import ELASTICNET
+from bundesliga_forecasting.models.M01_elnet_feature_selection import id_columns
+from bundesliga_forecasting.models.M_artifact import (
+    artifact_from_pipeline,
+    save_artifact,
+)
+from bundesliga_forecasting.models.M_config import ELASTICNET, SEARCH, SearchMode
+from bundesliga_forecasting.models.M_metrics import (
+    calibrate_matches,
+    evaluate_matches,
+    pair_matches,
+)
+from bundesliga_forecasting.models.M_poisson_elnet import PoissonElasticNetCV
+from bundesliga_forecasting.models.M_search import halving_search
 
 logger = logging.getLogger(__name__)
 
@@ -23,15 +43,23 @@ preds = list(PREDICTORS.values())
 encoding = CSV_ENCODING
 cols = COLUMNS
 elnet = ELASTICNET
+search = SEARCH
 
 opp_preds = [f"{pred}_opp" for pred in preds if pred != cols.home]
 preds = preds + opp_preds
 
 
+@instrumented
 def data_setup(
     src_dir: Path = paths.features,
     train_file: str = paths.train_file,
     test_file: str = paths.test_file,
+    selected_file: str = paths.selected_features_file,
+    model_dir: Path = paths.models,
+    model_name: str = paths.model_name,
+    *,
+    search_mode: SearchMode = search.mode,
+    time_budget: float | None = search.time_budget,
 ) -> None:
     setup_logging()
     logger.info("Starting Elastic-Net feature selection process...")
@@ -42,14 +70,120 @@ def data_setup(
 
     df_train = read_csv(train_path)
     df_test = read_csv(test_path)
+    # the columns M01 wrote next to the selected features
+    with open(src_dir / selected_file, encoding="utf-8") as file:
+        id_cols = id_columns(json.load(file))
 
-    X_train = df_train.drop(
-        columns=[cols.goalsf, cols.season, cols.div, cols.date, cols.team]
-    )
-    X_test = df_test.drop(
-        columns=[cols.goalsf, cols.season, cols.div, cols.date, cols.team]
-    )
+    X_train = df_train.drop(columns=id_cols)
+    X_test = df_test.drop(columns=id_cols)
     y_train = df_train[cols.goalsf]
     y_test = df_test[cols.goalsf]
 
-    model = PoissonRegressor(fit_intercept=True)
+    model = _train_poisson_regressor(
+        X_train, y_train, search_mode=search_mode, time_budget=time_budget
+    )
+    df_test[cols.pred_goalsf] = model.predict(X_test)
+    deviance = mean_poisson_deviance(y_test, df_test[cols.pred_goalsf])
+    logger.info(f"Mean Poisson deviance on the test set: {deviance:.4f}")
+    _log_scores(df_test)
+
+    artifact = artifact_from_pipeline(
+        model,
+        list(X_train.columns),
+        search_mode=search_mode,
+        n_train=len(X_train),
+        train_seasons=sorted(int(season) for season in df_train[cols.season].unique()),
+    )
+    save_artifact(artifact, model_dir, model_name)
+    logger.info(f"Model artifact saved to {model_dir / model_name}.")
+
+
+#################################################################
+
+
+def _log_scores(df_test: pd.DataFrame) -> None:
+    matches = pair_matches(df_test, cols.pred_goalsf)
+    scores = evaluate_matches(matches)
+    logger.info(
+        f"1X2 scores on {scores[cols.n_matches]} test matches: "
+        f"RPS {scores[cols.rps]:.4f}, log loss {scores[cols.log_loss]:.4f}, "
+        f"Brier {scores[cols.brier]:.4f}"
+    )
+    calibration = calibrate_matches(matches)
+    logger.info(f"Calibration of the 1X2 forecasts:\n{calibration.to_string()}")
+
+
+def _train_poisson_regressor(
+    X_train: pd.DataFrame,
+    y_train: pd.Series,
+    *,
+    search_mode: SearchMode = search.mode,
+    time_budget: float | None = search.time_budget,
+) -> Pipeline:
+    logger.info("Training Poisson regressor...")
+
+    if search_mode == "poisson":
+        # pure L2 penalty, i.e. the PoissonRegressor objective along an alpha path
+        model = Pipeline(
+            [
+                ("scaler", StandardScaler()),
+                ("model", PoissonElasticNetCV(l1_ratio=0.0, cv=search.n_splits)),
+            ]
+        )
+        model.fit(X_train, y_train)
+        logger.info(f"Best alpha-value: {model.named_steps['model'].alpha_}")
+        return model
+
+    tscv = TimeSeriesSplit(n_splits=search.n_splits)
+
+    pipeline = Pipeline(
+        [
+            ("scaler", StandardScaler()),
+            ("model", PoissonRegressor(fit_intercept=True, max_iter=1000)),
+        ]
+    )
+
+    param_grid = {"model__alpha": np.logspace(-4, 1, 20)}
+
+    if search_mode == "halving":
+        result = halving_search(
+            pipeline,
+            param_grid,
+            X_train,
+            y_train,
+            cv=tscv,
+            loss=mean_poisson_deviance,
+            iter_param="model__max_iter",
+            time_budget=time_budget,
+        )
+        logger.info(f"Best alpha-value: {result.best_params['model__alpha']}")
+        return result.best_estimator
+
+    if search_mode != "grid":
+        raise ValueError(f"Unsupported search mode: {search_mode}")
+
+    scorer = make_scorer(mean_poisson_deviance, greater_is_better=False)
+
+    grid = GridSearchCV(
+        estimator=pipeline,
+        param_grid=param_grid,
+        scoring=scorer,
+        cv=tscv,
+        n_jobs=-1,
+        verbose=1,
+    )
+
+    grid.fit(X_train, y_train)
+    best_model = grid.best_estimator_
+
+    logger.info(f"Best alpha-value: {grid.best_params_['model__alpha']}")
+
+    return best_model
+
+
+def main() -> None:
+    data_setup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from bundesliga_forecasting.BL_config import (
+    COLUMNS,
+    CSV_ENCODING,
+    PATHS,
+    setup_logging,
+)
+from bundesliga_forecasting.BL_instrument import instrumented
+from bundesliga_forecasting.BL_utils import (
+    check_columns,
+    df_sort,
+    ensure_dir,
+    read_csv,
+    save_to_csv,
+)
+from bundesliga_forecasting.feature_engineering.F_config import POST_RANK_COLS
+from bundesliga_forecasting.feature_engineering.F_utils import rank_key
+from bundesliga_forecasting.models.M_config import SIMULATION
+
+logger = logging.getLogger(__name__)
+
+paths = PATHS
+encoding = CSV_ENCODING
+cols = COLUMNS
+sim = SIMULATION
+
+fixture_cols = [cols.home_team, cols.away_team, cols.home_rate, cols.away_rate]
+
+
+@instrumented
+def season_simulation(
+    src_dir: Path = paths.features,
+    target_dir: Path = paths.features,
+    fixtures_file: str = paths.fixtures_file,
+    feature_file: str = paths.feature_file,
+    target_file: str = paths.simulation_file,
+    *,
+    season: int,
+    div: int,
+    n_sims: int = sim.n_sims,
+    chunk_size: int = sim.chunk_size,
+    n_jobs: int = sim.n_jobs,
+    seed: int = sim.seed,
+) -> None:
+    """
+    Description:
+        Step 1 -> Read the remaining fixtures with their predicted goal rates
+        Step 2 -> Derive the current table of the season and division from the
+                  post-match totals of the feature file
+        Step 3 -> Simulate the rest of the season and save the outcome
+                  probabilities per team
+
+    Usage location:
+        models/M03_season_simulation.py
+    """
+    setup_logging()
+    logger.info(f"Simulating the remaining fixtures of {season} (division {div})...")
+    ensure_dir([src_dir, target_dir], ["src", "target"])
+
+    fixtures = read_csv(src_dir / fixtures_file, parse_dates=[])
+    df = read_csv(src_dir / feature_file)
+    table = current_table(df, season=season, div=div)
+
+    result = simulate_season(
+        fixtures,
+        table,
+        n_sims=n_sims,
+        chunk_size=chunk_size,
+        n_jobs=n_jobs,
+        seed=seed,
+    )
+    save_to_csv(result, target_dir / target_file)
+
+    logger.info("Season simulation saved to %s", target_dir / target_file)
+
+
+def current_table(df: pd.DataFrame, *, season: int, div: int) -> pd.DataFrame:
+    check_columns(df, [cols.season, cols.div, cols.date, cols.team] + POST_RANK_COLS)
+
+    league = df[(df[cols.season] == season) & (df[cols.div] == div)]
+    league = df_sort(league, sort_cols=[cols.date])
+    table = league.groupby(cols.team, as_index=False, sort=False)[POST_RANK_COLS].last()
+    return table
+
+
+@instrumented(kernel=True)
+def simulate_season(
+    fixtures: pd.DataFrame,
+    table: pd.DataFrame,
+    *,
+    n_sims: int = sim.n_sims,
+    chunk_size: int = sim.chunk_size,
+    n_jobs: int = sim.n_jobs,
+    seed: int = sim.seed,
+) -> pd.DataFrame:
+    """
+    Description:
+        Plays out the remaining fixtures n_sims times. Goals are drawn from the
+        Poisson rates of every fixture for a whole chunk of simulations at once,
+        added onto the current table and ranked with the same tiebreak key as
+        the daily tables of F02 (points, goal difference, goals scored). Teams
+        that are still level are ordered randomly.
+
+        The simulations run in chunks of at most 'chunk_size', which bounds the
+        memory, and every chunk gets its own child of one SeedSequence, so the
+        result only depends on 'seed' and 'chunk_size' and not on 'n_jobs'.
+
+    Usage location:
+        models/M03_season_simulation.py
+
+    Args:
+        fixtures (pd.DataFrame): Remaining fixtures with home and away team and
+            their predicted goal rates.
+        table (pd.DataFrame): Current table with the post-match totals per team.
+
+    Returns:
+        pd.DataFrame: Expected points and position, zone probabilities and the
+        full position distribution per team.
+    """
+    logger.info(f"Running {n_sims} simulations of {len(fixtures)} fixtures...")
+    check_columns(fixtures, fixture_cols)
+    check_columns(table, [cols.team] + POST_RANK_COLS)
+    if n_sims < 1 or chunk_size < 1:
+        raise ValueError("The variables 'n_sims' and 'chunk_size' must be positive.")
+
+    teams = pd.Index(
+        pd.concat(
+            [table[cols.team], fixtures[cols.home_team], fixtures[cols.away_team]]
+        ).unique()
+    )
+    base = (
+        table.set_index(cols.team)[POST_RANK_COLS]
+        .reindex(teams)
+        .fillna(0)
+        .to_numpy(dtype=float)
+    )
+    home_idx = teams.get_indexer(fixtures[cols.home_team])
+    away_idx = teams.get_indexer(fixtures[cols.away_team])
+    rates = fixtures[[cols.home_rate, cols.away_rate]].to_numpy(dtype=float)
+
+    chunks = [chunk_size] * (n_sims // chunk_size)
+    if n_sims % chunk_size:
+        chunks.append(n_sims % chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    args = (repeat(home_idx), repeat(away_idx), repeat(rates), repeat(base))
+
+    if n_jobs == 1:
+        results = list(map(_simulate_chunk, chunks, seeds, *args))
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            results = list(executor.map(_simulate_chunk, chunks, seeds, *args))
+
+    position_counts = sum(result[0] for result in results)
+    points_sum = sum(result[1] for result in results)
+
+    return _summarize(teams, position_counts / n_sims, points_sum / n_sims)
+
+
+#################################################################
+
+
+def _simulate_chunk(
+    n_sims: int,
+    seed: np.random.SeedSequence,
+    home_idx: np.ndarray,
+    away_idx: np.ndarray,
+    rates: np.ndarray,
+    base: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    n_fixtures = len(rates)
+    n_teams = len(base)
+
+    # fixture-team incidence matrices turn the per-fixture results into table
+    # totals with one matrix product per column
+    home = np.zeros((n_fixtures, n_teams))
+    away = np.zeros((n_fixtures, n_teams))
+    home[np.arange(n_fixtures), home_idx] = 1
+    away[np.arange(n_fixtures), away_idx] = 1
+
+    goals = rng.poisson(rates, size=(n_sims, n_fixtures, 2)).astype(float)
+    home_goals = goals[:, :, 0]
+    away_goals = goals[:, :, 1]
+    draws = home_goals == away_goals
+    home_points = 3 * (home_goals > away_goals) + draws
+    away_points = 3 * (away_goals > home_goals) + draws
+
+    points = base[:, 0] + home_points @ home + away_points @ away
+    goaldiff = base[:, 1] + (home_goals - away_goals) @ (home - away)
+    goalsf = base[:, 2] + home_goals @ home + away_goals @ away
+
+    key = rank_key([points, goaldiff, goalsf])
+    order = np.lexsort((rng.random(key.shape), -key), axis=-1)
+
+    flat = order * n_teams + np.arange(n_teams)
+    position_counts = np.bincount(flat.ravel(), minlength=n_teams**2)
+    return position_counts.reshape(n_teams, n_teams), points.sum(axis=0)
+
+
+def _summarize(
+    teams: pd.Index, position_probs: np.ndarray, exp_points: np.ndarray
+) -> pd.DataFrame:
+    n_teams = len(teams)
+    positions = np.arange(1, n_teams + 1)
+    n_relegation = min(sim.relegation_places, n_teams)
+    n_playoff = min(sim.relegation_playoff_places, n_teams - n_relegation)
+    playoff_start = n_teams - n_relegation - n_playoff
+
+    summary = pd.DataFrame(
+        {
+            cols.team: teams,
+            cols.exp_points: exp_points,
+            cols.exp_position: position_probs @ positions,
+            cols.title_prob: position_probs[:, 0],
+            cols.europe_prob: position_probs[:, : sim.european_places].sum(axis=1),
+            cols.rel_playoff_prob: position_probs[
+                :, playoff_start : n_teams - n_relegation
+            ].sum(axis=1),
+            cols.relegation_prob: position_probs[:, n_teams - n_relegation :].sum(
+                axis=1
+            ),
+        }
+    )
+    distribution = pd.DataFrame(
+        position_probs, columns=[f"Position{pos}" for pos in positions]
+    )
+    summary = pd.concat([summary, distribution], axis=1)
+    return summary.sort_values(cols.exp_position, kind="mergesort").reset_index(
+        drop=True
+    )
@@ -0,0 +1,286 @@
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from bundesliga_forecasting.BL_config import (
+    COLUMNS,
+    CSV_ENCODING,
+    PATHS,
+    PREDICTORS,
+    setup_logging,
+)
+from bundesliga_forecasting.BL_instrument import instrumented
+from bundesliga_forecasting.BL_utils import (
+    append_to_csv,
+    check_columns,
+    df_sort,
+    ensure_dir,
+    read_csv,
+    save_to_csv,
+)
+from bundesliga_forecasting.models.M_artifact import ETA_BOUND
+from bundesliga_forecasting.models.M_config import BACKTEST
+from bundesliga_forecasting.models.M_metrics import (
+    calibrate_matches,
+    evaluate_matches,
+    pair_matches,
+)
+from bundesliga_forecasting.models.M_poisson_elnet import (
+    fit_poisson_elnet,
+    mean_poisson_deviance,
+)
+
+logger = logging.getLogger(__name__)
+
+paths = PATHS
+preds = list(PREDICTORS.values())
+encoding = CSV_ENCODING
+cols = COLUMNS
+bt = BACKTEST
+
+opp_preds = [f"{pred}_opp" for pred in preds if pred != cols.home]
+preds = preds + opp_preds
+id_cols = [
+    cols.season,
+    cols.div,
+    cols.date,
+    cols.team,
+    cols.opp,
+    cols.home,
+    cols.goalsf,
+]
+
+# feature matrix of the current process, set once per worker
+_shared: dict[str, np.ndarray] = {}
+
+
+class Origin(NamedTuple):
+    season: int
+    matchday: int
+    n_train: int
+    test_idx: np.ndarray
+
+
+@instrumented
+def backtest(
+    src_dir: Path = paths.features,
+    target_dir: Path = paths.backtest,
+    src_file: str = paths.combined_file,
+    metrics_file: str = paths.backtest_metrics_file,
+    predictions_file: str = paths.backtest_predictions_file,
+    scores_file: str = paths.backtest_scores_file,
+    calibration_file: str = paths.backtest_calibration_file,
+    *,
+    features: list[str] | None = None,
+    seasons: list[int] | None = None,
+    alpha: float = bt.alpha,
+    l1_ratio: float = bt.l1_ratio,
+    min_train_seasons: int = bt.min_train_seasons,
+    n_jobs: int = bt.n_jobs,
+) -> None:
+    """
+    Description:
+        Rolling-origin evaluation: for every matchday k of the evaluated seasons
+        the model is trained on all matches played before the first match of
+        matchday k and predicts matchday k.
+        Step 1 -> Read the combined feature matrix once and sort it by date, so
+                  that every training set is a prefix of the same matrix
+        Step 2 -> Build the origins (season, matchday) with their prefix length
+                  and test rows
+        Step 3 -> Walk through the origins of every season, warm-starting each
+                  refit from the previous one; seasons run in parallel
+        Step 4 -> Append metrics, predictions and the 1X2 scores of every
+                  season to disk as seasons finish
+        Step 5 -> Calibrate the 1X2 forecasts of all evaluated seasons
+
+        The mean and scale of every prefix are taken from running sums, so no
+        pass over the prefix is needed to compute them. The standardized
+        prefix itself is still built once per origin for the fit.
+
+    Usage location:
+        models/M04_backtest.py
+
+    Args:
+        features (list[str] | None): Feature columns, defaults to all predictors.
+        seasons (list[int] | None): Seasons to evaluate, defaults to all seasons
+            after the first 'min_train_seasons'.
+        alpha (float): Elastic-net penalty strength.
+        l1_ratio (float): Share of the L1 penalty.
+        n_jobs (int): Number of worker processes.
+    """
+    setup_logging()
+    logger.info("Starting walk-forward backtest...")
+    ensure_dir([src_dir, target_dir], ["src", "target"])
+
+    features = features or preds
+    metrics_path = target_dir / metrics_file
+    predictions_path = target_dir / predictions_file
+    scores_path = target_dir / scores_file
+    for path in [metrics_path, predictions_path, scores_path]:
+        path.unlink(missing_ok=True)
+
+    df = read_csv(src_dir / src_file)
+    check_columns(df, id_cols + features)
+    df = df_sort(df, sort_cols=[cols.date]).reset_index(drop=True)
+    df = _add_matchday(df)
+
+    blocks = _build_origins(df, seasons=seasons, min_train_seasons=min_train_seasons)
+    X = df[features].to_numpy(dtype=float)
+    y = df[cols.goalsf].to_numpy(dtype=float)
+    logger.info(
+        f"{sum(len(block) for block in blocks)} origins in {len(blocks)} seasons."
+    )
+
+    if n_jobs == 1:
+        _init_worker(X, y)
+        results = (_run_block(block, alpha, l1_ratio) for block in blocks)
+        for metrics, predictions in results:
+            _write_block(
+                df, metrics, predictions, metrics_path, predictions_path, scores_path
+            )
+    else:
+        with ProcessPoolExecutor(
+            max_workers=n_jobs, initializer=_init_worker, initargs=(X, y)
+        ) as executor:
+            futures = [
+                executor.submit(_run_block, block, alpha, l1_ratio) for block in blocks
+            ]
+            for future in as_completed(futures):
+                metrics, predictions = future.result()
+                _write_block(
+                    df,
+                    metrics,
+                    predictions,
+                    metrics_path,
+                    predictions_path,
+                    scores_path,
+                )
+
+    matches = pair_matches(read_csv(predictions_path), cols.pred_goalsf)
+    save_to_csv(calibrate_matches(matches), target_dir / calibration_file)
+
+    logger.info("Backtest finished, metrics saved to %s", metrics_path)
+
+
+#################################################################
+
+
+def _add_matchday(df: pd.DataFrame) -> pd.DataFrame:
+    check_columns(df, [cols.season, cols.div, cols.team])
+    df[cols.matchday] = df.groupby([cols.season, cols.div, cols.team]).cumcount() + 1
+    return df
+
+
+def _build_origins(
+    df: pd.DataFrame, *, seasons: list[int] | None, min_train_seasons: int
+) -> list[list[Origin]]:
+    logger.info("Building the backtest origins...")
+    all_seasons = sorted(df[cols.season].unique())
+    if seasons is None:
+        seasons = all_seasons[min_train_seasons:]
+
+    dates = df[cols.date].to_numpy()
+    groups = df.groupby([cols.season, cols.matchday], sort=True).indices
+
+    blocks = []
+    for season in seasons:
+        block = []
+        for (group_season, matchday), test_idx in groups.items():
+            if group_season != season:
+                continue
+            n_train = int(np.searchsorted(dates, dates[test_idx].min(), side="left"))
+            if n_train == 0:
+                continue
+            block.append(Origin(int(season), int(matchday), n_train, test_idx))
+        if block:
+            blocks.append(block)
+    return blocks
+
+
+def _init_worker(X: np.ndarray, y: np.ndarray) -> None:
+    # running sums of the features and their squares, with a leading zero row,
+    # give the standardization of every prefix in O(n_features)
+    zeros = np.zeros((1, X.shape[1]))
+    _shared["X"] = X
+    _shared["y"] = y
+    _shared["sum"] = np.vstack([zeros, np.cumsum(X, axis=0)])
+    _shared["sum_sq"] = np.vstack([zeros, np.cumsum(X**2, axis=0)])
+
+
+def _run_block(
+    block: list[Origin], alpha: float, l1_ratio: float
+) -> tuple[list[dict], list[np.ndarray]]:
+    X = _shared["X"]
+    y = _shared["y"]
+
+    metrics = []
+    predictions = []
+    coef = None
+    intercept = None
+    for origin in block:
+        start = time.perf_counter()
+        n_train = origin.n_train
+        mean = _shared["sum"][n_train] / n_train
+        var = np.maximum(_shared["sum_sq"][n_train] / n_train - mean**2, 0.0)
+        scale = np.where(var > 1e-12, np.sqrt(var), 1.0)
+
+        fit = fit_poisson_elnet(
+            (X[:n_train] - mean) / scale,
+            y[:n_train],
+            alpha=alpha,
+            l1_ratio=l1_ratio,
+            coef_init=coef,
+            intercept_init=intercept,
+        )
+        coef, intercept = fit.coefs[0], fit.intercepts[0]
+
+        eta = ((X[origin.test_idx] - mean) / scale) @ coef + intercept
+        pred = np.exp(np.clip(eta, -ETA_BOUND, ETA_BOUND))
+        y_test = y[origin.test_idx]
+
+        metrics.append(
+            {
+                cols.season: origin.season,
+                cols.matchday: origin.matchday,
+                cols.n_train: n_train,
+                cols.n_test: len(origin.test_idx),
+                cols.deviance: float(mean_poisson_deviance(y_test, pred)),
+                cols.mse: float(np.mean((y_test - pred) ** 2)),
+                cols.n_iter: fit.n_iter,
+                cols.seconds: time.perf_counter() - start,
+            }
+        )
+        predictions.append(np.column_stack([origin.test_idx, pred]))
+
+    return metrics, predictions
+
+
+def _write_block(
+    df: pd.DataFrame,
+    metrics: list[dict],
+    predictions: list[np.ndarray],
+    metrics_path: Path,
+    predictions_path: Path,
+    scores_path: Path,
+) -> None:
+    predictions_array = np.vstack(predictions)
+    rows = predictions_array[:, 0].astype(int)
+    out = df.loc[rows, id_cols + [cols.matchday]].copy()
+    out[cols.pred_goalsf] = predictions_array[:, 1]
+
+    append_to_csv(pd.DataFrame(metrics), metrics_path)
+    append_to_csv(out, predictions_path)
+
+    season = metrics[0][cols.season]
+    scores = evaluate_matches(pair_matches(out, cols.pred_goalsf))
+    append_to_csv(pd.DataFrame([{cols.season: season, **scores}]), scores_path)
+    logger.info(
+        f"Season {season}: mean deviance "
+        f"{np.mean([m[cols.deviance] for m in metrics]):.4f}, "
+        f"RPS {scores[cols.rps]:.4f}"
+    )
@@ -0,0 +1,164 @@
+import hashlib
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+# only NumPy and the standard library are imported here, so that loading an
+# artifact and predicting with it does not pay for pandas or scikit-learn
+
+ARTIFACT_VERSION = 2
+ETA_BOUND = 30.0
+
+
+@dataclass(frozen=True)
+class ModelArtifact:
+    features: tuple[str, ...]
+    mean: np.ndarray
+    scale: np.ndarray
+    coef: np.ndarray
+    intercept: float
+    fingerprint: str
+    metadata: dict[str, Any] = field(default_factory=dict)
+
+    def feature_index(self, columns: list[str]) -> np.ndarray:
+        """
+        Description:
+            Positions of the model features within 'columns', so that input
+            files with a different column order can be used as they are. Every
+            model feature has to occur exactly once.
+        """
+        position = {col: i for i, col in enumerate(columns)}
+        missing = [col for col in self.features if col not in position]
+        if missing:
+            raise KeyError(
+                f"The following features of model {self.fingerprint} are "
+                f"missing: {missing}."
+            )
+        duplicated = [col for col in self.features if columns.count(col) > 1]
+        if duplicated:
+            raise ValueError(
+                f"The following features of model {self.fingerprint} occur more "
+                f"than once: {duplicated}."
+            )
+        return np.array([position[col] for col in self.features], dtype=int)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype=float)
+        if X.ndim != 2 or X.shape[1] != len(self.features):
+            raise ValueError(
+                f"Expected a matrix with {len(self.features)} columns, "
+                f"got shape {X.shape}."
+            )
+        eta = ((X - self.mean) / self.scale) @ self.coef + self.intercept
+        return np.exp(np.clip(eta, -ETA_BOUND, ETA_BOUND))
+
+
+def artifact_fingerprint(
+    features: list[str] | tuple[str, ...],
+    mean: np.ndarray,
+    scale: np.ndarray,
+    coef: np.ndarray,
+    intercept: float,
+) -> str:
+    """
+    Hash of the feature order together with the stored parameters, so that a
+    header paired with the arrays of another model is detected on loading.
+    """
+    digest = hashlib.sha256("\n".join(features).encode("utf-8"))
+    for array in (mean, scale, coef, [intercept]):
+        digest.update(np.asarray(array, dtype="<f8").tobytes())
+    return digest.hexdigest()[:16]
+
+
+def artifact_from_pipeline(
+    pipeline: Any, features: list[str], **metadata: Any
+) -> ModelArtifact:
+    """
+    Description:
+        Extracts the scaler statistics and the linear coefficients of a fitted
+        Pipeline(StandardScaler, model) with a log link.
+
+    Usage location:
+        models/M02_poisson_regressor.py
+    """
+    scaler = pipeline.named_steps["scaler"]
+    model = pipeline.named_steps["model"]
+    if len(features) != len(model.coef_):
+        raise ValueError(
+            f"Got {len(features)} feature names for {len(model.coef_)} coefficients."
+        )
+    mean = np.asarray(scaler.mean_, dtype=float)
+    scale = np.asarray(scaler.scale_, dtype=float)
+    coef = np.asarray(model.coef_, dtype=float)
+    intercept = float(model.intercept_)
+    return ModelArtifact(
+        features=tuple(features),
+        mean=mean,
+        scale=scale,
+        coef=coef,
+        intercept=intercept,
+        fingerprint=artifact_fingerprint(features, mean, scale, coef, intercept),
+        metadata={"model": type(model).__name__, **metadata},
+    )
+
+
+def save_artifact(artifact: ModelArtifact, target_dir: Path, name: str) -> None:
+    """
+    Description:
+        Writes the arrays to '<name>.npz' and the feature order, intercept,
+        fingerprint and metadata to '<name>.json'.
+    """
+    target_dir.mkdir(parents=True, exist_ok=True)
+    np.savez(
+        target_dir / f"{name}.npz",
+        mean=artifact.mean,
+        scale=artifact.scale,
+        coef=artifact.coef,
+    )
+    header = {
+        "version": ARTIFACT_VERSION,
+        "features": list(artifact.features),
+        "intercept": artifact.intercept,
+        "fingerprint": artifact.fingerprint,
+        "metadata": artifact.metadata,
+    }
+    with open(target_dir / f"{name}.json", "w", encoding="utf-8") as file:
+        json.dump(header, file, indent=2, default=str)
+
+
+def load_artifact(src_dir: Path, name: str) -> ModelArtifact:
+    with open(src_dir / f"{name}.json", encoding="utf-8") as file:
+        header = json.load(file)
+    if header["version"] != ARTIFACT_VERSION:
+        raise ValueError(
+            f"Unsupported artifact version {header['version']}, "
+            f"expected {ARTIFACT_VERSION}."
+        )
+
+    features = tuple(header["features"])
+    intercept = float(header["intercept"])
+    with np.load(src_dir / f"{name}.npz") as arrays:
+        mean, scale, coef = arrays["mean"], arrays["scale"], arrays["coef"]
+    if not len(mean) == len(scale) == len(coef) == len(features):
+        raise ValueError(f"The arrays of artifact '{name}' have inconsistent sizes.")
+    if (
+        artifact_fingerprint(features, mean, scale, coef, intercept)
+        != header["fingerprint"]
+    ):
+        raise ValueError(
+            f"The fingerprint of artifact '{name}' does not match its features "
+            "and arrays."
+        )
+
+    return ModelArtifact(
+        features=features,
+        mean=mean,
+        scale=scale,
+        coef=coef,
+        intercept=intercept,
+        fingerprint=header["fingerprint"],
+        metadata=header["metadata"],
+    )
@@ -1,4 +1,7 @@
 from dataclasses import dataclass
+from typing import Literal
+
+SearchMode = Literal["grid", "halving", "poisson"]
 
 
 @dataclass(frozen=True)
@@ -13,3 +16,64 @@ class ElasticNet:
 
 
 ELASTICNET = ElasticNet()
+
+
+@dataclass(frozen=True)
+class Search:
+    mode: SearchMode = "poisson"
+    n_splits: int = 5
+    factor: int = 3
+    min_folds: int = 1
+    min_iter: int = 50
+    time_budget: float | None = None
+
+
+SEARCH = Search()
+
+
+@dataclass(frozen=True)
+class PoissonElnet:
+    l1_ratios: tuple[float, ...] = (0.1, 0.3, 0.5, 0.7, 0.9)
+    n_alphas: int = 50
+    eps: float = 1e-3
+    cv: int = 5
+    max_iter: int = 100
+    max_cd_iter: int = 1000
+    tol: float = 1e-4
+
+
+POISSON_ELNET = PoissonElnet()
+
+
+@dataclass(frozen=True)
+class Simulation:
+    n_sims: int = 100_000
+    chunk_size: int = 10_000
+    n_jobs: int = 1
+    seed: int = 42
+    european_places: int = 6
+    relegation_playoff_places: int = 1
+    relegation_places: int = 2
+
+
+SIMULATION = Simulation()
+
+
+@dataclass(frozen=True)
+class Backtest:
+    alpha: float = 0.01
+    l1_ratio: float = 0.5
+    min_train_seasons: int = 1
+    n_jobs: int = 1
+
+
+BACKTEST = Backtest()
+
+
+@dataclass(frozen=True)
+class Metrics:
+    max_goals: int = 10
+    n_bins: int = 10
+
+
+METRICS = Metrics()
@@ -0,0 +1,226 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from bundesliga_forecasting.BL_config import COLUMNS
+from bundesliga_forecasting.BL_utils import check_columns
+from bundesliga_forecasting.models.M_config import METRICS
+
+logger = logging.getLogger(__name__)
+
+cols = COLUMNS
+metrics = METRICS
+
+# order of the 1X2 outcomes, used as index into the probability arrays
+OUTCOMES = ("HomeWin", "Draw", "AwayWin")
+
+
+def poisson_pmf(rates: np.ndarray, max_goals: int = metrics.max_goals) -> np.ndarray:
+    """
+    Description:
+        Poisson probabilities of 0..max_goals goals for every rate, built with a
+        cumulative product of rate / k instead of factorials.
+
+    Args:
+        rates (np.ndarray): Goal rates of shape (n,).
+        max_goals (int): Largest number of goals.
+
+    Returns:
+        np.ndarray: Probabilities of shape (n, max_goals + 1).
+    """
+    rates = np.asarray(rates, dtype=float)[:, None]
+    ratios = rates / np.arange(1, max_goals + 1)
+    terms = np.concatenate([np.ones_like(rates), ratios], axis=1)
+    return np.exp(-rates) * np.cumprod(terms, axis=1)
+
+
+def score_matrices(
+    home_rates: np.ndarray,
+    away_rates: np.ndarray,
+    max_goals: int = metrics.max_goals,
+    *,
+    normalize: bool = True,
+) -> np.ndarray:
+    """
+    Description:
+        Score probability matrices of independent home and away goal counts,
+        entry [i, h, a] being the probability of the score h:a in match i.
+
+    Args:
+        home_rates (np.ndarray): Home goal rates of shape (n,).
+        away_rates (np.ndarray): Away goal rates of shape (n,).
+        max_goals (int): Largest number of goals per team.
+        normalize (bool): Rescale every matrix to sum to one, which assigns the
+            truncated tail proportionally.
+
+    Returns:
+        np.ndarray: Score matrices of shape (n, max_goals + 1, max_goals + 1).
+    """
+    home_pmf = poisson_pmf(home_rates, max_goals)
+    away_pmf = poisson_pmf(away_rates, max_goals)
+    matrices = home_pmf[:, :, None] * away_pmf[:, None, :]
+    if normalize:
+        matrices /= matrices.sum(axis=(1, 2), keepdims=True)
+    return matrices
+
+
+def outcome_probabilities(matrices: np.ndarray) -> np.ndarray:
+    """
+    Description:
+        Home win, draw and away win probabilities of the score matrices.
+
+    Returns:
+        np.ndarray: Probabilities of shape (n, 3) in the order of 'OUTCOMES'.
+    """
+    size = matrices.shape[-1]
+    home_goals, away_goals = np.indices((size, size))
+    home_win = (matrices * (home_goals > away_goals)).sum(axis=(1, 2))
+    draw = np.trace(matrices, axis1=1, axis2=2)
+    away_win = (matrices * (home_goals < away_goals)).sum(axis=(1, 2))
+    return np.stack([home_win, draw, away_win], axis=1)
+
+
+def match_outcomes(home_goals: np.ndarray, away_goals: np.ndarray) -> np.ndarray:
+    """
+    Description:
+        Index of the observed outcome (0 = home win, 1 = draw, 2 = away win).
+    """
+    return 1 - np.sign(np.asarray(home_goals) - np.asarray(away_goals)).astype(int)
+
+
+def ranked_probability_score(probs: np.ndarray, outcomes: np.ndarray) -> float:
+    n_classes = probs.shape[1]
+    cum_probs = np.cumsum(probs, axis=1)
+    cum_observed = np.cumsum(np.eye(n_classes)[outcomes], axis=1)
+    scores = ((cum_probs - cum_observed)[:, :-1] ** 2).sum(axis=1) / (n_classes - 1)
+    return float(scores.mean())
+
+
+def log_loss(probs: np.ndarray, outcomes: np.ndarray, eps: float = 1e-15) -> float:
+    observed = probs[np.arange(len(outcomes)), outcomes]
+    return float(-np.log(np.clip(observed, eps, 1.0)).mean())
+
+
+def brier_score(probs: np.ndarray, outcomes: np.ndarray) -> float:
+    observed = np.eye(probs.shape[1])[outcomes]
+    return float(((probs - observed) ** 2).sum(axis=1).mean())
+
+
+def calibration_bins(
+    probs: np.ndarray, outcomes: np.ndarray, n_bins: int = metrics.n_bins
+) -> pd.DataFrame:
+    """
+    Description:
+        Reliability table of the 1X2 forecasts: for every outcome and probability
+        bin the mean forecast probability against the observed frequency.
+        All outcomes are binned in one bincount over a combined
+        (outcome, bin) key.
+
+    Returns:
+        pd.DataFrame: One row per non-empty (outcome, bin).
+    """
+    n_classes = probs.shape[1]
+    observed = np.eye(n_classes)[outcomes]
+    bins = np.minimum((probs * n_bins).astype(int), n_bins - 1)
+    keys = (np.arange(n_classes) * n_bins + bins).ravel()
+    size = n_classes * n_bins
+
+    counts = np.bincount(keys, minlength=size)
+    prob_sums = np.bincount(keys, weights=probs.ravel(), minlength=size)
+    observed_sums = np.bincount(keys, weights=observed.ravel(), minlength=size)
+
+    nonempty = counts > 0
+    table = pd.DataFrame(
+        {
+            cols.outcome: np.repeat(OUTCOMES, n_bins),
+            cols.bin_lower: np.tile(np.arange(n_bins) / n_bins, n_classes),
+            cols.bin_upper: np.tile(np.arange(1, n_bins + 1) / n_bins, n_classes),
+            cols.mean_prob: prob_sums / np.maximum(counts, 1),
+            cols.observed_freq: observed_sums / np.maximum(counts, 1),
+            cols.count: counts,
+        }
+    )
+    return table[nonempty].reset_index(drop=True)
+
+
+def pair_matches(df: pd.DataFrame, rate_col: str = cols.pred_goalsf) -> pd.DataFrame:
+    """
+    Description:
+        Joins the two team-match rows of every match into one row with the home
+        and away goals and the predicted home and away goal rates.
+
+    Usage location:
+        models/M02_poisson_regressor.py
+        models/M04_backtest.py
+    """
+    keys = [cols.season, cols.div, cols.date]
+    check_columns(df, keys + [cols.team, cols.opp, cols.home, cols.goalsf, rate_col])
+
+    home = df.loc[df[cols.home] == 1, keys + [cols.team, cols.opp]]
+    home = home.assign(
+        **{cols.home_goals: df[cols.goalsf], cols.home_rate: df[rate_col]}
+    )
+    away = df.loc[df[cols.home] == 0, keys + [cols.team, cols.goalsf, rate_col]]
+    away = away.rename(
+        columns={
+            cols.team: cols.opp,
+            cols.goalsf: cols.away_goals,
+            rate_col: cols.away_rate,
+        }
+    )
+    matches = home.merge(away, on=keys + [cols.opp], how="inner", validate="1:1")
+    return matches.rename(columns={cols.team: cols.home_team, cols.opp: cols.away_team})
+
+
+def evaluate_matches(
+    matches: pd.DataFrame, max_goals: int = metrics.max_goals
+) -> dict[str, float]:
+    """
+    Description:
+        Ranked probability score, log loss and Brier score of the 1X2 forecasts
+        implied by the predicted goal rates of the paired matches.
+
+    Args:
+        matches (pd.DataFrame): Output of 'pair_matches'.
+
+    Returns:
+        dict[str, float]: Number of matches and the three scores.
+    """
+    probs, outcomes = _outcome_arrays(matches, max_goals)
+    return {
+        cols.n_matches: len(matches),
+        cols.rps: ranked_probability_score(probs, outcomes),
+        cols.log_loss: log_loss(probs, outcomes),
+        cols.brier: brier_score(probs, outcomes),
+    }
+
+
+def calibrate_matches(
+    matches: pd.DataFrame,
+    max_goals: int = metrics.max_goals,
+    n_bins: int = metrics.n_bins,
+) -> pd.DataFrame:
+    probs, outcomes = _outcome_arrays(matches, max_goals)
+    return calibration_bins(probs, outcomes, n_bins)
+
+
+#################################################################
+
+
+def _outcome_arrays(
+    matches: pd.DataFrame, max_goals: int
+) -> tuple[np.ndarray, np.ndarray]:
+    check_columns(
+        matches, [cols.home_rate, cols.away_rate, cols.home_goals, cols.away_goals]
+    )
+    matrices = score_matrices(
+        matches[cols.home_rate].to_numpy(),
+        matches[cols.away_rate].to_numpy(),
+        max_goals,
+    )
+    probs = outcome_probabilities(matrices)
+    outcomes = match_outcomes(
+        matches[cols.home_goals].to_numpy(), matches[cols.away_goals].to_numpy()
+    )
+    return probs, outcomes
@@ -0,0 +1,576 @@
+from __future__ import annotations
+
+import logging
+from collections.abc import Sequence
+from typing import NamedTuple
+
+import numpy as np
+from sklearn.base import BaseEstimator, RegressorMixin
+from sklearn.model_selection import TimeSeriesSplit
+
+from bundesliga_forecasting.models.M_artifact import ETA_BOUND
+from bundesliga_forecasting.models.M_config import POISSON_ELNET
+
+logger = logging.getLogger(__name__)
+poisson_elnet = POISSON_ELNET
+
+L1_FLOOR = 1e-3
+
+
+class PoissonFit(NamedTuple):
+    coefs: np.ndarray
+    intercepts: np.ndarray
+    n_iter: int
+
+
+class PoissonPath(NamedTuple):
+    alphas: np.ndarray
+    coefs: np.ndarray
+    intercepts: np.ndarray
+    n_iter: np.ndarray
+
+
+def fit_poisson_elnet(
+    X: np.ndarray,
+    y: np.ndarray,
+    *,
+    alpha: float,
+    l1_ratio: float,
+    weights: np.ndarray | None = None,
+    coef_init: np.ndarray | None = None,
+    intercept_init: np.ndarray | None = None,
+    max_iter: int = poisson_elnet.max_iter,
+    max_cd_iter: int = poisson_elnet.max_cd_iter,
+    tol: float = poisson_elnet.tol,
+) -> PoissonFit:
+    """
+    Description:
+        Fits elastic-net penalized Poisson GLMs with a log link by IRLS. Every
+        outer iteration replaces the Poisson likelihood by its weighted
+        least-squares approximation, which is minimized by coordinate descent.
+        The objective per problem is
+
+            sum_i w_i (mu_i - y_i * eta_i) / sum_i w_i
+            + alpha * (l1_ratio * |coef|_1 + (1 - l1_ratio) / 2 * |coef|_2^2)
+
+        i.e. the scaling used by sklearn's PoissonRegressor. Several problems
+        sharing the same design matrix (e.g. the folds of a time-series split)
+        are solved at once by passing one row of sample weights per problem.
+
+    Usage location:
+        models/M_poisson_elnet.py
+
+    Args:
+        X (np.ndarray): Design matrix of shape (n_samples, n_features).
+        y (np.ndarray): Non-negative counts of shape (n_samples,).
+        alpha (float): Overall penalty strength.
+        l1_ratio (float): Share of the L1 penalty.
+        weights (np.ndarray | None): Sample weights of shape (n_problems,
+            n_samples). Zero weights exclude a sample from a problem.
+        coef_init (np.ndarray | None): Warm start of shape (n_problems, n_features).
+        intercept_init (np.ndarray | None): Warm start of shape (n_problems,).
+        max_iter (int): Maximum number of IRLS iterations.
+        max_cd_iter (int): Maximum number of coordinate descent sweeps per IRLS
+            iteration.
+        tol (float): Convergence tolerance on the coefficient updates.
+
+    Returns:
+        PoissonFit: Coefficients (n_problems, n_features), intercepts
+        (n_problems,) and the number of IRLS iterations.
+    """
+    X, y, weights = _validate(X, y, weights)
+    design = _prepare_design(X, weights)
+    return _fit(
+        design,
+        y,
+        weights,
+        alpha=alpha,
+        l1_ratio=l1_ratio,
+        coef_init=coef_init,
+        intercept_init=intercept_init,
+        max_iter=max_iter,
+        max_cd_iter=max_cd_iter,
+        tol=tol,
+    )
+
+
+def poisson_elnet_path(
+    X: np.ndarray,
+    y: np.ndarray,
+    *,
+    l1_ratio: float,
+    weights: np.ndarray | None = None,
+    alphas: Sequence[float] | None = None,
+    n_alphas: int = poisson_elnet.n_alphas,
+    eps: float = poisson_elnet.eps,
+    max_iter: int = poisson_elnet.max_iter,
+    max_cd_iter: int = poisson_elnet.max_cd_iter,
+    tol: float = poisson_elnet.tol,
+) -> PoissonPath:
+    """
+    Description:
+        Solves the penalized Poisson problems along a decreasing alpha path,
+        warm-starting every fit from the solution of the previous alpha. If no
+        alphas are given, the path starts at the smallest alpha for which all
+        coefficients of every problem are zero and ends at eps times that value.
+
+    Usage location:
+        models/M_poisson_elnet.py
+
+    Returns:
+        PoissonPath: Alphas (n_alphas,), coefficients (n_problems, n_alphas,
+        n_features), intercepts (n_problems, n_alphas) and IRLS iterations per
+        alpha.
+    """
+    X, y, weights = _validate(X, y, weights)
+    if alphas is None:
+        alphas = _alpha_grid(X, y, weights, l1_ratio, n_alphas=n_alphas, eps=eps)
+    alphas = np.sort(np.asarray(alphas, dtype=float))[::-1]
+
+    design = _prepare_design(X, weights)
+    n_problems = weights.shape[0]
+    coefs = np.empty((n_problems, len(alphas), X.shape[1]))
+    intercepts = np.empty((n_problems, len(alphas)))
+    n_iter = np.empty(len(alphas), dtype=int)
+
+    coef_init = None
+    intercept_init = None
+    for k, alpha in enumerate(alphas):
+        fit = _fit(
+            design,
+            y,
+            weights,
+            alpha=alpha,
+            l1_ratio=l1_ratio,
+            coef_init=coef_init,
+            intercept_init=intercept_init,
+            max_iter=max_iter,
+            max_cd_iter=max_cd_iter,
+            tol=tol,
+        )
+        coefs[:, k] = fit.coefs
+        intercepts[:, k] = fit.intercepts
+        n_iter[k] = fit.n_iter
+        coef_init, intercept_init = fit.coefs, fit.intercepts
+
+    return PoissonPath(alphas=alphas, coefs=coefs, intercepts=intercepts, n_iter=n_iter)
+
+
+def mean_poisson_deviance(
+    y: np.ndarray, mu: np.ndarray, *, axis: int = -1
+) -> np.ndarray:
+    y = np.asarray(y, dtype=float)
+    mu = np.maximum(np.asarray(mu, dtype=float), 1e-10)
+    y_log_y = np.where(y > 0, y * np.log(np.where(y > 0, y, 1) / mu), 0.0)
+    return 2 * np.mean(y_log_y - (y - mu), axis=axis)
+
+
+class PoissonElasticNetCV(RegressorMixin, BaseEstimator):
+    """
+    Description:
+        Elastic-net penalized Poisson regression whose alpha and l1_ratio are
+        chosen by time-series cross-validation. All folds and the final fit on
+        the complete data are solved as one batch along every alpha path, so
+        the search runs one path per l1_ratio rather than one per l1_ratio and
+        fold.
+
+    Usage location:
+        models/M01_elnet_feature_selection.py
+        models/M02_poisson_regressor.py
+    """
+
+    def __init__(
+        self,
+        *,
+        l1_ratio: float | Sequence[float] = poisson_elnet.l1_ratios,
+        n_alphas: int = poisson_elnet.n_alphas,
+        eps: float = poisson_elnet.eps,
+        cv: int = poisson_elnet.cv,
+        max_iter: int = poisson_elnet.max_iter,
+        tol: float = poisson_elnet.tol,
+    ) -> None:
+        self.l1_ratio = l1_ratio
+        self.n_alphas = n_alphas
+        self.eps = eps
+        self.cv = cv
+        self.max_iter = max_iter
+        self.tol = tol
+
+    def fit(self, X, y) -> PoissonElasticNetCV:
+        X = np.asarray(X, dtype=float)
+        y = np.asarray(y, dtype=float)
+        l1_ratios = np.atleast_1d(np.asarray(self.l1_ratio, dtype=float))
+
+        splits = list(TimeSeriesSplit(n_splits=self.cv).split(X))
+        weights = np.zeros((len(splits) + 1, len(y)))
+        for fold, (train_idx, _) in enumerate(splits):
+            weights[fold, train_idx] = 1
+        weights[-1] = 1
+
+        paths = []
+        scores = np.empty((len(l1_ratios), self.n_alphas))
+        for i, l1_ratio in enumerate(l1_ratios):
+            path = poisson_elnet_path(
+                X,
+                y,
+                l1_ratio=l1_ratio,
+                weights=weights,
+                n_alphas=self.n_alphas,
+                eps=self.eps,
+                max_iter=self.max_iter,
+                tol=self.tol,
+            )
+            fold_scores = np.empty((len(splits), self.n_alphas))
+            for fold, (_, valid_idx) in enumerate(splits):
+                eta = path.intercepts[fold][:, None] + path.coefs[fold] @ X[valid_idx].T
+                fold_scores[fold] = mean_poisson_deviance(
+                    y[valid_idx], np.exp(np.clip(eta, -ETA_BOUND, ETA_BOUND))
+                )
+            scores[i] = fold_scores.mean(axis=0)
+            paths.append(path)
+            logger.info(f"l1_ratio={l1_ratio}: best CV deviance {scores[i].min():.4f}.")
+
+        best_l1, best_alpha = np.unravel_index(np.argmin(scores), scores.shape)
+        best_path = paths[best_l1]
+
+        self.alphas_ = np.stack([path.alphas for path in paths])
+        self.cv_scores_ = scores
+        self.l1_ratio_ = float(l1_ratios[best_l1])
+        self.alpha_ = float(best_path.alphas[best_alpha])
+        self.coef_ = best_path.coefs[-1, best_alpha]
+        self.intercept_ = float(best_path.intercepts[-1, best_alpha])
+        self.n_iter_ = int(best_path.n_iter[: best_alpha + 1].sum())
+        self.n_features_in_ = X.shape[1]
+        return self
+
+    def predict(self, X) -> np.ndarray:
+        eta = np.asarray(X, dtype=float) @ self.coef_ + self.intercept_
+        return np.exp(np.clip(eta, -ETA_BOUND, ETA_BOUND))
+
+
+#################################################################
+
+
+def _validate(
+    X: np.ndarray, y: np.ndarray, weights: np.ndarray | None
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if X.ndim != 2 or y.shape != (X.shape[0],):
+        raise ValueError(
+            f"Expected X of shape (n, p) and y of shape (n,), got {X.shape} and {y.shape}."
+        )
+    if (y < 0).any():
+        raise ValueError("Poisson regression requires non-negative targets.")
+
+    if weights is None:
+        weights = np.ones((1, len(y)))
+    weights = np.atleast_2d(np.asarray(weights, dtype=float))
+    totals = weights.sum(axis=1, keepdims=True)
+    if (totals <= 0).any():
+        raise ValueError("Every problem needs at least one positive sample weight.")
+    return X, y, weights / totals
+
+
+def _alpha_grid(
+    X: np.ndarray,
+    y: np.ndarray,
+    weights: np.ndarray,
+    l1_ratio: float,
+    *,
+    n_alphas: int,
+    eps: float,
+) -> np.ndarray:
+    y_mean = weights @ y
+    gradient = (weights * (y[None, :] - y_mean[:, None])) @ X
+    alpha_max = np.abs(gradient).max() / max(l1_ratio, L1_FLOOR)
+    alpha_max = max(alpha_max, 1e-12)
+    return np.logspace(np.log10(alpha_max), np.log10(alpha_max * eps), n_alphas)
+
+
+class _Design(NamedTuple):
+    X_aug: np.ndarray
+    X_aug_t: np.ndarray
+    rows: list[slice | np.ndarray]
+
+
+def _prepare_design(X: np.ndarray, weights: np.ndarray) -> _Design:
+    # the intercept becomes the unpenalized column 0 of the design
+    X_aug = np.column_stack([np.ones(X.shape[0]), X])
+    rows: list[slice | np.ndarray] = []
+    for problem_weights in weights:
+        support = np.flatnonzero(problem_weights)
+        if support[-1] - support[0] + 1 == len(support):
+            rows.append(slice(support[0], support[-1] + 1))
+        else:
+            rows.append(support)
+    return _Design(X_aug=X_aug, X_aug_t=np.ascontiguousarray(X_aug.T), rows=rows)
+
+
+def _fit(
+    design: _Design,
+    y: np.ndarray,
+    weights: np.ndarray,
+    *,
+    alpha: float,
+    l1_ratio: float,
+    coef_init: np.ndarray | None,
+    intercept_init: np.ndarray | None,
+    max_iter: int,
+    max_cd_iter: int,
+    tol: float,
+) -> PoissonFit:
+    n_problems = weights.shape[0]
+    n_cols = design.X_aug.shape[1]
+    l1_pen = alpha * l1_ratio
+    l2_pen = alpha * (1 - l1_ratio)
+
+    params = np.zeros((n_problems, n_cols))
+    if coef_init is not None:
+        params[:, 1:] = coef_init
+    if intercept_init is None:
+        params[:, 0] = np.log(np.maximum(weights @ y, 1e-10))
+    else:
+        params[:, 0] = intercept_init
+
+    eta = params @ design.X_aug_t
+    objective = _objective(eta, y, weights, params, l1_pen, l2_pen)
+
+    n_iter = 0
+    for n_iter in range(1, max_iter + 1):
+        mu = np.exp(np.clip(eta, -ETA_BOUND, ETA_BOUND))
+        irls_weights = weights * mu
+        working_response = eta + (y - mu) / mu
+
+        new_params = _coordinate_descent(
+            design,
+            irls_weights,
+            working_response,
+            eta,
+            params,
+            l1_pen=l1_pen,
+            l2_pen=l2_pen,
+            max_iter=max_cd_iter,
+            tol=tol,
+        )
+
+        # step halving for problems whose penalized objective increased
+        step = np.ones(n_problems)
+        for _ in range(10):
+            trial_params = params + step[:, None] * (new_params - params)
+            trial_eta = trial_params @ design.X_aug_t
+            trial_objective = _objective(
+                trial_eta, y, weights, trial_params, l1_pen, l2_pen
+            )
+            worse = trial_objective > objective + 1e-12
+            if not worse.any():
+                break
+            step[worse] /= 2
+
+        delta = np.max(np.abs(trial_params - params))
+        params, eta, objective = trial_params, trial_eta, trial_objective
+        if delta < tol:
+            break
+
+    return PoissonFit(coefs=params[:, 1:], intercepts=params[:, 0], n_iter=n_iter)
+
+
+def _objective(
+    eta: np.ndarray,
+    y: np.ndarray,
+    weights: np.ndarray,
+    params: np.ndarray,
+    l1_pen: float,
+    l2_pen: float,
+) -> np.ndarray:
+    mu = np.exp(np.clip(eta, -ETA_BOUND, ETA_BOUND))
+    loss = (weights * (mu - y * eta)).sum(axis=1)
+    coefs = params[:, 1:]
+    penalty = l1_pen * np.abs(coefs).sum(axis=1) + l2_pen / 2 * (coefs**2).sum(axis=1)
+    return loss + penalty
+
+
+def _coordinate_descent(
+    design: _Design,
+    irls_weights: np.ndarray,
+    working_response: np.ndarray,
+    eta: np.ndarray,
+    params: np.ndarray,
+    *,
+    l1_pen: float,
+    l2_pen: float,
+    max_iter: int,
+    tol: float,
+) -> np.ndarray:
+    """
+    Minimizes 1/2 * sum_i v_i (z_i - eta_i)^2 + penalty for every problem at once
+    with covariance updates on a working set of columns: the non-zero
+    coefficients plus every column violating the KKT conditions. The weighted
+    Gram matrix of the working set is built once by BLAS from the rows each
+    problem actually uses, so a coordinate update costs O(n_problems * n_working)
+    instead of a pass over all samples. The coordinate sweeps are a Python loop
+    over the columns and only settle the signs of the coefficients, the solution
+    for these signs is a batched linear solve (see '_active_set_step'). The KKT
+    check of the remaining columns is a single matrix product; violators join
+    the working set until none are left.
+    """
+    params = params.copy()
+    working = np.any(params != 0, axis=0)
+    working[0] = True
+    gradient = (irls_weights * (working_response - eta)) @ design.X_aug
+
+    for _ in range(max_iter):
+        violators = np.any(np.abs(gradient) > l1_pen, axis=0) & ~working
+        working |= violators
+        cols = np.flatnonzero(working)
+
+        gram, covariance = _weighted_gram(design, cols, irls_weights, working_response)
+        params[:, cols] = _covariance_updates(
+            gram,
+            covariance,
+            params[:, cols],
+            penalized=cols > 0,
+            l1_pen=l1_pen,
+            l2_pen=l2_pen,
+            max_iter=max_iter,
+            tol=tol,
+        )
+
+        eta = params[:, cols] @ design.X_aug_t[cols]
+        gradient = (irls_weights * (working_response - eta)) @ design.X_aug
+        if not np.any(np.any(np.abs(gradient) > l1_pen, axis=0) & ~working):
+            break
+
+    return params
+
+
+def _weighted_gram(
+    design: _Design,
+    cols: np.ndarray,
+    irls_weights: np.ndarray,
+    working_response: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    n_problems = irls_weights.shape[0]
+    gram = np.empty((n_problems, len(cols), len(cols)))
+    covariance = np.empty((n_problems, len(cols)))
+    for problem, rows in enumerate(design.rows):
+        X_rows = design.X_aug[rows][:, cols]
+        v = irls_weights[problem, rows]
+        scaled = X_rows * np.sqrt(v)[:, None]
+        gram[problem] = scaled.T @ scaled
+        covariance[problem] = (v * working_response[problem, rows]) @ X_rows
+    return gram, covariance
+
+
+def _covariance_updates(
+    gram: np.ndarray,
+    covariance: np.ndarray,
+    params: np.ndarray,
+    *,
+    penalized: np.ndarray,
+    l1_pen: float,
+    l2_pen: float,
+    max_iter: int,
+    tol: float,
+) -> np.ndarray:
+    # a full sweep settles the signs of the coefficients, the solution for
+    # these signs is then solved for directly instead of cycling over the
+    # active set; the next sweep checks it and changes the signs if needed
+    params = params.copy()
+    diagonal = np.maximum(np.diagonal(gram, axis1=1, axis2=2), 1e-12)
+    scale = np.sqrt(diagonal)
+    gram_cols = np.ascontiguousarray(gram.transpose(2, 0, 1))
+
+    for _ in range(max_iter):
+        fitted = np.einsum("fij,fj->fi", gram, params)
+        max_delta = 0.0
+        for j in range(params.shape[1]):
+            old = params[:, j]
+            gradient = covariance[:, j] - fitted[:, j] + diagonal[:, j] * old
+            if penalized[j]:
+                new = np.sign(gradient) * np.maximum(np.abs(gradient) - l1_pen, 0.0)
+                new /= diagonal[:, j] + l2_pen
+            else:
+                new = gradient / diagonal[:, j]
+            delta = new - old
+            if delta.any():
+                fitted += delta[:, None] * gram_cols[j]
+                params[:, j] = new
+                max_delta = max(max_delta, (np.abs(delta) * scale[:, j]).max())
+
+        if max_delta < tol:
+            break
+        # every step drops the coefficients which change their sign first
+        for _ in range(params.shape[1]):
+            params, dropped = _active_set_step(
+                gram,
+                covariance,
+                params,
+                penalized=penalized,
+                l1_pen=l1_pen,
+                l2_pen=l2_pen,
+            )
+            if not dropped:
+                break
+
+    return params
+
+
+def _active_set_step(
+    gram: np.ndarray,
+    covariance: np.ndarray,
+    params: np.ndarray,
+    *,
+    penalized: np.ndarray,
+    l1_pen: float,
+    l2_pen: float,
+) -> tuple[np.ndarray, bool]:
+    # with the signs fixed the objective is a quadratic in the non-zero
+    # coefficients, minimized by one linear solve per problem; the step stops
+    # where the first coefficient changes its sign and drops it, without an L1
+    # penalty the signs do not matter and every coefficient is free
+    n_cols = params.shape[1]
+    active = (params != 0) | ~penalized | (l1_pen == 0)
+    signs = np.sign(params) * penalized
+    system = np.where(
+        active[:, :, None] & active[:, None, :],
+        gram + np.diag(l2_pen * penalized),
+        0.0,
+    )
+    system[:, np.arange(n_cols), np.arange(n_cols)] += ~active
+    rhs = np.where(active, covariance - l1_pen * signs, 0.0)
+    try:
+        target = np.linalg.solve(system, rhs[..., None])[..., 0]
+    except np.linalg.LinAlgError:
+        return params, False
+
+    crossing = active & penalized & (np.sign(target) != signs) & (l1_pen > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        crossings = np.where(crossing, params / (params - target), np.inf)
+    step = np.minimum(crossings.min(axis=1), 1.0)
+    new_params = params + step[:, None] * (target - params)
+    new_params[crossings <= step[:, None]] = 0.0
+
+    # ill-conditioned systems may not improve the objective, keep those problems
+    improved = _quadratic_objective(
+        gram, covariance, new_params, penalized, l1_pen, l2_pen
+    ) <= _quadratic_objective(gram, covariance, params, penalized, l1_pen, l2_pen)
+    dropped = bool(np.any(improved & (step < 1)))
+    return np.where(improved[:, None], new_params, params), dropped
+
+
+def _quadratic_objective(
+    gram: np.ndarray,
+    covariance: np.ndarray,
+    params: np.ndarray,
+    penalized: np.ndarray,
+    l1_pen: float,
+    l2_pen: float,
+) -> np.ndarray:
+    coefs = params * penalized
+    return (
+        0.5 * np.einsum("fi,fij,fj->f", params, gram, params)
+        - (covariance * params).sum(axis=1)
+        + l1_pen * np.abs(coefs).sum(axis=1)
+        + l2_pen / 2 * (coefs**2).sum(axis=1)
+    )
@@ -0,0 +1,91 @@
+import argparse
+import csv
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from bundesliga_forecasting.BL_config import COLUMNS, CSV_ENCODING, PATHS
+from bundesliga_forecasting.models.M_artifact import load_artifact
+
+# cold-start inference: no pandas or scikit-learn, the model is read from the
+# artifact written by M02 and the input is parsed with the csv module
+
+paths = PATHS
+cols = COLUMNS
+encoding = CSV_ENCODING
+
+
+def predict(
+    input_path: Path,
+    output_path: Path | None = None,
+    *,
+    model_dir: Path = paths.models,
+    model_name: str = paths.model_name,
+) -> np.ndarray:
+    """
+    Description:
+        Predicts the goal rates of every row of a feature file.
+        Step 1 -> Load the model artifact
+        Step 2 -> Check the input header against the features of the artifact
+                  and read them in artifact order
+        Step 3 -> Predict and write the input rows with the predicted goal rate
+
+    Usage location:
+        models/M_predict.py
+
+    Args:
+        input_path (Path): CSV file with (at least) the model features.
+        output_path (Path | None): Target file, nothing is written if None.
+
+    Returns:
+        np.ndarray: Predicted goal rates.
+    """
+    artifact = load_artifact(model_dir, model_name)
+
+    with open(input_path, newline="", encoding=encoding) as file:
+        reader = csv.reader(file)
+        header = next(reader)
+        rows = [row for row in reader if row]
+
+    index = artifact.feature_index(header)
+    X = np.array([[row[i] for i in index] for row in rows], dtype=float)
+    rates = artifact.predict(X)
+
+    if output_path is not None:
+        with open(output_path, "w", newline="", encoding=encoding) as file:
+            writer = csv.writer(file)
+            writer.writerow(header + [cols.pred_goalsf])
+            writer.writerows(
+                row + [repr(rate)] for row, rate in zip(rows, rates.tolist())
+            )
+
+    return rates
+
+
+def main(argv: list[str] | None = None) -> None:
+    start = time.perf_counter()
+    parser = argparse.ArgumentParser(
+        description="Predict goal rates with a saved model artifact."
+    )
+    parser.add_argument("input", type=Path, help="CSV file with the model features.")
+    parser.add_argument("-o", "--output", type=Path, default=None)
+    parser.add_argument("--model-dir", type=Path, default=paths.models)
+    parser.add_argument("--model-name", default=paths.model_name)
+    args = parser.parse_args(argv)
+
+    rates = predict(
+        args.input,
+        args.output,
+        model_dir=args.model_dir,
+        model_name=args.model_name,
+    )
+    print(
+        f"Predicted {len(rates)} rows in {time.perf_counter() - start:.3f}s.",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import logging
+import math
+import time
+import warnings
+from collections.abc import Callable
+from itertools import product
+from typing import Any, NamedTuple
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.exceptions import ConvergenceWarning
+from sklearn.metrics import mean_squared_error
+from sklearn.model_selection import TimeSeriesSplit
+from sklearn.pipeline import Pipeline
+
+from bundesliga_forecasting.models.M_config import SEARCH
+
+logger = logging.getLogger(__name__)
+search = SEARCH
+
+
+class SearchResult(NamedTuple):
+    best_estimator: Pipeline
+    best_params: dict[str, Any]
+    best_score: float
+    history: pd.DataFrame
+
+
+def halving_search(
+    estimator: Pipeline,
+    param_grid: dict[str, list],
+    X: pd.DataFrame,
+    y: pd.Series,
+    *,
+    cv: TimeSeriesSplit,
+    loss: Callable[[np.ndarray, np.ndarray], float] = mean_squared_error,
+    iter_param: str | None = "model__max_iter",
+    factor: int = search.factor,
+    min_folds: int = search.min_folds,
+    min_iter: int = search.min_iter,
+    time_budget: float | None = search.time_budget,
+) -> SearchResult:
+    """
+    Description:
+        Successive halving over the folds of a time-series split.
+        Step 1 -> Evaluate every candidate on the most recent fold(s) with a
+                  reduced iteration budget
+        Step 2 -> Keep the best 1/factor candidates and repeat with factor times
+                  more folds and iterations until all folds are used
+        Step 3 -> Refit the best candidate on the full data set
+
+        Within a rung a candidate is stopped as soon as its cumulative loss on the
+        folds evaluated so far is worse than that of the weakest candidate which
+        would currently be promoted. The fits themselves stop on the estimator's
+        own convergence criterion ('tol'), so the iteration budget is only an
+        upper bound. Once 'time_budget' seconds have passed, the search returns
+        the best candidate of the last completed rung.
+
+    Usage location:
+        models/M01_elnet_feature_selection.py
+        models/M02_poisson_regressor.py
+
+    Args:
+        estimator (Pipeline): Unfitted pipeline which is cloned for every fit.
+        param_grid (dict[str, list]): Grid of pipeline parameters.
+        cv (TimeSeriesSplit): Splitter defining the folds.
+        loss (Callable): Loss function, lower is better.
+        iter_param (str | None): Pipeline parameter holding the iteration budget.
+        factor (int): Reduction factor between two rungs.
+        min_folds (int): Number of folds used in the first rung.
+        min_iter (int): Lower bound for the iteration budget of a rung.
+        time_budget (float | None): Wall-clock budget in seconds.
+
+    Returns:
+        SearchResult: Refitted best estimator, its parameters, its mean loss and
+        the evaluation history of all rungs.
+    """
+    if factor < 2:
+        raise ValueError(f"The variable 'factor' must be at least 2, got {factor}.")
+
+    start = time.perf_counter()
+    splits = list(cv.split(X))
+    n_splits = len(splits)
+    min_folds = min(max(min_folds, 1), n_splits)
+    n_rungs = 1 + math.ceil(math.log(n_splits / min_folds, factor))
+    max_iter = estimator.get_params()[iter_param] if iter_param else None
+
+    keys = list(param_grid)
+    candidates = [dict(zip(keys, values)) for values in product(*param_grid.values())]
+    logger.info(
+        f"Successive halving over {len(candidates)} candidates, "
+        f"{n_splits} folds and {n_rungs} rungs..."
+    )
+
+    history = []
+    ranking: list[tuple[float, dict[str, Any]]] = []
+    for rung in range(n_rungs):
+        n_folds = min(n_splits, min_folds * factor**rung)
+        rung_splits = splits[-n_folds:]
+        n_iter = None
+        if max_iter is not None:
+            n_iter = max(min_iter, max_iter // factor ** (n_rungs - 1 - rung))
+        n_keep = max(1, math.ceil(len(candidates) / factor))
+
+        completed: list[tuple[np.ndarray, dict[str, Any]]] = []
+        out_of_time = False
+        for params in candidates:
+            fold_losses = []
+            pruned = False
+            for train_idx, valid_idx in rung_splits:
+                if (
+                    time_budget is not None
+                    and time.perf_counter() - start > time_budget
+                ):
+                    out_of_time = True
+                    break
+                model = clone(estimator).set_params(**params)
+                if n_iter is not None:
+                    model.set_params(**{iter_param: n_iter})
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore", ConvergenceWarning)
+                    model.fit(X.iloc[train_idx], y.iloc[train_idx])
+                fold_losses.append(
+                    loss(y.iloc[valid_idx], model.predict(X.iloc[valid_idx]))
+                )
+                if _is_dominated(np.cumsum(fold_losses), completed, n_keep):
+                    pruned = True
+                    break
+
+            if out_of_time:
+                break
+            history.append(
+                {
+                    "rung": rung,
+                    "n_folds": n_folds,
+                    "n_iter": n_iter,
+                    "mean_loss": float(np.mean(fold_losses)),
+                    "pruned": pruned,
+                    **params,
+                }
+            )
+            if not pruned:
+                completed.append((np.cumsum(fold_losses), params))
+
+        if out_of_time and not completed:
+            logger.info(f"Time budget exhausted during rung {rung}.")
+            break
+
+        completed.sort(key=lambda item: item[0][-1])
+        ranking = [(item[0][-1] / len(item[0]), item[1]) for item in completed]
+        logger.info(
+            f"Rung {rung}: {len(completed)} / {len(candidates)} candidates completed "
+            f"on {n_folds} folds with {n_iter} iterations."
+        )
+        if out_of_time:
+            logger.info(f"Time budget exhausted during rung {rung}.")
+            break
+        candidates = [params for _, params in ranking[:n_keep]]
+
+    if not ranking:
+        raise RuntimeError(
+            "No candidate completed a single rung. Please increase 'time_budget'."
+        )
+
+    best_score, best_params = ranking[0]
+    best_estimator = clone(estimator).set_params(**best_params)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", ConvergenceWarning)
+        best_estimator.fit(X, y)
+
+    logger.info(
+        f"Successive halving finished after {time.perf_counter() - start:.1f}s."
+    )
+
+    return SearchResult(
+        best_estimator=best_estimator,
+        best_params=best_params,
+        best_score=best_score,
+        history=pd.DataFrame(history),
+    )
+
+
+def _is_dominated(
+    cum_losses: np.ndarray,
+    completed: list[tuple[np.ndarray, dict[str, Any]]],
+    n_keep: int,
+) -> bool:
+    if len(completed) < n_keep:
+        return False
+    n_evaluated = len(cum_losses)
+    threshold = np.sort([item[0][n_evaluated - 1] for item in completed])[n_keep - 1]
+    return bool(cum_losses[-1] > threshold)
@@ -0,0 +1,77 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from bundesliga_forecasting.data_structuring.structure import S02_merge
+from bundesliga_forecasting.data_structuring.structure.S02_merge import merge
+
+MATCHES = pd.DataFrame(
+    {
+        "Div": ["D1", "D1", "D1"],
+        "Date": ["2020-08-01", "2020-08-01", "2020-08-08"],
+        "HomeTeam": ["Bayern", "Dortmund", "Bremen"],
+        "AwayTeam": ["Bremen", "Koln", "Bayern"],
+        "FTHG": [2, 1, 0],
+        "FTAG": [0, 1, 3],
+    }
+)
+
+
+@pytest.fixture
+def dirs(tmp_path: Path) -> tuple[Path, Path]:
+    src_dir, target_dir = tmp_path / "cleaned", tmp_path / "merged"
+    src_dir.mkdir()
+    return src_dir, target_dir
+
+
+def _merged(target_dir: Path) -> pd.DataFrame:
+    return pd.read_csv(target_dir / "merged.csv")
+
+
+def test_exact_duplicate_file_is_dropped(dirs: tuple[Path, Path]) -> None:
+    src_dir, target_dir = dirs
+    MATCHES.to_csv(src_dir / "D1_2020.csv", index=False)
+    MATCHES.to_csv(src_dir / "D1_2020_copy.csv", index=False)
+
+    merge(src_dir, target_dir)
+
+    pd.testing.assert_frame_equal(_merged(target_dir), MATCHES)
+    assert not (target_dir / "merge_conflicts.csv").exists()
+
+
+def test_conflicting_score_keeps_first(dirs: tuple[Path, Path]) -> None:
+    src_dir, target_dir = dirs
+    conflicting = MATCHES.iloc[[0]].assign(FTHG=5)
+    MATCHES.to_csv(src_dir / "a.csv", index=False)
+    conflicting.to_csv(src_dir / "b.csv", index=False)
+
+    merge(src_dir, target_dir)
+
+    pd.testing.assert_frame_equal(_merged(target_dir), MATCHES)
+    conflicts = pd.read_csv(target_dir / "merge_conflicts.csv")
+    pd.testing.assert_frame_equal(conflicts, conflicting.reset_index(drop=True))
+
+
+def test_order_does_not_depend_on_file_system(
+    dirs: tuple[Path, Path], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    src_dir, target_dir = dirs
+    MATCHES.iloc[:2].to_csv(src_dir / "a.csv", index=False)
+    MATCHES.iloc[1:].assign(FTAG=[2, 3]).to_csv(src_dir / "b.csv", index=False)
+
+    outputs = []
+    for reverse in [False, True]:
+        listing = sorted(src_dir.iterdir(), reverse=reverse)
+        monkeypatch.setattr(S02_merge, "detect_csv_files", lambda path: listing)
+        merge(src_dir, target_dir)
+        outputs.append(
+            (
+                (target_dir / "merged.csv").read_bytes(),
+                (target_dir / "merge_conflicts.csv").read_bytes(),
+            )
+        )
+
+    assert outputs[0] == outputs[1]
+    # the match of both files keeps the score of a.csv
+    assert _merged(target_dir).loc[1, "FTAG"] == 1
@@ -0,0 +1,274 @@
+"""
+Benchmark of the pipeline stages on synthetic data.
+
+Every stage runs in its own subprocess, so that the peak RSS is attributable
+to the stage. Wall time only covers the stage call itself, not the imports.
+
+    python tests/03_benchmarks/B01_benchmark_stages.py --sizes 0.1 1
+    python tests/03_benchmarks/B01_benchmark_stages.py --save-baseline
+    python tests/03_benchmarks/B01_benchmark_stages.py --threshold 0.25
+
+The size is a multiple of the production data (60 seasons, 2 divisions of 18
+teams). The exit code is 1 if any stage is slower or uses more memory than
+the baseline by more than the threshold.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+# run from a source checkout without installing the package
+sys.path.insert(0, str(BENCHMARK_DIR.parents[1] / "src"))
+RESULTS_FILE = BENCHMARK_DIR / "results.json"
+BASELINE_FILE = BENCHMARK_DIR / "baseline.json"
+
+PRODUCTION_SEASONS = 60
+LAST_SEASON = 2024
+# pandas timestamps start in 1677, larger sizes add leagues instead of seasons
+MAX_SEASONS = LAST_SEASON - 1678
+
+STAGES = [
+    "clean",
+    "merge",
+    "prepare",
+    "add_score_features",
+    "add_daily_comparisons",
+    "add_momentum",
+    "add_season_performance",
+    "add_prev_season_performance",
+    "add_relprom_effects",
+    "add_historical_features",
+    "add_head_to_head",
+    "add_elo_ratings",
+    "add_strength_of_schedule",
+    "add_rest_days",
+    "apply_feature_combination",
+    "elnet_feature_selection",
+]
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=float, nargs="+", default=[0.1, 1.0])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--output", type=Path, default=RESULTS_FILE)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--run-stage", help=argparse.SUPPRESS)
+    parser.add_argument("--root", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_stage:
+        print(json.dumps(_run_stage(args.run_stage, args.root)))
+        return 0
+
+    # later stages need the output of all earlier ones
+    last = max(STAGES.index(stage) for stage in args.stages)
+    results = []
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory(prefix="bl_benchmark_") as tmp:
+            root = Path(tmp)
+            _generate(root, size, args.seed)
+            for stage in STAGES[: last + 1]:
+                measure = stage in args.stages
+                result = _run_subprocess(stage, root)
+                if measure:
+                    results.append({"size": size, **result})
+                    _print_result(results[-1])
+                if result["status"] != "ok":
+                    break
+
+    report = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    args.output.write_text(json.dumps(report, indent=2))
+    print(f"\nResults saved to {args.output}")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2))
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print(f"No baseline found at {args.baseline}, skipping the comparison.")
+        return 0
+
+    baseline = json.loads(args.baseline.read_text())["results"]
+    regressions = compare(results, baseline, threshold=args.threshold)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    failed = [result for result in results if result["status"] != "ok"]
+    return 1 if regressions or failed else 0
+
+
+def compare(
+    results: list[dict], baseline: list[dict], *, threshold: float
+) -> list[str]:
+    reference = {(item["size"], item["stage"]): item for item in baseline}
+    regressions = []
+    for result in results:
+        base = reference.get((result["size"], result["stage"]))
+        if base is None or result["status"] != "ok" or base["status"] != "ok":
+            continue
+        for metric in ["wall_time", "peak_rss_mb"]:
+            ratio = result[metric] / max(base[metric], 1e-9)
+            if ratio > 1 + threshold:
+                regressions.append(
+                    f"{result['stage']} (size {result['size']}): {metric} "
+                    f"{base[metric]:.3f} -> {result[metric]:.3f} ({ratio - 1:+.0%})"
+                )
+    return regressions
+
+
+#################################################################
+
+
+def _generate(root: Path, size: float, seed: int) -> None:
+    from bundesliga_forecasting.data_structuring.structure.S00_synthetic import (
+        generate_raw_data,
+    )
+
+    n_seasons = max(2, round(PRODUCTION_SEASONS * size))
+    n_leagues = -(-n_seasons // MAX_SEASONS)
+    n_seasons = -(-n_seasons // n_leagues)
+    print(f"\nSize {size}: {n_leagues} league(s) x {n_seasons} seasons")
+    generate_raw_data(
+        root / "raw",
+        n_leagues=n_leagues,
+        n_seasons=n_seasons,
+        first_season=LAST_SEASON - n_seasons + 1,
+        seed=seed,
+    )
+
+
+def _run_subprocess(stage: str, root: Path) -> dict:
+    process = subprocess.run(
+        [sys.executable, __file__, "--run-stage", stage, "--root", str(root)],
+        capture_output=True,
+        text=True,
+    )
+    if process.returncode != 0:
+        error = process.stderr.strip().splitlines()
+        return {"stage": stage, "status": "error", "error": error[-1] if error else ""}
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def _run_stage(stage: str, root: Path) -> dict:
+    call, output = _stage_call(stage, root)
+    start = time.perf_counter()
+    call()
+    wall_time = time.perf_counter() - start
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = peak_rss / (2**20 if sys.platform == "darwin" else 2**10)
+    rows = _count_rows(output)
+    return {
+        "stage": stage,
+        "status": "ok",
+        "wall_time": wall_time,
+        "peak_rss_mb": peak_rss_mb,
+        "rows": rows,
+        "rows_per_second": rows / wall_time if wall_time > 0 else None,
+    }
+
+
+def _stage_call(stage: str, root: Path):
+    from bundesliga_forecasting.BL_config import PATHS, setup_logging
+
+    setup_logging(level=logging.WARNING)
+    raw, cleaned, merged, prepared, features = (
+        root / name for name in ["raw", "cleaned", "merged", "prepared", "features"]
+    )
+    feature_file = features / PATHS.feature_file
+
+    if stage == "clean":
+        from bundesliga_forecasting.data_structuring.structure.S01_clean import clean
+
+        return lambda: clean(raw, cleaned), cleaned
+    if stage == "merge":
+        from bundesliga_forecasting.data_structuring.structure.S02_merge import merge
+
+        return lambda: merge(cleaned, merged), merged / PATHS.merged_file
+    if stage == "prepare":
+        from bundesliga_forecasting.data_structuring.structure.S03_prepare import (
+            prepare,
+        )
+
+        return lambda: prepare(merged, prepared), prepared / PATHS.prepared_file
+    if stage == "elnet_feature_selection":
+        from bundesliga_forecasting.models.M01_elnet_feature_selection import (
+            data_setup,
+        )
+
+        target = root / "elnet"
+        target.mkdir(exist_ok=True)
+        return lambda: data_setup(features, target_dir=target), target
+
+    modules = {
+        "add_score_features": "F01_score",
+        "add_daily_comparisons": "F02_daily_table",
+        "add_momentum": "F03_momentum",
+        "add_season_performance": "F04_current_season",
+        "add_prev_season_performance": "F05_prev_season",
+        "add_relprom_effects": "F06_relprom_effects",
+        "add_historical_features": "F07_history",
+        "add_head_to_head": "F09_head_to_head",
+        "add_elo_ratings": "F10_elo",
+        "add_strength_of_schedule": "F11_strength_of_schedule",
+        "add_rest_days": "F12_rest_days",
+        "apply_feature_combination": "F08_combine",
+    }
+    module = __import__(
+        f"bundesliga_forecasting.feature_engineering.features.{modules[stage]}",
+        fromlist=[stage],
+    )
+    function = getattr(module, stage)
+    if stage == "add_score_features":
+        return lambda: function(prepared, features), feature_file
+    if stage == "apply_feature_combination":
+        return lambda: function(features, features), features / PATHS.combined_file
+    return lambda: function(features, features), feature_file
+
+
+def _count_rows(path: Path) -> int:
+    files = sorted(path.glob("*.csv")) if path.is_dir() else [path]
+    rows = 0
+    for file in files:
+        with open(file, "rb") as f:
+            rows += (
+                sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(1 << 20), b""))
+                - 1
+            )
+    return rows
+
+
+def _print_result(result: dict) -> None:
+    if result["status"] != "ok":
+        print(f"  {result['stage']:<30} ERROR {result['error']}")
+        return
+    print(
+        f"  {result['stage']:<30} {result['wall_time']:>8.2f}s "
+        f"{result['peak_rss_mb']:>8.0f} MB {result['rows_per_second']:>12.0f} rows/s"
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())